@@ -1,10 +1,36 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Client pool: extra API keys (comma-separated) and Vertex AI backends ("project:location", comma-separated)
+GEMINI_API_KEYS = tuple(
+    dict.fromkeys(
+        key.strip()
+        for key in [GEMINI_API_KEY or "", *os.getenv("GEMINI_API_KEYS", "").split(",")]
+        if key.strip()
+    )
+)
+GEMINI_VERTEX_BACKENDS = tuple(
+    backend.strip() for backend in os.getenv("GEMINI_VERTEX_BACKENDS", "").split(",") if backend.strip()
+)
+GEMINI_CLIENT_COOLDOWN_SECONDS = float(os.getenv("GEMINI_CLIENT_COOLDOWN_SECONDS", "10"))
+GEMINI_CLIENT_MAX_COOLDOWN_SECONDS = float(os.getenv("GEMINI_CLIENT_MAX_COOLDOWN_SECONDS", "120"))
+GEMINI_CLIENT_RATE_LIMIT_WINDOW_SECONDS = 300
+
+# HTTP connection pool of every Gemini client; idle connections stay open for keep-alive expiry
+GEMINI_HTTP_MAX_CONNECTIONS = int(os.getenv("GEMINI_HTTP_MAX_CONNECTIONS", "100"))
+GEMINI_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GEMINI_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("GEMINI_HTTP_KEEPALIVE_EXPIRY_SECONDS", "300"))
+
+# Startup warm-up: build the clients and open their connections; idle clients are pinged to stay warm (0 disables)
+GEMINI_WARMUP_ENABLED = os.getenv("GEMINI_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+GEMINI_WARMUP_TIMEOUT_SECONDS = float(os.getenv("GEMINI_WARMUP_TIMEOUT_SECONDS", "10"))
+GEMINI_KEEPALIVE_PING_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_PING_SECONDS", "240"))
+
 GEMINI_IMAGE_MODELS = ("gemini-3.1-flash-image-preview", "gemini-3-pro-image-preview")
 IMAGE_MODELS = GEMINI_IMAGE_MODELS
 IMAGE_MODEL = "gemini-3-pro-image-preview"
@@ -14,3 +40,104 @@ IMAGE_DEFAULT_TEMPERATURE = 1.0
 IMAGE_DEFAULT_ASPECT_RATIO = "1:1"
 IMAGE_DEFAULT_RESOLUTION = "1K"
 IMAGE_DEFAULT_THINKING_LEVEL = "HIGH"
+
+# Gemini Files API uploads expire 48 hours after creation
+GEMINI_FILE_TTL_SECONDS = 48 * 60 * 60
+
+# Reference image upload cache
+UPLOAD_CACHE_MAX_ENTRIES = 256
+UPLOAD_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+UPLOAD_CACHE_EXPIRY_MARGIN_SECONDS = 60 * 60
+
+# Reference image attachment: small images go inline, larger ones via Files API
+IMAGE_INLINE_MAX_BYTES = int(os.getenv("IMAGE_INLINE_MAX_BYTES", str(512 * 1024)))
+IMAGE_INLINE_MAX_TOTAL_BYTES = 15 * 1024 * 1024
+# Serialized inlined requests per Gemini Batch API job; the API rejects about 20 MB and more
+BATCH_INLINE_MAX_BYTES = int(os.getenv("BATCH_INLINE_MAX_BYTES", str(18 * 1024 * 1024)))
+IMAGE_UPLOAD_MAX_WORKERS = 8
+
+# Streaming ingestion of reference image uploads; payloads above the memory threshold spill to temp files
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(60 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(256 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+# Generation job storage: "memory" (single worker) or "sqlite" (shared by all workers)
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "gemini-hub-jobs.sqlite3"))
+
+# Job scheduler admission control
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "32"))
+JOB_DURATION_ESTIMATE_SECONDS = 30.0
+# Status long-polling (?wait=); stays under the 30 s Heroku router timeout
+STATUS_LONG_POLL_MAX_SECONDS = float(os.getenv("STATUS_LONG_POLL_MAX_SECONDS", "25"))
+STATUS_POLL_MAX_INTERVAL_SECONDS = 15
+# Items per /api/generate/batch call; a batch is admitted to the queue as a whole
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "32"))
+
+# Adaptive per-model concurrency (AIMD) and retries of transient Gemini errors
+MODEL_CONCURRENCY_INITIAL_LIMIT = 4
+MODEL_CONCURRENCY_MIN_LIMIT = 1
+MODEL_CONCURRENCY_MAX_LIMIT = int(os.getenv("MODEL_CONCURRENCY_MAX_LIMIT", "16"))
+MODEL_RETRY_MAX_ATTEMPTS = 3
+MODEL_RETRY_BASE_DELAY_SECONDS = 1.0
+MODEL_RETRY_MAX_DELAY_SECONDS = 20.0
+MODEL_RETRY_BUDGET_RATIO = 0.2
+
+# Hedged requests: start the other model when the primary is slower than usual
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "25"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_LATENCY_WINDOW = 200
+
+# Result cache for repeated identical generations ("off", "read" or "refresh" by default)
+RESULT_CACHE_DEFAULT_MODE = os.getenv("RESULT_CACHE_DEFAULT_MODE", "off")
+RESULT_CACHE_MAX_ENTRIES = 64
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "gemini-hub-results.sqlite3"))
+RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# How long an Idempotency-Key on job submission keeps returning the same job
+IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", str(10 * 60)))
+
+# Reference image preprocessing before upload (EXIF orientation, downscale, re-encode)
+REFERENCE_IMAGE_PREPROCESS_ENABLED = os.getenv("REFERENCE_IMAGE_PREPROCESS_ENABLED", "true").lower() in ("1", "true", "yes")
+REFERENCE_IMAGE_MAX_EDGE = int(os.getenv("REFERENCE_IMAGE_MAX_EDGE", "2048"))
+REFERENCE_IMAGE_FORMAT = os.getenv("REFERENCE_IMAGE_FORMAT", "JPEG").upper()
+REFERENCE_IMAGE_QUALITY = int(os.getenv("REFERENCE_IMAGE_QUALITY", "90"))
+REFERENCE_IMAGE_PREPROCESS_WORKERS = 2
+REFERENCE_IMAGE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Transcoded variants of generated images served next to the original
+OUTPUT_IMAGE_VARIANTS = tuple(
+    name.strip() for name in os.getenv("OUTPUT_IMAGE_VARIANTS", "webp,avif,thumbnail").split(",") if name.strip()
+)
+OUTPUT_THUMBNAIL_MAX_EDGE = 384
+OUTPUT_TRANSCODE_WORKERS = 2
+
+# Memory budget for generated images kept by the in-memory job store
+JOB_STORE_MAX_RESULT_BYTES = int(os.getenv("JOB_STORE_MAX_RESULT_BYTES", str(512 * 1024 * 1024)))
+
+# Tracing spans in OpenTelemetry format: "none", "console", "file" (JSON Lines) or "otlp" (HTTP/JSON)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", os.path.join(tempfile.gettempdir(), "gemini-hub-spans.jsonl"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = "gemini-hub"
+# Include per-stage durations as "timings" in generation results
+GENERATION_TIMINGS_ENABLED = os.getenv("GENERATION_TIMINGS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Offline stand-in for the Gemini API, for load tests and benchmarks without network access
+GEMINI_SIMULATOR_ENABLED = os.getenv("GEMINI_SIMULATOR_ENABLED", "false").lower() in ("1", "true", "yes")
+GEMINI_SIMULATOR_UPLOAD_SECONDS = float(os.getenv("GEMINI_SIMULATOR_UPLOAD_SECONDS", "0.3"))
+GEMINI_SIMULATOR_FIRST_CHUNK_SECONDS = float(os.getenv("GEMINI_SIMULATOR_FIRST_CHUNK_SECONDS", "8"))
+GEMINI_SIMULATOR_STREAM_SECONDS = float(os.getenv("GEMINI_SIMULATOR_STREAM_SECONDS", "4"))
+GEMINI_SIMULATOR_RATE_LIMIT_RATE = float(os.getenv("GEMINI_SIMULATOR_RATE_LIMIT_RATE", "0"))
+GEMINI_SIMULATOR_UNAVAILABLE_RATE = float(os.getenv("GEMINI_SIMULATOR_UNAVAILABLE_RATE", "0"))
+GEMINI_SIMULATOR_STALL_RATE = float(os.getenv("GEMINI_SIMULATOR_STALL_RATE", "0"))
+GEMINI_SIMULATOR_STALL_SECONDS = float(os.getenv("GEMINI_SIMULATOR_STALL_SECONDS", "60"))
+GEMINI_SIMULATOR_BATCH_SECONDS = float(os.getenv("GEMINI_SIMULATOR_BATCH_SECONDS", "30"))
+
+# Opt-in capture of anonymized generation traffic as JSON Lines for replays (empty disables)
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")
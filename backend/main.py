@@ -1,11 +1,27 @@
+import asyncio
+import contextlib
 import os
 from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from backend.config import settings
 from backend.routers import generate
+from backend.services import metrics, warmup
 
-app = FastAPI(title="Nano Banana 2 API")
+
+@contextlib.asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Warm the Gemini clients up in the background so startup does not wait for the network."""
+    warmup_task = asyncio.create_task(warmup.run_gemini_warmup()) if settings.GEMINI_WARMUP_ENABLED else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warmup_task
+
+
+app = FastAPI(title="Nano Banana 2 API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,10 +39,18 @@ app.include_router(generate.router, prefix="/api")
 
 
 @app.get("/api/health")
-async def health():
+async def health(response: Response):
+    if not warmup.is_ready():
+        response.status_code = 503
+        return {"status": "starting"}
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 frontend_dir = Path(__file__).resolve().parent.parent / "frontend" / "out"
 if frontend_dir.is_dir():
     app.mount("/", StaticFiles(directory=str(frontend_dir), html=True), name="frontend")
@@ -1,20 +1,66 @@
+import asyncio
+import hashlib
+import json
 import logging
+import math
+import time
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 
-from backend.config import prompts
-from backend.services.generation_jobs import get_generation_job, submit_generation_job
+from backend.config import prompts, settings
+from backend.services import tracing
+from backend.services.concurrency import get_model_governor
+from backend.services.gemini_client import get_gemini_client_pool
+from backend.services.generation_jobs import (
+    IdempotencyKeyConflictError,
+    JobQueueFullError,
+    get_generation_batch_jobs,
+    get_generation_image,
+    get_generation_job,
+    get_generation_next_status_at,
+    get_generation_queue_position,
+    iter_generation_job_events,
+    submit_generation_batch,
+    submit_generation_job,
+    wait_for_generation_job_change,
+)
 from backend.services.generation_service import (
     GenerationExecutionError,
+    GenerationRequest,
     ReferenceImage,
+    encode_images_as_base64,
     execute_generation,
     validate_generation_request,
 )
+from backend.services.image_transcoding import OUTPUT_VARIANTS
+from backend.services.job_store import (
+    JOB_TTL_SECONDS,
+    ORIGINAL_VARIANT,
+    TERMINAL_JOB_STATUSES,
+    GenerationJob,
+    thaw_result,
+)
+from backend.services.metrics import RESULT_SERVED_BYTES_TOTAL
+from backend.services.traffic_capture import capture_traffic, describe_request, get_traffic_capture
+from backend.services.upload_ingestion import UploadRejectedError, ingest_uploads
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+RESULT_VARIANTS = (ORIGINAL_VARIANT, *OUTPUT_VARIANTS)
+BATCH_ITEM_FIELDS = (
+    "prompt",
+    "model_mode",
+    "aspect_ratio",
+    "resolution",
+    "temperature",
+    "prompt_type",
+    "cache",
+    "reference_images",
+)
+
 
 @router.get("/prompts")
 async def get_prompts():
@@ -26,6 +72,20 @@ async def get_prompts():
     }
 
 
+@router.get("/generate/limits")
+async def get_generate_limits():
+    """Report per-model concurrency limits and the load and cooldown of every pooled client."""
+    try:
+        # The first call builds the pool, which imports the Gemini SDK; keep that off the event loop.
+        pool = await asyncio.to_thread(get_gemini_client_pool)
+    except (RuntimeError, ValueError) as error:
+        logger.warning("Gemini client pool unavailable: %s", error)
+        clients = []
+    else:
+        clients = pool.snapshot()
+    return {**get_model_governor().snapshot(), "clients": clients}
+
+
 @router.post("/generate/submit")
 async def submit_generate_image(
     prompt: str = Form(""),
@@ -34,36 +94,216 @@ async def submit_generate_image(
     resolution: str = Form("1K"),
     temperature: float = Form(1.0),
     prompt_type: str = Form("custom"),
+    priority: str = Form("interactive"),
+    cache: str | None = Form(None),
     reference_images: list[UploadFile] = File(default=[]),
+    idempotency_key: str | None = Header(default=None),
 ):
-    request = await _build_generation_request(
-        prompt=prompt,
-        model_mode=model_mode,
-        aspect_ratio=aspect_ratio,
-        resolution=resolution,
-        temperature=temperature,
-        prompt_type=prompt_type,
-        reference_images=reference_images,
-    )
-    job_id = submit_generation_job(request)
-    return {"job_id": job_id, "status": "queued"}
+    with tracing.span("POST /api/generate/submit", kind=tracing.SPAN_KIND_SERVER):
+        return await _submit_generation(
+            request=await _build_generation_request(
+                prompt=prompt,
+                model_mode=model_mode,
+                aspect_ratio=aspect_ratio,
+                resolution=resolution,
+                temperature=temperature,
+                prompt_type=prompt_type,
+                cache=cache,
+                reference_images=reference_images,
+            ),
+            priority=priority,
+            idempotency_key=idempotency_key,
+        )
 
 
 @router.get("/generate/status/{job_id}")
-async def get_generate_status(job_id: str):
+async def get_generate_status(
+    job_id: str,
+    response: Response,
+    wait: float = Query(0.0, ge=0.0),
+    if_none_match: str | None = Header(default=None),
+):
+    """Report a job; ``wait`` long-polls until it differs from the ``If-None-Match`` version.
+
+    Without ``If-None-Match`` the wait is for any change from the state at
+    request time. An unchanged version answers 304, and unfinished jobs carry
+    a ``Retry-After`` hint for clients that poll without waiting.
+    """
     job = get_generation_job(job_id)
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found.")
 
-    response: dict[str, object] = {
+    wait = min(wait, settings.STATUS_LONG_POLL_MAX_SECONDS)
+    if wait > 0 and job.status not in TERMINAL_JOB_STATUSES:
+        known_etag = if_none_match or _status_etag(job)
+        job = await wait_for_generation_job_change(
+            job_id,
+            wait,
+            lambda current: _etag_matches(known_etag, _status_etag(current)),
+        )
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+
+    etag = _status_etag(job)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if job.status not in TERMINAL_JOB_STATUSES:
+        headers["Retry-After"] = str(_suggest_poll_interval(job.job_id))
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    payload: dict[str, object] = {
         "job_id": job.job_id,
         "status": job.status,
     }
+    if job.status == "queued":
+        payload.update(_build_queue_payload(job.job_id))
     if job.result is not None:
-        response.update(job.result)
+        payload.update(_build_result_payload(job))
     if job.error:
-        response["error"] = job.error
-    return response
+        payload["error"] = job.error
+    return payload
+
+
+@router.post("/generate/batch")
+async def submit_generate_batch(
+    items: str = Form(...),
+    prompt: str = Form(""),
+    model_mode: str = Form("Pro"),
+    aspect_ratio: str = Form("1:1"),
+    resolution: str = Form("1K"),
+    temperature: float = Form(1.0),
+    prompt_type: str = Form("custom"),
+    priority: str = Form("bulk"),
+    cache: str | None = Form(None),
+    reference_images: list[UploadFile] = File(default=[]),
+):
+    """Queue one job per item of ``items``, a JSON list of prompt/parameter variants.
+
+    Item fields override the form fields of the same name. Every item uses
+    all uploaded reference images unless it lists their indexes in
+    ``reference_images``.
+    """
+    with tracing.span("POST /api/generate/batch", kind=tracing.SPAN_KIND_SERVER) as batch_span:
+        shared_images = await _read_reference_images(reference_images)
+        defaults = {
+            "prompt": prompt,
+            "model_mode": model_mode,
+            "aspect_ratio": aspect_ratio,
+            "resolution": resolution,
+            "temperature": temperature,
+            "prompt_type": prompt_type,
+            "cache": cache,
+        }
+        requests = [
+            _build_batch_item_request(index, item, defaults, shared_images)
+            for index, item in enumerate(_parse_batch_items(items))
+        ]
+        batch_span.set_attribute("items", len(requests))
+        try:
+            submission = await submit_generation_batch(requests, priority=priority)
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error)) from error
+        except JobQueueFullError as error:
+            raise HTTPException(
+                status_code=429,
+                detail=str(error),
+                headers={"Retry-After": str(error.retry_after_seconds)},
+            ) from error
+    return {
+        "batch_id": submission.batch_id,
+        "status": "queued",
+        "total": len(submission.job_ids),
+        "job_ids": list(submission.job_ids),
+    }
+
+
+@router.get("/generate/batch/{batch_id}")
+async def get_generate_batch_status(batch_id: str):
+    jobs = get_generation_batch_jobs(batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+
+    counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+    items = []
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+        item: dict[str, object] = {"job_id": job.job_id, "status": job.status}
+        if job.status == "queued":
+            item.update(_build_queue_payload(job.job_id))
+        if job.result is not None:
+            item.update(_build_result_payload(job))
+        if job.error:
+            item["error"] = job.error
+        items.append(item)
+    return {
+        "batch_id": batch_id,
+        "status": _aggregate_batch_status(counts),
+        "total": len(jobs),
+        "counts": counts,
+        "items": items,
+    }
+
+
+@router.get("/generate/events/{job_id}")
+async def stream_generate_events(job_id: str):
+    if get_generation_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def event_stream():
+        async for event in iter_generation_job_events(job_id):
+            if event.event_type == "keepalive":
+                yield ": keepalive\n\n"
+                continue
+            data = dict(event.data)
+            if event.event_type == "completed":
+                job = get_generation_job(job_id)
+                if job is not None and job.result is not None:
+                    data.update(_build_result_payload(job))
+            data["job_id"] = job_id
+            yield f"event: {event.event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/generate/result/{job_id}/{model}")
+async def get_generate_result(
+    job_id: str,
+    model: str,
+    variant: str | None = None,
+    accept: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    if variant is not None and variant not in RESULT_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Invalid variant: {variant}")
+
+    candidates = [variant] if variant is not None else _accepted_variants(accept)
+    if ORIGINAL_VARIANT not in candidates:
+        candidates.append(ORIGINAL_VARIANT)
+    for candidate in candidates:
+        image = get_generation_image(job_id, model, candidate)
+        if image is not None:
+            break
+    else:
+        raise HTTPException(status_code=404, detail="Result not found.")
+
+    headers = {
+        "ETag": f'"{image.etag}"',
+        "Cache-Control": f"private, max-age={JOB_TTL_SECONDS}, immutable",
+    }
+    if candidate != candidates[0]:
+        # The preferred variant may still be transcoding; let the next request pick it up.
+        headers["Cache-Control"] = "private, no-cache"
+    if variant is None:
+        headers["Vary"] = "Accept"
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    RESULT_SERVED_BYTES_TOTAL.inc(len(image.data), variant=candidate)
+    return Response(content=image.data, media_type=image.mime_type, headers=headers)
 
 
 @router.post("/generate")
@@ -74,21 +314,239 @@ async def generate_image(
     resolution: str = Form("1K"),
     temperature: float = Form(1.0),
     prompt_type: str = Form("custom"),
+    cache: str | None = Form(None),
     reference_images: list[UploadFile] = File(default=[]),
 ):
-    request = await _build_generation_request(
-        prompt=prompt,
-        model_mode=model_mode,
-        aspect_ratio=aspect_ratio,
-        resolution=resolution,
-        temperature=temperature,
-        prompt_type=prompt_type,
-        reference_images=reference_images,
+    started_at = time.time()
+    with tracing.span("POST /api/generate", kind=tracing.SPAN_KIND_SERVER):
+        trace = tracing.current_trace()
+        request = await _build_generation_request(
+            prompt=prompt,
+            model_mode=model_mode,
+            aspect_ratio=aspect_ratio,
+            resolution=resolution,
+            temperature=temperature,
+            prompt_type=prompt_type,
+            cache=cache,
+            reference_images=reference_images,
+        )
+        try:
+            payload = await execute_generation(request)
+        except GenerationExecutionError as error:
+            await _capture_generate_traffic(request, started_at, "failed", {})
+            raise HTTPException(status_code=500, detail=str(error)) from error
+        RESULT_SERVED_BYTES_TOTAL.inc(
+            sum(len(result.get("image_bytes") or b"") for result in payload["results"].values()),
+            variant="base64",
+        )
+        with tracing.span("router.encode_base64"):
+            response = encode_images_as_base64(payload)
+    if settings.GENERATION_TIMINGS_ENABLED and trace is not None:
+        response["timings"] = trace.timings()
+    await _capture_generate_traffic(request, started_at, "completed", payload)
+    return response
+
+
+async def _submit_generation(
+    request: GenerationRequest,
+    priority: str,
+    idempotency_key: str | None,
+) -> dict[str, object]:
+    try:
+        submission = await submit_generation_job(request, priority=priority, idempotency_key=idempotency_key)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    except IdempotencyKeyConflictError as error:
+        raise HTTPException(status_code=422, detail=str(error)) from error
+    except JobQueueFullError as error:
+        raise HTTPException(
+            status_code=429,
+            detail=str(error),
+            headers={"Retry-After": str(error.retry_after_seconds)},
+        ) from error
+    response: dict[str, object] = {"job_id": submission.job_id, "status": "queued"}
+    if submission.attached:
+        job = get_generation_job(submission.job_id)
+        if job is not None:
+            response["status"] = job.status
+        response["attached"] = True
+    response.update(_build_queue_payload(submission.job_id))
+    return response
+
+
+async def _capture_generate_traffic(
+    request: GenerationRequest,
+    started_at: float,
+    status: str,
+    payload: dict[str, object],
+) -> None:
+    if get_traffic_capture() is None:
+        return
+    await capture_traffic(
+        {
+            "timestamp": started_at,
+            "route": "generate",
+            "request": describe_request(request),
+            "status": status,
+            "fallback_used": bool(payload.get("fallback_used")),
+            "cached": bool(payload.get("cached")),
+            "latency_seconds": {"total": round(time.time() - started_at, 3)},
+        }
     )
+
+
+def _parse_batch_items(raw_items: str) -> list[dict[str, object]]:
+    try:
+        items = json.loads(raw_items)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail="Batch items must be a JSON list.") from error
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Batch items must be a non-empty JSON list.")
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch accepts at most {settings.BATCH_MAX_ITEMS} items.",
+        )
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise HTTPException(status_code=400, detail=f"Item {index}: must be a JSON object.")
+        unknown = sorted(set(item) - set(BATCH_ITEM_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Item {index}: unknown fields {', '.join(unknown)}.")
+    return items
+
+
+def _build_batch_item_request(
+    index: int,
+    item: dict[str, object],
+    defaults: dict[str, object],
+    shared_images: tuple[ReferenceImage, ...],
+) -> GenerationRequest:
+    """Validate one batch item; the shared ``ReferenceImage`` objects are reused, never copied."""
+    fields = {**defaults, **{name: value for name, value in item.items() if name != "reference_images"}}
     try:
-        return execute_generation(request)
-    except GenerationExecutionError as error:
-        raise HTTPException(status_code=500, detail=str(error)) from error
+        image_indexes = item.get("reference_images")
+        if image_indexes is None:
+            images = shared_images
+        elif isinstance(image_indexes, list) and all(
+            isinstance(image_index, int) and 0 <= image_index < len(shared_images) for image_index in image_indexes
+        ):
+            images = tuple(shared_images[image_index] for image_index in image_indexes)
+        else:
+            raise ValueError(f"reference_images must list indexes below {len(shared_images)}")
+        for name in ("prompt", "model_mode", "aspect_ratio", "resolution", "prompt_type"):
+            if not isinstance(fields[name], str):
+                # Same status FastAPI gives a single submit whose form field has the wrong type.
+                raise HTTPException(status_code=422, detail=f"Item {index}: {name} must be a string")
+        if not isinstance(fields["temperature"], int | float) or isinstance(fields["temperature"], bool):
+            raise ValueError(f"Invalid temperature: {fields['temperature']}")
+        return validate_generation_request(
+            prompt=fields["prompt"],
+            model_mode=fields["model_mode"],
+            aspect_ratio=fields["aspect_ratio"],
+            resolution=fields["resolution"],
+            temperature=float(fields["temperature"]),
+            prompt_type=fields["prompt_type"],
+            reference_images=images,
+            cache_mode=fields["cache"],
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=f"Item {index}: {error}") from error
+
+
+def _aggregate_batch_status(counts: dict[str, int]) -> str:
+    if counts["queued"] + counts["running"] == 0:
+        return "completed" if counts["completed"] else "failed"
+    if counts["running"] + counts["completed"] + counts["failed"]:
+        return "running"
+    return "queued"
+
+
+def _status_etag(job: GenerationJob) -> str:
+    """Version a status by what clients act on; the start estimate alone does not change it."""
+    position = get_generation_queue_position(job.job_id)
+    version = f"{job.job_id}:{job.status}:{job.updated_at}:{position.position if position else ''}"
+    return f'W/"{hashlib.sha256(version.encode()).hexdigest()[:20]}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return _strip_weak(etag) in {_strip_weak(tag.strip()) for tag in if_none_match.split(",")}
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _suggest_poll_interval(job_id: str) -> int:
+    """Seconds until the job's next expected status change, within sensible polling bounds."""
+    next_status_at = get_generation_next_status_at(job_id)
+    if next_status_at is None:
+        # Queued or running in another worker, where no estimate is available.
+        return 2
+    return max(1, min(settings.STATUS_POLL_MAX_INTERVAL_SECONDS, math.ceil(next_status_at - time.time())))
+
+
+def _accepted_variants(accept: str | None) -> list[str]:
+    """Prefer the smallest full-size format the client says it can decode.
+
+    Only formats listed by name count, and ``q=0`` means the client refuses
+    one; a higher q value wins over our own size preference.
+    """
+    qualities = {}
+    for media_range in (accept or "").split(","):
+        media_type, *parameters = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.lower()] = quality
+    accepted = [
+        (qualities[mime_type], name)
+        for name, mime_type in (("avif", "image/avif"), ("webp", "image/webp"))
+        if qualities.get(mime_type, 0.0) > 0
+    ]
+    return [name for _, name in sorted(accepted, key=lambda item: -item[0])]
+
+
+def _build_queue_payload(job_id: str) -> dict[str, object]:
+    position = get_generation_queue_position(job_id)
+    if position is None:
+        return {}
+    return {
+        "queue_position": position.position,
+        "estimated_start_at": round(position.estimated_start_at, 3),
+    }
+
+
+def _build_result_payload(job: GenerationJob) -> dict[str, object]:
+    """Replace stored image metadata with result URLs so polls stay a few hundred bytes.
+
+    The stored result is frozen; the payload is plain JSON data so the SSE
+    stream can serialize it without FastAPI's encoder.
+    """
+    results = {}
+    for model_name, result in job.result.get("results", {}).items():
+        has_image = bool(result.get("image_etag"))
+        image_url = f"/api/generate/result/{job.job_id}/{model_name}" if has_image else None
+        results[model_name] = {
+            "image_url": image_url,
+            "mime_type": result.get("mime_type") if has_image else None,
+            "image_size": result.get("image_size", 0),
+            "text_output": result.get("text_output", ""),
+            "error": result.get("error"),
+        }
+        variants = result.get("variants")
+        if has_image and variants:
+            results[model_name]["variants"] = variants
+            if "thumbnail" in variants:
+                results[model_name]["thumbnail_url"] = f"{image_url}?variant=thumbnail"
+    return thaw_result({**job.result, "results": results})
 
 
 async def _build_generation_request(
@@ -100,19 +558,10 @@ async def _build_generation_request(
     temperature: float,
     prompt_type: str,
     reference_images: list[UploadFile],
+    cache: str | None = None,
 ):
     """Read upload bytes once so background tasks can outlive the HTTP request."""
-    persisted_images = []
-    for upload_file in reference_images:
-        content = await upload_file.read()
-        if content:
-            persisted_images.append(
-                ReferenceImage(
-                    filename=upload_file.filename or "image.jpg",
-                    content=content,
-                )
-            )
-
+    persisted_images = await _read_reference_images(reference_images)
     try:
         return validate_generation_request(
             prompt=prompt,
@@ -121,7 +570,20 @@ async def _build_generation_request(
             resolution=resolution,
             temperature=temperature,
             prompt_type=prompt_type,
-            reference_images=tuple(persisted_images),
+            reference_images=persisted_images,
+            cache_mode=cache,
         )
     except ValueError as error:
         raise HTTPException(status_code=400, detail=str(error)) from error
+
+
+async def _read_reference_images(reference_images: list[UploadFile]) -> tuple[ReferenceImage, ...]:
+    """Stream uploads into size-capped spooled payloads, rejecting non-images early."""
+    with tracing.span("router.read_uploads", files=len(reference_images)) as read_span:
+        try:
+            payloads = await ingest_uploads(reference_images)
+        except UploadRejectedError as error:
+            raise HTTPException(status_code=error.status_code, detail=str(error)) from error
+        read_span.set_attribute("bytes", sum(payload.size for payload in payloads))
+        read_span.set_attribute("spilled", sum(payload.spilled for payload in payloads))
+    return tuple(ReferenceImage(filename=payload.filename, payload=payload) for payload in payloads)
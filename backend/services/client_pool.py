@@ -0,0 +1,151 @@
+"""Balance Gemini calls across several API keys and Vertex AI backends.
+
+Every key has its own rate limit, so the pool hands each ``ImageService``
+call the least-loaded client that is not cooling down after a 429. Files
+uploaded through one key are invisible to the others; callers pass the
+clients that already hold their uploads as ``preferred`` to keep that
+affinity while it does not cost much balance.
+"""
+
+import contextlib
+import logging
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Collection, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from backend.config import settings
+from backend.services.error_utils import error_status_code
+from backend.services.metrics import GEMINI_CLIENT_RATE_LIMITS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# A client holding the caller's uploads wins while it has at most this many more calls in flight.
+AFFINITY_SLACK = 2
+
+
+@dataclass
+class PooledClient:
+    """One Gemini client and the load and quota signals the pool balances on."""
+
+    name: str
+    client: Any
+    in_flight: int = 0
+    calls: int = 0
+    consecutive_rate_limits: int = 0
+    cooldown_until: float = 0.0
+    rate_limited_at: deque[float] = field(default_factory=deque)
+
+    def is_cooling_down(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+
+class GeminiClientPool:
+    """Pick a client per call and track its in-flight count, recent 429s and cooldown."""
+
+    def __init__(
+        self,
+        clients: list[tuple[str, Any]],
+        cooldown_seconds: float = settings.GEMINI_CLIENT_COOLDOWN_SECONDS,
+        max_cooldown_seconds: float = settings.GEMINI_CLIENT_MAX_COOLDOWN_SECONDS,
+        rate_limit_window_seconds: float = settings.GEMINI_CLIENT_RATE_LIMIT_WINDOW_SECONDS,
+    ) -> None:
+        if not clients:
+            raise RuntimeError("The Gemini client pool needs at least one client.")
+        self.members = [PooledClient(name=name, client=client) for name, client in clients]
+        self._by_name = {member.name: member for member in self.members}
+        self._cooldown_seconds = cooldown_seconds
+        self._max_cooldown_seconds = max_cooldown_seconds
+        self._rate_limit_window_seconds = rate_limit_window_seconds
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> PooledClient | None:
+        """Return the member with this name, e.g. the one that created a batch job."""
+        return self._by_name.get(name)
+
+    def acquire(self, preferred: Collection[str] = ()) -> PooledClient:
+        """Reserve the best client for one call; pair every call with ``release``.
+
+        Healthy clients are ranked by in-flight calls, then recent 429s, then
+        total calls. When every client is cooling down, the one that recovers
+        first is used rather than failing outright.
+        """
+        with self._lock:
+            now = time.monotonic()
+            healthy = [member for member in self.members if not member.is_cooling_down(now)]
+            if healthy:
+                ranked = sorted(healthy, key=lambda member: self._load_locked(member, now))
+                chosen = ranked[0]
+                for member in ranked:
+                    if member.name in preferred and member.in_flight <= chosen.in_flight + AFFINITY_SLACK:
+                        chosen = member
+                        break
+            else:
+                chosen = min(self.members, key=lambda member: member.cooldown_until)
+            chosen.in_flight += 1
+            chosen.calls += 1
+            return chosen
+
+    def release(self, member: PooledClient, error: BaseException | None = None) -> None:
+        """Return a client and let a rate limit put it into an exponentially growing cooldown."""
+        with self._lock:
+            member.in_flight -= 1
+            if error is None:
+                member.consecutive_rate_limits = 0
+                return
+            if not isinstance(error, Exception) or error_status_code(error) != 429:
+                return
+            now = time.monotonic()
+            member.rate_limited_at.append(now)
+            member.consecutive_rate_limits += 1
+            cooldown = min(
+                self._max_cooldown_seconds,
+                self._cooldown_seconds * 2 ** (member.consecutive_rate_limits - 1),
+            )
+            cooldown = max(cooldown, _retry_delay_seconds(error) or 0.0)
+            member.cooldown_until = max(member.cooldown_until, now + cooldown)
+        GEMINI_CLIENT_RATE_LIMITS_TOTAL.inc(client=member.name)
+        logger.warning("Gemini client %s hit a rate limit; cooling down for %.0fs", member.name, cooldown)
+
+    @contextlib.contextmanager
+    def lease(self, preferred: Collection[str] = ()) -> Iterator[PooledClient]:
+        """``acquire`` a client for the enclosed block and ``release`` it with the block's error, if any."""
+        member = self.acquire(preferred)
+        try:
+            yield member
+        except BaseException as error:
+            self.release(member, error)
+            raise
+        self.release(member)
+
+    def snapshot(self) -> list[dict[str, object]]:
+        """Expose per-client load and quota state for the limits endpoint and metrics."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "name": member.name,
+                    "in_flight": member.in_flight,
+                    "calls": member.calls,
+                    "recent_rate_limits": self._recent_rate_limits_locked(member, now),
+                    "cooldown_seconds": round(max(0.0, member.cooldown_until - now), 1),
+                }
+                for member in self.members
+            ]
+
+    def _load_locked(self, member: PooledClient, now: float) -> tuple[int, int, int]:
+        return member.in_flight, self._recent_rate_limits_locked(member, now), member.calls
+
+    def _recent_rate_limits_locked(self, member: PooledClient, now: float) -> int:
+        while member.rate_limited_at and member.rate_limited_at[0] <= now - self._rate_limit_window_seconds:
+            member.rate_limited_at.popleft()
+        return len(member.rate_limited_at)
+
+
+def _retry_delay_seconds(error: Exception) -> float | None:
+    """Read the ``RetryInfo`` delay Gemini attaches to some 429 responses."""
+    match = re.search(r"'retryDelay':\s*'(\d+(?:\.\d+)?)s'", str(getattr(error, "details", None) or error))
+    return float(match.group(1)) if match else None
@@ -0,0 +1,242 @@
+"""Adaptive per-model concurrency limits and budgeted retries for Gemini calls."""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from backend.config import settings
+from backend.services.error_utils import error_status_code, is_overload_error, is_transient_error
+from backend.services.metrics import GEMINI_ERRORS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+OVERLOAD_DECREASE_FACTOR = 0.5
+OVERLOAD_COOLDOWN_SECONDS = 1.0
+RETRY_BUDGET_MAX_TOKENS = 10.0
+
+
+class AdaptiveConcurrencyLimiter:
+    """Bound in-flight calls to one model with an AIMD-controlled limit.
+
+    Every success grows the limit by ``1 / limit`` (about +1 per full window),
+    every overload response halves it, at most once per cooldown so a single
+    burst of 429s does not collapse the limit to the minimum.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = settings.MODEL_CONCURRENCY_INITIAL_LIMIT,
+        min_limit: float = settings.MODEL_CONCURRENCY_MIN_LIMIT,
+        max_limit: float = settings.MODEL_CONCURRENCY_MAX_LIMIT,
+    ) -> None:
+        self._limit = float(initial_limit)
+        self._min_limit = float(min_limit)
+        self._max_limit = float(max_limit)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._last_decrease_at = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    async def acquire(self) -> None:
+        """Wait until a slot under the current limit is free."""
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before cancellation; give it back.
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        """Return a slot and wake as many waiters as the limit now allows."""
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def record_success(self) -> None:
+        self._limit = min(self._max_limit, self._limit + 1.0 / self._limit)
+        self._wake_waiters()
+
+    def record_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease_at < OVERLOAD_COOLDOWN_SECONDS:
+            return
+        self._last_decrease_at = now
+        self._limit = max(self._min_limit, self._limit * OVERLOAD_DECREASE_FACTOR)
+        logger.info("Lowered model concurrency limit to %.2f after overload", self._limit)
+
+    def snapshot(self) -> dict[str, float | int]:
+        return {
+            "limit": self.limit,
+            "limit_estimate": round(self._limit, 3),
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+        }
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+
+
+class RetryBudget:
+    """Allow retries only as a fraction of recent first attempts (token bucket)."""
+
+    def __init__(
+        self,
+        ratio: float = settings.MODEL_RETRY_BUDGET_RATIO,
+        max_tokens: float = RETRY_BUDGET_MAX_TOKENS,
+    ) -> None:
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = max_tokens
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def record_request(self) -> None:
+        self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+class ModelConcurrencyGovernor:
+    """Route every model call through its limiter and retry transient failures."""
+
+    def __init__(
+        self,
+        max_attempts: int = settings.MODEL_RETRY_MAX_ATTEMPTS,
+        base_delay_seconds: float = settings.MODEL_RETRY_BASE_DELAY_SECONDS,
+        max_delay_seconds: float = settings.MODEL_RETRY_MAX_DELAY_SECONDS,
+    ) -> None:
+        self._limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+        self._retry_budget = RetryBudget()
+        self._max_attempts = max_attempts
+        self._base_delay_seconds = base_delay_seconds
+        self._max_delay_seconds = max_delay_seconds
+
+    def limiter_for(self, model_name: str) -> AdaptiveConcurrencyLimiter:
+        limiter = self._limiters.get(model_name)
+        if limiter is None:
+            limiter = self._limiters[model_name] = AdaptiveConcurrencyLimiter()
+        return limiter
+
+    async def call(
+        self,
+        model_name: str,
+        operation: Callable[[], Awaitable[T]],
+        on_retry: Callable[[int, float, Exception], None] | None = None,
+    ) -> T:
+        """Run ``operation`` under the model's limit, retrying transient errors with backoff."""
+        limiter = self.limiter_for(model_name)
+        self._retry_budget.record_request()
+        attempt = 0
+        while True:
+            await limiter.acquire()
+            try:
+                result = await operation()
+            except Exception as error:
+                GEMINI_ERRORS_TOTAL.inc(model=model_name, code=error_status_code(error) or "other")
+                if is_overload_error(error):
+                    limiter.record_overload()
+                attempt += 1
+                if (
+                    not is_transient_error(error)
+                    or attempt >= self._max_attempts
+                    or not self._retry_budget.try_spend()
+                ):
+                    raise
+                retry_error = error
+            else:
+                limiter.record_success()
+                return result
+            finally:
+                limiter.release()
+
+            delay = self._backoff_delay(attempt)
+            logger.info("Retrying %s in %.2fs after transient error: %s", model_name, delay, retry_error)
+            if on_retry is not None:
+                on_retry(attempt, delay, retry_error)
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict[str, object]:
+        """Expose current limits so operators can see how hard Gemini pushes back."""
+        return {
+            "models": {model_name: limiter.snapshot() for model_name, limiter in self._limiters.items()},
+            "retry_budget_tokens": round(self._retry_budget.tokens, 3),
+        }
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff so synchronized clients spread out."""
+        cap = min(self._max_delay_seconds, self._base_delay_seconds * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+
+class ModelLatencyTracker:
+    """Keep a sliding window of successful call durations per model."""
+
+    def __init__(
+        self,
+        window: int = settings.HEDGE_LATENCY_WINDOW,
+        min_samples: int = settings.HEDGE_MIN_SAMPLES,
+    ) -> None:
+        self._samples: dict[str, deque[float]] = {}
+        self._window = window
+        self._min_samples = min_samples
+
+    def record(self, model_name: str, seconds: float) -> None:
+        samples = self._samples.get(model_name)
+        if samples is None:
+            samples = self._samples[model_name] = deque(maxlen=self._window)
+        samples.append(seconds)
+
+    def percentile(self, model_name: str, quantile: float) -> float | None:
+        """Return the observed latency quantile, or None until enough samples exist."""
+        samples = self._samples.get(model_name)
+        if not samples or len(samples) < self._min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    def hedge_delay(self, model_name: str) -> float:
+        """Wait for the learned p95 when known, otherwise for ``HEDGE_DELAY_SECONDS``."""
+        p95 = self.percentile(model_name, 0.95)
+        return p95 if p95 is not None else settings.HEDGE_DELAY_SECONDS
+
+
+_governor = ModelConcurrencyGovernor()
+_latency_tracker = ModelLatencyTracker()
+
+
+def get_model_governor() -> ModelConcurrencyGovernor:
+    """Return the governor shared by every generation in this process."""
+    return _governor
+
+
+def get_latency_tracker() -> ModelLatencyTracker:
+    """Return the per-model latency history shared by every generation in this process."""
+    return _latency_tracker
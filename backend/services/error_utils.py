@@ -16,6 +16,43 @@ ERROR_MESSAGES: dict[int, str] = {
 }
 
 
+TRANSIENT_ERROR_MARKERS = ("503", "429", "504", "unavailable", "resource_exhausted")
+OVERLOAD_ERROR_MARKERS = ("503", "429", "unavailable", "resource_exhausted")
+TRANSIENT_ERROR_CODES = frozenset({429, 500, 503, 504})
+OVERLOAD_ERROR_CODES = frozenset({429, 503})
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """Tell whether repeating the same call later has a fair chance to succeed."""
+    if getattr(exc, "code", None) in TRANSIENT_ERROR_CODES:
+        return True
+    raw = str(exc).lower()
+    return any(marker in raw for marker in TRANSIENT_ERROR_MARKERS)
+
+
+def is_overload_error(exc: Exception) -> bool:
+    """Tell whether Gemini rejected the call because of quota or capacity pressure."""
+    if getattr(exc, "code", None) in OVERLOAD_ERROR_CODES:
+        return True
+    raw = str(exc).lower()
+    return any(marker in raw for marker in OVERLOAD_ERROR_MARKERS)
+
+
+def error_status_code(exc: Exception) -> int | None:
+    """Extract the HTTP status code of a Gemini error, if one can be recognized."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    raw = str(exc)
+    match = re.search(r"'code':\s*(\d+)", raw)
+    if match:
+        return int(match.group(1))
+    for known_code in ERROR_MESSAGES:
+        if str(known_code) in raw:
+            return known_code
+    return None
+
+
 def format_api_error(exc: Exception) -> str:
     raw = str(exc)
 
@@ -40,6 +77,6 @@ def format_api_error(exc: Exception) -> str:
 def format_error_with_retry(exc: Exception, action: str = "операцію") -> str:
     msg = format_api_error(exc)
     raw = str(exc).lower()
-    if any(s in raw for s in ("503", "429", "504", "unavailable", "resource_exhausted")):
+    if any(marker in raw for marker in TRANSIENT_ERROR_MARKERS):
         msg += f" Спробуйте повторити {action} через кілька хвилин."
     return msg
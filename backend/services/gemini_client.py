@@ -1,10 +1,54 @@
 from functools import lru_cache
-from google import genai
 from backend.config import settings
+from backend.services.client_pool import GeminiClientPool
+from backend.services.metrics import GEMINI_CLIENT_IN_FLIGHT
 
 
 @lru_cache(maxsize=1)
-def get_gemini_client():
-    if not settings.GEMINI_API_KEY:
+def get_gemini_client_pool() -> GeminiClientPool:
+    """Build one client per configured API key and Vertex AI backend.
+
+    Members are named ``key-<n>`` or ``vertex-<project>-<location>`` so logs
+    and metrics never carry a key. Vertex AI clients authenticate with
+    Application Default Credentials. Every client gets the configured HTTP
+    connection pool, so connections opened by the warm-up stay reusable.
+    """
+    if settings.GEMINI_SIMULATOR_ENABLED:
+        from backend.services.gemini_simulator import SimulatedGeminiClient
+
+        return _observed(GeminiClientPool([("simulator", SimulatedGeminiClient())]))
+
+    # The SDK takes about a second to import, so it is loaded with the first client rather than at boot.
+    from google import genai
+
+    clients = [
+        (f"key-{index}", genai.Client(api_key=api_key, http_options=_http_options()))
+        for index, api_key in enumerate(settings.GEMINI_API_KEYS, start=1)
+    ]
+    for backend in settings.GEMINI_VERTEX_BACKENDS:
+        project, separator, location = backend.partition(":")
+        if not separator or not project or not location:
+            raise ValueError(f"GEMINI_VERTEX_BACKENDS entries must look like project:location, got {backend!r}")
+        client = genai.Client(vertexai=True, project=project, location=location, http_options=_http_options())
+        clients.append((f"vertex-{project}-{location}", client))
+    if not clients:
         raise RuntimeError("GEMINI_API_KEY not found in environment variables.")
-    return genai.Client(api_key=settings.GEMINI_API_KEY)
+    return _observed(GeminiClientPool(clients))
+
+
+def _http_options():
+    import httpx
+    from google.genai import types
+
+    limits = httpx.Limits(
+        max_connections=settings.GEMINI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GEMINI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GEMINI_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return types.HttpOptions(client_args={"limits": limits}, async_client_args={"limits": limits})
+
+
+def _observed(pool: GeminiClientPool) -> GeminiClientPool:
+    GEMINI_CLIENT_IN_FLIGHT.set_function(lambda: {(member.name,): member.in_flight for member in pool.members})
+    return pool
+
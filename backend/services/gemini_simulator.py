@@ -0,0 +1,273 @@
+"""Offline stand-in for the google-genai client, for load tests without network access.
+
+Enabled with ``GEMINI_SIMULATOR_ENABLED``. It implements the part of the
+client that ``ImageService`` uses (``files.upload`` and
+``models.generate_content_stream``, both sync and under ``aio``, plus
+``batches.create``/``batches.get`` with inlined requests and the
+``aio.models.get`` lookup the startup warm-up sends) with
+configurable upload latency, streamed text chunks followed by a PNG of
+realistic size for the requested resolution, and injected 429/503 errors
+and stalls.
+"""
+
+import asyncio
+import functools
+import hashlib
+import io
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from google.genai import errors, types
+from PIL import Image
+
+from backend.config import settings
+
+IMAGE_EDGES = {"1K": 1024, "2K": 2048}
+# Noise is drawn at a fraction of the size and upscaled, so the PNG lands near real output sizes.
+NOISE_SCALE = 8
+
+
+@dataclass(frozen=True)
+class SimulatorConfig:
+    """Latencies and failure rates of the simulated Gemini API."""
+
+    upload_seconds: float = settings.GEMINI_SIMULATOR_UPLOAD_SECONDS
+    upload_seconds_per_mb: float = 0.05
+    first_chunk_seconds: float = settings.GEMINI_SIMULATOR_FIRST_CHUNK_SECONDS
+    stream_seconds: float = settings.GEMINI_SIMULATOR_STREAM_SECONDS
+    text_chunks: int = 3
+    jitter: float = 0.2
+    rate_limit_rate: float = settings.GEMINI_SIMULATOR_RATE_LIMIT_RATE
+    unavailable_rate: float = settings.GEMINI_SIMULATOR_UNAVAILABLE_RATE
+    stall_rate: float = settings.GEMINI_SIMULATOR_STALL_RATE
+    stall_seconds: float = settings.GEMINI_SIMULATOR_STALL_SECONDS
+    batch_seconds: float = settings.GEMINI_SIMULATOR_BATCH_SECONDS
+    seed: int | None = None
+
+
+@dataclass(frozen=True)
+class _Step:
+    delay_seconds: float
+    chunk: types.GenerateContentResponse
+
+
+@dataclass
+class _SimulatedBatch:
+    model: str
+    requests: list[types.InlinedRequest]
+    ready_at: float
+    responses: list[types.InlinedResponse] | None = None
+
+
+@functools.lru_cache(maxsize=16)
+def simulated_image_png(width: int, height: int) -> bytes:
+    """Return a noisy PNG of the given size; the noise is seeded by the size, so calls get the same bytes."""
+    small_size = (max(1, width // NOISE_SCALE), max(1, height // NOISE_SCALE))
+    noise = random.Random(f"{width}x{height}").randbytes(small_size[0] * small_size[1] * 3)
+    small = Image.frombytes("RGB", small_size, noise)
+    buffer = io.BytesIO()
+    small.resize((width, height), Image.Resampling.BILINEAR).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def image_dimensions(resolution: str, aspect_ratio: str) -> tuple[int, int]:
+    """Match the pixel count Gemini uses for a resolution, shaped by the aspect ratio."""
+    edge = IMAGE_EDGES.get(resolution, IMAGE_EDGES["1K"])
+    width_ratio, height_ratio = (float(part) for part in aspect_ratio.split(":"))
+    width = edge * math.sqrt(width_ratio / height_ratio)
+    height = edge * edge / width
+    return int(round(width / 16) * 16), int(round(height / 16) * 16)
+
+
+class SimulatedGeminiClient:
+    """Answer Gemini calls locally with the timing and failure profile of ``config``."""
+
+    def __init__(self, config: SimulatorConfig | None = None) -> None:
+        self.config = config or SimulatorConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.upload_calls = 0
+        self.generate_calls = 0
+        self.batch_calls = 0
+        self._batch_jobs: dict[str, _SimulatedBatch] = {}
+        self.files = SimpleNamespace(upload=self._upload)
+        self.models = SimpleNamespace(generate_content_stream=self._generate_content_stream)
+        self.batches = SimpleNamespace(create=self._create_batch, get=self._get_batch)
+        self.aio = SimpleNamespace(
+            files=SimpleNamespace(upload=self._upload_async),
+            models=SimpleNamespace(
+                generate_content_stream=self._generate_content_stream_async,
+                get=self._get_model_async,
+            ),
+        )
+
+    def _upload(self, *, file: object, config: object = None) -> types.File:
+        content = _read_file(file)
+        time.sleep(self._upload_delay(len(content)))
+        return self._uploaded_file(content, config)
+
+    async def _upload_async(self, *, file: object, config: object = None) -> types.File:
+        content = _read_file(file)
+        await asyncio.sleep(self._upload_delay(len(content)))
+        return self._uploaded_file(content, config)
+
+    def _generate_content_stream(
+        self,
+        *,
+        model: str,
+        contents: object,
+        config: types.GenerateContentConfig | None = None,
+    ) -> Iterator[types.GenerateContentResponse]:
+        steps = self._plan(model, config)
+        for step in steps:
+            time.sleep(step.delay_seconds)
+            yield step.chunk
+
+    async def _generate_content_stream_async(
+        self,
+        *,
+        model: str,
+        contents: object,
+        config: types.GenerateContentConfig | None = None,
+    ) -> AsyncIterator[types.GenerateContentResponse]:
+        # Rendering a size for the first time takes a moment, so keep it off the event loop.
+        await asyncio.to_thread(simulated_image_png, *_requested_dimensions(config))
+        # Like the real client, failures surface when the request is made, before any chunk.
+        steps = self._plan(model, config)
+
+        async def stream() -> AsyncIterator[types.GenerateContentResponse]:
+            for step in steps:
+                await asyncio.sleep(step.delay_seconds)
+                yield step.chunk
+
+        return stream()
+
+    async def _get_model_async(self, *, model: str, config: object = None) -> types.Model:
+        await asyncio.sleep(0)
+        return types.Model(name=model if model.startswith("models/") else f"models/{model}")
+
+    def _create_batch(self, *, model: str, src: object, config: object = None) -> types.BatchJob:
+        requests = list(src.inlined_requests or []) if isinstance(src, types.BatchJobSource) else list(src)
+        name = f"batches/{uuid.uuid4().hex}"
+        with self._lock:
+            self.batch_calls += 1
+            ready_at = time.monotonic() + self._jittered(self.config.batch_seconds)
+            self._batch_jobs[name] = _SimulatedBatch(model, requests, ready_at)
+        return types.BatchJob(name=name, model=model, state=types.JobState.JOB_STATE_PENDING)
+
+    def _get_batch(self, *, name: str, config: object = None) -> types.BatchJob:
+        batch = self._batch_jobs.get(name)
+        if batch is None:
+            raise errors.ClientError(
+                404,
+                {"error": {"code": 404, "message": f"Batch {name} not found.", "status": "NOT_FOUND"}},
+            )
+        if time.monotonic() < batch.ready_at:
+            return types.BatchJob(name=name, model=batch.model, state=types.JobState.JOB_STATE_RUNNING)
+        if batch.responses is None:
+            batch.responses = [self._batch_response(batch.model, request) for request in batch.requests]
+        return types.BatchJob(
+            name=name,
+            model=batch.model,
+            state=types.JobState.JOB_STATE_SUCCEEDED,
+            dest=types.BatchJobDestination(inlined_responses=batch.responses),
+        )
+
+    def _batch_response(self, model: str, request: types.InlinedRequest) -> types.InlinedResponse:
+        # Batch items fail one by one, with the error the streaming call would have raised.
+        try:
+            steps = self._plan(request.model or model, request.config)
+        except errors.APIError as error:
+            return types.InlinedResponse(
+                metadata=request.metadata,
+                error=types.JobError(code=error.code, message=error.message),
+            )
+        parts = [part for step in steps for part in step.chunk.candidates[0].content.parts]
+        return types.InlinedResponse(
+            metadata=request.metadata,
+            response=types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+            ),
+        )
+
+    def _plan(self, model: str, config: types.GenerateContentConfig | None) -> list[_Step]:
+        with self._lock:
+            self.generate_calls += 1
+            roll = self._random.random()
+            stalled = self._random.random() < self.config.stall_rate
+            first_chunk_delay = self._jittered(self.config.first_chunk_seconds)
+            stream_delay = self._jittered(self.config.stream_seconds)
+
+        if roll < self.config.rate_limit_rate:
+            raise errors.ClientError(
+                429,
+                {"error": {"code": 429, "message": "Resource has been exhausted.", "status": "RESOURCE_EXHAUSTED"}},
+            )
+        if roll < self.config.rate_limit_rate + self.config.unavailable_rate:
+            raise errors.ServerError(
+                503,
+                {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}},
+            )
+
+        width, height = _requested_dimensions(config)
+        text_chunks = max(1, self.config.text_chunks)
+        between_chunks = stream_delay / text_chunks
+        steps = [
+            _Step(
+                first_chunk_delay if index == 0 else between_chunks,
+                _chunk(types.Part.from_text(text=f"Simulated {model} output, part {index + 1}. ")),
+            )
+            for index in range(text_chunks)
+        ]
+        image_part = types.Part.from_bytes(data=simulated_image_png(width, height), mime_type="image/png")
+        steps.append(
+            _Step(between_chunks + (self.config.stall_seconds if stalled else 0.0), _chunk(image_part))
+        )
+        return steps
+
+    def _upload_delay(self, size_bytes: int) -> float:
+        with self._lock:
+            self.upload_calls += 1
+            return self._jittered(self.config.upload_seconds + self.config.upload_seconds_per_mb * size_bytes / 1e6)
+
+    def _jittered(self, seconds: float) -> float:
+        return max(0.0, seconds * (1 + self._random.uniform(-self.config.jitter, self.config.jitter)))
+
+    def _uploaded_file(self, content: bytes, config: object) -> types.File:
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        mime_type = config.get("mime_type") if isinstance(config, dict) else None
+        return types.File(
+            name=f"files/{digest}",
+            uri=f"https://simulator.invalid/v1beta/files/{digest}",
+            mime_type=mime_type,
+            size_bytes=len(content),
+            expiration_time=datetime.now(timezone.utc) + timedelta(seconds=settings.GEMINI_FILE_TTL_SECONDS),
+        )
+
+
+def _requested_dimensions(config: types.GenerateContentConfig | None) -> tuple[int, int]:
+    image_config = config.image_config if config is not None else None
+    if image_config is None:
+        return image_dimensions("1K", "1:1")
+    return image_dimensions(image_config.image_size or "1K", image_config.aspect_ratio or "1:1")
+
+
+def _chunk(part: types.Part) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+    )
+
+
+def _read_file(file: object) -> bytes:
+    if isinstance(file, str | os.PathLike):
+        with open(file, "rb") as handle:
+            return handle.read()
+    return file.read()
@@ -1,110 +1,384 @@
-import concurrent.futures
+import asyncio
+import contextvars
+import heapq
 import logging
-import threading
+import math
 import time
 import uuid
-from dataclasses import asdict, dataclass
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import partial
 
-from backend.services.generation_service import GenerationExecutionError, GenerationRequest, execute_generation
+from backend.config import settings
+
+from backend.services import tracing
+from backend.services.generation_service import (
+    GenerationExecutionError,
+    GenerationRequest,
+    execute_generation,
+    result_cache_key,
+)
+from backend.services.image_transcoding import get_output_transcoder
+from backend.services.job_events import TERMINAL_EVENT_TYPES, JobEvent, JobEventBroker
+from backend.services.job_store import (
+    ORIGINAL_VARIANT,
+    TERMINAL_JOB_STATUSES,
+    GenerationJob,
+    GenerationJobStore,
+    JobImage,
+    create_job_store,
+)
+from backend.services.metrics import JOB_QUEUE_DEPTH, JOB_QUEUE_WAIT_SECONDS, JOBS_IN_FLIGHT
+from backend.services.mime_utils import sniff_image_mime_type
+from backend.services.traffic_capture import capture_traffic, describe_request, get_traffic_capture
 
 logger = logging.getLogger(__name__)
 
-JOB_TTL_SECONDS = 60 * 30
-MAX_STORED_JOBS = 100
+MAX_CONCURRENT_JOBS = 8
+EVENT_IDLE_TIMEOUT_SECONDS = 5.0
+JOB_PRIORITIES = ("interactive", "bulk")
+DURATION_SMOOTHING = 0.2
 
 
-@dataclass
-class GenerationJob:
-    """Track one in-memory generation task for lightweight polling."""
+class JobQueueFullError(RuntimeError):
+    """Signal that the scheduler refuses new work until the queue drains."""
+
+    def __init__(self, retry_after_seconds: int) -> None:
+        super().__init__("Черга генерацій переповнена. Спробуйте трохи пізніше.")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class IdempotencyKeyConflictError(RuntimeError):
+    """Signal that an idempotency key was reused for a different request."""
+
+    def __init__(self) -> None:
+        super().__init__("Ключ ідемпотентності вже використано для іншого запиту.")
+
+
+@dataclass(frozen=True)
+class QueuePosition:
+    """Where a queued job stands and when it is expected to start."""
+
+    position: int
+    estimated_start_at: float
+
+
+@dataclass(frozen=True)
+class GenerationSubmission:
+    """The job answering a submission and whether it already existed."""
 
     job_id: str
-    status: str
-    created_at: float
-    updated_at: float
-    result: dict[str, object] | None = None
-    error: str | None = None
+    attached: bool = False
 
 
-class InMemoryGenerationJobStore:
-    """Store short-lived job state inside a single FastAPI worker process."""
+@dataclass(frozen=True)
+class GenerationBatchSubmission:
+    """The batch identifier and the jobs created for its items, in item order."""
 
-    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS) -> None:
-        self._jobs: dict[str, GenerationJob] = {}
-        self._lock = threading.Lock()
-        self._ttl_seconds = ttl_seconds
+    batch_id: str
+    job_ids: tuple[str, ...]
 
-    def create_job(self) -> str:
-        """Create a queued job entry and prune expired records."""
-        now = time.time()
-        job = GenerationJob(
-            job_id=str(uuid.uuid4()),
-            status="queued",
-            created_at=now,
-            updated_at=now,
-        )
-        with self._lock:
-            self._prune_locked(now)
-            self._jobs[job.job_id] = job
-        return job.job_id
 
-    def mark_running(self, job_id: str) -> None:
-        """Mark a queued job as actively processing."""
-        self._update(job_id, status="running", error=None)
+@dataclass
+class _QueuedJob:
+    job_id: str
+    job: Callable[..., Awaitable[None]]
+    args: tuple[object, ...]
+    enqueued_at: float
+    priority: str
+    # Jobs run in the submitter's context, so they stay in the request's trace.
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
 
-    def mark_completed(self, job_id: str, result: dict[str, object]) -> None:
-        """Persist the finished generation payload for polling clients."""
-        self._update(job_id, status="completed", result=result, error=None)
 
-    def mark_failed(self, job_id: str, error: str) -> None:
-        """Persist the terminal failure message for polling clients."""
-        self._update(job_id, status="failed", error=error, result=None)
+class GenerationJobScheduler:
+    """Admit, prioritize and run job coroutines on the serving event loop.
 
-    def get_job(self, job_id: str) -> GenerationJob | None:
-        """Return the current job snapshot or None if it expired or never existed."""
-        now = time.time()
-        with self._lock:
-            self._prune_locked(now)
-            job = self._jobs.get(job_id)
-            if job is None:
-                return None
-            return GenerationJob(**asdict(job))
-
-    def _update(self, job_id: str, **changes: object) -> None:
-        now = time.time()
-        with self._lock:
-            self._prune_locked(now)
-            job = self._jobs.get(job_id)
-            if job is None:
+    Jobs wait in per-priority FIFO lanes; interactive work is always started
+    before bulk work. The total number of waiting jobs is capped so a burst
+    cannot pile up reference-image bytes in memory, and the rejection carries
+    a ``Retry-After`` estimate derived from the observed job duration.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_JOBS,
+        max_queue_depth: int = settings.JOB_QUEUE_MAX_DEPTH,
+        initial_duration_seconds: float = settings.JOB_DURATION_ESTIMATE_SECONDS,
+    ) -> None:
+        self._max_concurrency = max_concurrency
+        self._max_queue_depth = max_queue_depth
+        self._lanes: dict[str, deque[_QueuedJob]] = {priority: deque() for priority in JOB_PRIORITIES}
+        self._running: dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._average_duration = initial_duration_seconds
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def lane_depths(self) -> dict[str, int]:
+        return {priority: len(lane) for priority, lane in self._lanes.items()}
+
+    def ensure_capacity(self, count: int = 1) -> None:
+        """Raise ``JobQueueFullError`` when ``count`` more jobs would exceed the queue depth.
+
+        Batches are admitted as a whole, so they never end up half queued.
+        """
+        free_slots = max(0, self._max_concurrency - len(self._running))
+        overflow = self.queue_depth + count - free_slots - self._max_queue_depth
+        if overflow > 0:
+            # A queue slot frees up every time a waiting job starts.
+            wait_seconds = self._estimate_start_offsets(overflow)[-1]
+            raise JobQueueFullError(max(1, math.ceil(wait_seconds)))
+
+    async def submit(
+        self,
+        job_id: str,
+        job: Callable[..., Awaitable[None]],
+        *args: object,
+        priority: str = "interactive",
+    ) -> None:
+        """Queue ``job(*args)`` in the given lane and start it as soon as a slot frees up."""
+        self.ensure_capacity()
+        self._lanes[priority].append(_QueuedJob(job_id, job, args, time.time(), priority))
+        self._dispatch()
+
+    def get_position(self, job_id: str) -> QueuePosition | None:
+        """Return the 1-based queue position and estimated start time of a waiting job."""
+        queued_ids = [queued.job_id for priority in JOB_PRIORITIES for queued in self._lanes[priority]]
+        if job_id not in queued_ids:
+            return None
+        index = queued_ids.index(job_id)
+        start_offsets = self._estimate_start_offsets(index + 1)
+        return QueuePosition(position=index + 1, estimated_start_at=time.time() + start_offsets[index])
+
+    def estimate_next_status_at(self, job_id: str) -> float | None:
+        """Predict when a job of this worker changes status: a queued job starts, a running one ends."""
+        started_at = self._running.get(job_id)
+        if started_at is not None:
+            return max(time.time(), started_at + self._average_duration)
+        position = self.get_position(job_id)
+        return position.estimated_start_at if position is not None else None
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self._max_concurrency:
+            queued = self._pop_next()
+            if queued is None:
                 return
-            for field_name, value in changes.items():
-                setattr(job, field_name, value)
-            job.updated_at = now
-
-    def _prune_locked(self, now: float) -> None:
-        expired_job_ids = [
-            job_id
-            for job_id, job in self._jobs.items()
-            if job.status in {"completed", "failed"} and (now - job.updated_at) > self._ttl_seconds
+            self._running[queued.job_id] = time.time()
+            JOB_QUEUE_WAIT_SECONDS.observe(time.time() - queued.enqueued_at, priority=queued.priority)
+            task = asyncio.get_running_loop().create_task(self._run(queued), context=queued.context)
+            # Keep a strong reference so the loop cannot garbage-collect running jobs.
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _pop_next(self) -> _QueuedJob | None:
+        for priority in JOB_PRIORITIES:
+            if self._lanes[priority]:
+                return self._lanes[priority].popleft()
+        return None
+
+    async def _run(self, queued: _QueuedJob) -> None:
+        try:
+            # Jobs submitted by one request (a batch) share its context; each still reports only its own stages.
+            with tracing.child_trace():
+                tracing.record_span(
+                    "generation.queue_wait",
+                    time.perf_counter() - (time.time() - queued.enqueued_at),
+                    priority=queued.priority,
+                )
+                await queued.job(*queued.args)
+        finally:
+            started_at = self._running.pop(queued.job_id, time.time())
+            duration = time.time() - started_at
+            self._average_duration += DURATION_SMOOTHING * (duration - self._average_duration)
+            self._dispatch()
+
+    def _estimate_start_offsets(self, count: int) -> list[float]:
+        """Simulate slots freeing up to predict when the next ``count`` queued jobs start."""
+        now = time.time()
+        slot_free_at = [
+            max(0.0, self._average_duration - (now - started_at)) for started_at in self._running.values()
         ]
-        for job_id in expired_job_ids:
-            self._jobs.pop(job_id, None)
+        slot_free_at += [0.0] * (self._max_concurrency - len(slot_free_at))
+        heapq.heapify(slot_free_at)
+        offsets = []
+        for _ in range(count):
+            start = heapq.heappop(slot_free_at)
+            offsets.append(start)
+            heapq.heappush(slot_free_at, start + self._average_duration)
+        return offsets
 
-        overflow = len(self._jobs) - MAX_STORED_JOBS
-        if overflow > 0:
-            oldest_job_ids = sorted(self._jobs, key=lambda job_id: self._jobs[job_id].updated_at)[:overflow]
-            for job_id in oldest_job_ids:
-                self._jobs.pop(job_id, None)
 
+@dataclass(frozen=True)
+class _IdempotentSubmission:
+    job_id: str
+    request_key: str
+    expires_at: float
+
+
+class GenerationJobDeduplicator:
+    """Map repeated submissions onto the job that is already handling them.
+
+    Idempotency keys are remembered for ``window_seconds`` and always return
+    the same job. Identical normalized requests share one job while it is
+    queued or running, so retries and double-clicks never cost a second
+    Gemini call. Both maps live in this worker process only.
+    """
+
+    def __init__(self, window_seconds: float = settings.IDEMPOTENCY_WINDOW_SECONDS) -> None:
+        self._window_seconds = window_seconds
+        self._submissions: OrderedDict[str, _IdempotentSubmission] = OrderedDict()
+        self._inflight: dict[str, str] = {}
+
+    def find(self, request_key: str, idempotency_key: str | None) -> str | None:
+        """Return the job that already answers this submission, if any.
+
+        Raises ``IdempotencyKeyConflictError`` when the key belongs to another request.
+        """
+        self._prune(time.time())
+        if idempotency_key is not None:
+            submission = self._submissions.get(idempotency_key)
+            if submission is not None:
+                if submission.request_key != request_key:
+                    raise IdempotencyKeyConflictError()
+                return submission.job_id
+        return self._inflight.get(request_key)
+
+    def remember(self, job_id: str, request_key: str, idempotency_key: str | None) -> None:
+        """Record a submission under its idempotency key and as the in-flight job for its request."""
+        if idempotency_key is not None:
+            self._submissions[idempotency_key] = _IdempotentSubmission(
+                job_id=job_id,
+                request_key=request_key,
+                expires_at=time.time() + self._window_seconds,
+            )
+            self._submissions.move_to_end(idempotency_key)
+        self._inflight.setdefault(request_key, job_id)
+
+    def finish(self, job_id: str, request_key: str) -> None:
+        """Stop attaching new submissions to a job that reached a terminal state."""
+        if self._inflight.get(request_key) == job_id:
+            del self._inflight[request_key]
 
-_job_store = InMemoryGenerationJobStore()
-_job_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    def clear(self) -> None:
+        self._submissions.clear()
+        self._inflight.clear()
 
+    def _prune(self, now: float) -> None:
+        # Every key gets the same window, so insertion order is expiry order.
+        while self._submissions:
+            key, submission = next(iter(self._submissions.items()))
+            if submission.expires_at > now:
+                return
+            del self._submissions[key]
+
+
+_job_store: GenerationJobStore = create_job_store()
+_job_scheduler = GenerationJobScheduler()
+_job_events = JobEventBroker()
+_job_deduplicator = GenerationJobDeduplicator()
+_background_tasks: set[asyncio.Task] = set()
+
+JOB_QUEUE_DEPTH.set_function(
+    lambda: {(priority,): depth for priority, depth in _job_scheduler.lane_depths().items()}
+)
+JOBS_IN_FLIGHT.set_function(
+    lambda: {("queued",): _job_scheduler.queue_depth, ("running",): _job_scheduler.running_count}
+)
+
+
+async def submit_generation_job(
+    request: GenerationRequest,
+    priority: str = "interactive",
+    idempotency_key: str | None = None,
+) -> GenerationSubmission:
+    """Queue a background job and return its polling identifier immediately.
 
-def submit_generation_job(request: GenerationRequest) -> str:
-    """Queue a background job and return a polling identifier immediately."""
+    A repeated ``idempotency_key`` or an identical request that is still
+    queued or running returns the existing job instead of starting a new one.
+    Raises ``JobQueueFullError`` when the scheduler is saturated and
+    ``IdempotencyKeyConflictError`` when the key was used for another request.
+    """
+    if priority not in JOB_PRIORITIES:
+        raise ValueError(f"Invalid priority: {priority}")
+    request_key = result_cache_key(request)
+    try:
+        existing_job_id = _job_deduplicator.find(request_key, idempotency_key)
+    except IdempotencyKeyConflictError:
+        await _capture_submission(request, priority, "rejected", status="idempotency_conflict")
+        raise
+    existing_job = _job_store.get_job(existing_job_id) if existing_job_id is not None else None
+    if existing_job is not None:
+        logger.info("Attached submission to existing generation job %s", existing_job_id)
+        if existing_job.status not in TERMINAL_JOB_STATUSES:
+            _job_deduplicator.remember(existing_job_id, request_key, idempotency_key)
+        await _capture_submission(request, priority, "attached", status=existing_job.status, job_id=existing_job_id)
+        return GenerationSubmission(job_id=existing_job_id, attached=True)
+
+    try:
+        _job_scheduler.ensure_capacity()
+    except JobQueueFullError:
+        await _capture_submission(request, priority, "rejected", status="queue_full")
+        raise
     job_id = _job_store.create_job()
-    _job_executor.submit(_run_generation_job, job_id, request)
-    return job_id
+    _job_deduplicator.remember(job_id, request_key, idempotency_key)
+    _job_events.publish(job_id, "queued", status="queued")
+    await _job_scheduler.submit(
+        job_id,
+        _run_generation_job,
+        job_id,
+        request,
+        request_key,
+        priority,
+        priority=priority,
+    )
+    return GenerationSubmission(job_id=job_id)
+
+
+async def submit_generation_batch(
+    requests: list[GenerationRequest],
+    priority: str = "bulk",
+) -> GenerationBatchSubmission:
+    """Queue one job per batch item and return the batch identifier immediately.
+
+    The whole batch is admitted or rejected at once. Items never attach to
+    other jobs, because variants that happen to match are meant to produce
+    separate images; shared reference images are still preprocessed and
+    uploaded once thanks to the preprocessing and upload caches.
+    Raises ``JobQueueFullError`` when the scheduler cannot take every item.
+    """
+    if priority not in JOB_PRIORITIES:
+        raise ValueError(f"Invalid priority: {priority}")
+    if not requests:
+        raise ValueError("A batch needs at least one item")
+    _job_scheduler.ensure_capacity(len(requests))
+    batch_id = str(uuid.uuid4())
+    job_ids = []
+    for request in requests:
+        job_id = _job_store.create_job(batch_id=batch_id)
+        job_ids.append(job_id)
+        _job_events.publish(job_id, "queued", status="queued")
+        await _job_scheduler.submit(
+            job_id,
+            _run_generation_job,
+            job_id,
+            request,
+            result_cache_key(request),
+            priority,
+            priority=priority,
+        )
+    return GenerationBatchSubmission(batch_id=batch_id, job_ids=tuple(job_ids))
+
+
+def get_generation_queue_position(job_id: str) -> QueuePosition | None:
+    """Expose queue position and start estimate for jobs waiting in this worker."""
+    return _job_scheduler.get_position(job_id)
 
 
 def get_generation_job(job_id: str) -> GenerationJob | None:
@@ -112,15 +386,214 @@ def get_generation_job(job_id: str) -> GenerationJob | None:
     return _job_store.get_job(job_id)
 
 
-def _run_generation_job(job_id: str, request: GenerationRequest) -> None:
+def get_generation_next_status_at(job_id: str) -> float | None:
+    """Expose when a job of this worker is expected to change status, for poll interval hints."""
+    return _job_scheduler.estimate_next_status_at(job_id)
+
+
+async def wait_for_generation_job_change(
+    job_id: str,
+    timeout: float,
+    is_unchanged: Callable[[GenerationJob], bool],
+) -> GenerationJob | None:
+    """Hold a long-poll until ``is_unchanged(job)`` turns false, the job ends or ``timeout`` passes.
+
+    Events published for the job in this worker wake the wait right away;
+    jobs run by another worker are noticed by re-reading the shared store
+    every ``EVENT_IDLE_TIMEOUT_SECONDS``. Returns the latest job state.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    queue = _job_events.subscribe(job_id)
+    # The replayed history is already reflected in the store read below.
+    while not queue.empty():
+        queue.get_nowait()
+    try:
+        while True:
+            job = _job_store.get_job(job_id)
+            if job is None or job.status in TERMINAL_JOB_STATUSES or not is_unchanged(job):
+                return job
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(queue.get(), timeout=min(remaining, EVENT_IDLE_TIMEOUT_SECONDS))
+            except TimeoutError:
+                pass
+    finally:
+        _job_events.unsubscribe(job_id, queue)
+
+
+def get_generation_batch_jobs(batch_id: str) -> list[GenerationJob]:
+    """Expose the jobs of a batch in item order; empty for unknown or expired batches."""
+    return _job_store.get_batch_jobs(batch_id)
+
+
+def get_generation_image(job_id: str, model_name: str, variant: str = ORIGINAL_VARIANT) -> JobImage | None:
+    """Expose the raw image (or a transcoded variant) of a completed job for the result endpoint."""
+    return _job_store.get_image(job_id, model_name, variant)
+
+
+async def iter_generation_job_events(
+    job_id: str,
+    idle_timeout: float = EVENT_IDLE_TIMEOUT_SECONDS,
+) -> AsyncIterator[JobEvent]:
+    """Yield progress events for one job until it reaches a terminal state.
+
+    Jobs running in another worker publish nothing here, so on every idle
+    timeout the shared job store is checked and its status is reported
+    instead. A ``keepalive`` event is yielded on idle timeouts so streaming
+    responses stay open behind proxies.
+    """
+    queue = _job_events.subscribe(job_id)
+    last_status = None
+    check_store = queue.empty()
+    try:
+        while True:
+            if check_store:
+                job = _job_store.get_job(job_id)
+                if job is None:
+                    return
+                if job.status != last_status:
+                    last_status = job.status
+                    yield JobEvent(event_type=job.status, data={"status": job.status})
+                    if job.status in TERMINAL_EVENT_TYPES:
+                        return
+                else:
+                    yield JobEvent(event_type="keepalive")
+
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+            except TimeoutError:
+                check_store = True
+                continue
+
+            check_store = False
+            if "status" in event.data:
+                last_status = event.data["status"]
+            yield event
+            if event.event_type in TERMINAL_EVENT_TYPES:
+                return
+    finally:
+        _job_events.unsubscribe(job_id, queue)
+
+
+async def _run_generation_job(
+    job_id: str,
+    request: GenerationRequest,
+    request_key: str,
+    priority: str = "interactive",
+) -> None:
     """Execute the long-running image generation outside the request lifecycle."""
+    started_at = time.time()
     _job_store.mark_running(job_id)
+    _job_events.publish(job_id, "running", status="running")
+    status, result = "failed", {}
     try:
-        result = execute_generation(request)
-        _job_store.mark_completed(job_id, result)
+        with tracing.span("generation.job", job_id=job_id):
+            trace = tracing.current_trace()
+            result = await execute_generation(request, on_progress=partial(_job_events.publish, job_id))
+        if settings.GENERATION_TIMINGS_ENABLED and trace is not None:
+            result = {**result, "timings": trace.timings()}
+        # The SQLite store writes the image blobs here, which should not stall the event loop.
+        await asyncio.to_thread(_job_store.mark_completed, job_id, result)
+        _job_events.publish(job_id, "completed", status="completed")
+        status = "completed"
+        _start_output_transcoding(job_id, list(result.get("results", {})))
     except GenerationExecutionError as error:
         logger.warning("Generation job %s failed: %s", job_id, error)
         _job_store.mark_failed(job_id, str(error))
+        _job_events.publish(job_id, "failed", status="failed", error=str(error))
     except Exception as error:
         logger.exception("Generation job %s crashed", job_id)
         _job_store.mark_failed(job_id, str(error))
+        _job_events.publish(job_id, "failed", status="failed", error=str(error))
+    finally:
+        _job_deduplicator.finish(job_id, request_key)
+    await _capture_job_traffic(job_id, request, priority, started_at, status, result)
+
+
+async def _capture_submission(
+    request: GenerationRequest,
+    priority: str,
+    outcome: str,
+    *,
+    status: str,
+    job_id: str | None = None,
+) -> None:
+    """Record a submission that never runs a job of its own, so replays offer the same load."""
+    if get_traffic_capture() is None:
+        return
+    await capture_traffic(
+        {
+            "timestamp": time.time(),
+            "route": "submit",
+            "priority": priority,
+            "request": describe_request(request),
+            "outcome": outcome,
+            "status": status,
+            "job_id": job_id,
+        }
+    )
+
+
+async def _capture_job_traffic(
+    job_id: str,
+    request: GenerationRequest,
+    priority: str,
+    started_at: float,
+    status: str,
+    result: dict[str, object],
+) -> None:
+    if get_traffic_capture() is None:
+        return
+    job = _job_store.get_job(job_id)
+    submitted_at = job.created_at if job is not None else started_at
+    finished_at = time.time()
+    await capture_traffic(
+        {
+            "timestamp": submitted_at,
+            "route": "submit",
+            "priority": priority,
+            "request": describe_request(request),
+            "outcome": "scheduled",
+            "status": status,
+            "job_id": job_id,
+            "fallback_used": bool(result.get("fallback_used")),
+            "cached": bool(result.get("cached")),
+            "latency_seconds": {
+                "queue_wait": round(started_at - submitted_at, 3),
+                "run": round(finished_at - started_at, 3),
+                "total": round(finished_at - submitted_at, 3),
+            },
+        }
+    )
+
+
+def _start_output_transcoding(job_id: str, model_names: list[str]) -> None:
+    """Build WebP/AVIF/thumbnail variants after completion without holding a generation slot.
+
+    Clients get the original right away; the result endpoint serves a variant
+    once it is ready.
+    """
+    if not settings.OUTPUT_IMAGE_VARIANTS:
+        return
+    images = {}
+    for model_name in model_names:
+        image = _job_store.get_image(job_id, model_name)
+        if image is not None and sniff_image_mime_type(image.data, default=""):
+            images[model_name] = image
+    if not images:
+        return
+    task = asyncio.get_running_loop().create_task(_transcode_job_images(job_id, images))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _transcode_job_images(job_id: str, images: dict[str, JobImage]) -> None:
+    try:
+        variants = await get_output_transcoder().transcode(images)
+        if variants:
+            await asyncio.to_thread(_job_store.mark_variants_ready, job_id, variants)
+    except Exception:
+        logger.exception("Transcoding results of generation job %s failed", job_id)
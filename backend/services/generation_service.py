@@ -1,12 +1,23 @@
+import asyncio
 import base64
-import concurrent.futures
+import functools
+import hashlib
 import io
 import logging
+import time
+from collections.abc import Awaitable, Callable
 from dataclasses import dataclass
 
 from backend.config import prompts, settings
+from backend.services import tracing
+from backend.services.concurrency import get_latency_tracker, get_model_governor
 from backend.services.error_utils import format_error_with_retry
+from backend.services.image_preprocessing import get_reference_image_preprocessor, replace_extension
 from backend.services.image_service import ImageService
+from backend.services.metrics import GENERATION_FALLBACKS_TOTAL
+from backend.services.mime_utils import sniff_image_mime_type
+from backend.services.result_cache import CACHE_MODES, get_result_cache, make_result_cache_key
+from backend.services.upload_ingestion import SpooledPayload
 
 logger = logging.getLogger(__name__)
 
@@ -36,16 +47,47 @@ PROMPT_MAP = {
 }
 
 
+ProgressCallback = Callable[..., None]
+
+
 class GenerationExecutionError(RuntimeError):
     """Wrap generation failures so routes can expose user-facing details."""
 
 
 @dataclass(frozen=True)
 class ReferenceImage:
-    """Keep uploaded image data alive after the request finishes."""
+    """Keep uploaded image data alive after the request finishes.
+
+    Uploads ingested by the router live in ``payload``, which spills large
+    photos to disk while the job waits; ``content`` holds in-memory bytes
+    for everything else (preprocessed variants, CLI input).
+    """
 
     filename: str
-    content: bytes
+    content: bytes = b""
+    payload: SpooledPayload | None = None
+
+    @functools.cached_property
+    def sha256(self) -> str:
+        """Content hash, computed once even when a batch shares the image across many jobs."""
+        if self.payload is not None:
+            return self.payload.sha256
+        return hashlib.sha256(self.content).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self.payload.size if self.payload is not None else len(self.content)
+
+    @property
+    def mime_type(self) -> str:
+        """Image type sniffed from the bytes, empty when they are not a known image format."""
+        if self.payload is not None:
+            return self.payload.mime_type
+        return sniff_image_mime_type(self.content[:16], default="")
+
+    def read_content(self) -> bytes:
+        """Return the image bytes, reading spilled uploads back from disk."""
+        return self.payload.read() if self.payload is not None else self.content
 
 
 @dataclass(frozen=True)
@@ -59,6 +101,7 @@ class GenerationRequest:
     temperature: float
     prompt_type: str
     reference_images: tuple[ReferenceImage, ...]
+    cache_mode: str = "off"
 
 
 def build_final_prompt(prompt: str, prompt_type: str) -> str:
@@ -90,6 +133,7 @@ def validate_generation_request(
     temperature: float,
     prompt_type: str,
     reference_images: tuple[ReferenceImage, ...],
+    cache_mode: str | None = None,
 ) -> GenerationRequest:
     """Normalize request data so the same payload can be reused by jobs and routes."""
     final_prompt = build_final_prompt(prompt, prompt_type)
@@ -105,6 +149,10 @@ def validate_generation_request(
     if resolution not in ALLOWED_RESOLUTIONS:
         raise ValueError(f"Invalid resolution: {resolution}")
 
+    cache_mode = cache_mode or settings.RESULT_CACHE_DEFAULT_MODE
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache mode: {cache_mode}")
+
     return GenerationRequest(
         prompt=final_prompt,
         model_mode=model_mode,
@@ -113,66 +161,137 @@ def validate_generation_request(
         temperature=temperature,
         prompt_type=prompt_type,
         reference_images=reference_images,
+        cache_mode=cache_mode,
+    )
+
+
+def target_models_for(model_mode: str) -> tuple[str, ...]:
+    """Return the models a model mode runs, in the order results are reported."""
+    flash_model, pro_model = settings.GEMINI_IMAGE_MODELS[:2]
+    if model_mode == "Flash":
+        return (flash_model,)
+    if model_mode == "Pro":
+        return (pro_model,)
+    return (flash_model, pro_model)
+
+
+def result_cache_key(request: GenerationRequest) -> str:
+    """Key a request by everything that shapes its output (see ``make_result_cache_key``)."""
+    return make_result_cache_key(
+        prompt=request.prompt,
+        models=target_models_for(request.model_mode),
+        aspect_ratio=request.aspect_ratio,
+        resolution=request.resolution,
+        temperature=request.temperature,
+        reference_image_hashes=tuple(image.sha256 for image in request.reference_images),
     )
 
 
-def execute_generation(request: GenerationRequest) -> dict[str, object]:
-    """Run the full multi-model generation flow and return frontend-ready payload."""
-    file_objects = _build_file_objects(request.reference_images)
+async def execute_generation(
+    request: GenerationRequest,
+    on_progress: ProgressCallback | None = None,
+) -> dict[str, object]:
+    """Run the full multi-model generation flow and return raw per-model results.
+
+    Each target model runs as its own asyncio task on the async Gemini client,
+    so the calling event loop stays responsive for the whole generation.
+    ``on_progress`` receives stage changes, streamed text and per-model outcomes.
+
+    With ``cache_mode="read"`` an identical earlier result is returned with
+    ``cached: True`` and no Gemini call; ``"refresh"`` skips the lookup but
+    stores the new result. Only complete, non-fallback results are cached.
+    """
+    notify = on_progress or _ignore_progress
+    cache_key = result_cache_key(request) if request.cache_mode != "off" else None
+    if request.cache_mode == "read":
+        with tracing.span("generation.cache_lookup") as lookup_span:
+            cached = await asyncio.to_thread(get_result_cache().get, cache_key)
+            lookup_span.set_attribute("hit", cached is not None)
+        if cached is not None:
+            notify("cache_hit")
+            return {**cached, "cached": True}
+
+    with tracing.span("generation.preprocess", images=len(request.reference_images)):
+        file_objects = await prepare_reference_files(request.reference_images)
 
     flash_model = settings.GEMINI_IMAGE_MODELS[0]
     pro_model = settings.GEMINI_IMAGE_MODELS[1]
-
-    if request.model_mode == "Flash":
-        target_models = [flash_model]
-    elif request.model_mode == "Pro":
-        target_models = [pro_model]
-    else:
-        target_models = [flash_model, pro_model]
+    target_models = list(target_models_for(request.model_mode))
 
     image_service = ImageService()
+    governor = get_model_governor()
     thinking_level = settings.IMAGE_DEFAULT_THINKING_LEVEL
 
-    def generate_with_model(model_name: str) -> tuple[str, dict[str, object]]:
+    async def generate_with_model(model_name: str) -> tuple[str, dict[str, object]]:
         model_thinking = thinking_level if "flash" in model_name.lower() else None
-        for file_obj in file_objects:
-            file_obj.seek(0)
-        return model_name, image_service.generate_image(
-            prompt=request.prompt,
-            aspect_ratio=request.aspect_ratio,
-            person_images=file_objects if file_objects else None,
-            resolution=request.resolution,
-            temperature=request.temperature,
-            model=model_name,
-            thinking_level=model_thinking,
-        )
+        started_at = time.perf_counter()
+        try:
+            with tracing.span("generation.model", model=model_name):
+                result = await governor.call(
+                    model_name,
+                    lambda: image_service.generate_image_async(
+                        prompt=request.prompt,
+                        aspect_ratio=request.aspect_ratio,
+                        person_images=file_objects if file_objects else None,
+                        resolution=request.resolution,
+                        temperature=request.temperature,
+                        model=model_name,
+                        thinking_level=model_thinking,
+                        on_progress=notify,
+                    ),
+                    on_retry=lambda attempt, delay, error: notify(
+                        "retrying", model=model_name, attempt=attempt, delay_seconds=round(delay, 2)
+                    ),
+                )
+        except Exception as error:
+            notify("model_failed", model=model_name, error=format_error_with_retry(error, "генерацію зображення"))
+            raise
+        get_latency_tracker().record(model_name, time.perf_counter() - started_at)
+        notify("model_completed", model=model_name, has_image=bool(result.get("image_bytes")))
+        return model_name, result
 
     try:
         results: dict[str, dict[str, object]] = {}
         errors: dict[str, str] = {}
         fallback_used = False
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(target_models)) as executor:
-            future_to_model = {executor.submit(generate_with_model, model): model for model in target_models}
-            for future in concurrent.futures.as_completed(future_to_model):
-                model = future_to_model[future]
-                try:
-                    model_name, result = future.result()
+        alternate_model = pro_model if target_models[0] == flash_model else flash_model
+        if request.model_mode != "Both" and settings.HEDGE_ENABLED:
+            fallback_used = await _generate_hedged(
+                target_models[0],
+                alternate_model,
+                generate_with_model,
+                results,
+                errors,
+                notify,
+            )
+        else:
+            outcomes = await asyncio.gather(
+                *(generate_with_model(model) for model in target_models),
+                return_exceptions=True,
+            )
+            for model, outcome in zip(target_models, outcomes):
+                if isinstance(outcome, Exception):
+                    logger.warning("Model %s failed: %s", model, outcome)
+                    errors[model] = format_error_with_retry(outcome, "генерацію зображення")
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    model_name, result = outcome
                     results[model_name] = result
-                except Exception as error:
-                    logger.warning("Model %s failed: %s", model, error)
-                    errors[model] = format_error_with_retry(error, "генерацію зображення")
 
-        if request.model_mode != "Both" and not results and errors:
-            fallback_model = pro_model if target_models[0] == flash_model else flash_model
-            logger.info("Fallback: trying %s after %s failed", fallback_model, target_models[0])
-            try:
-                fallback_name, fallback_result = generate_with_model(fallback_model)
-                results[fallback_name] = fallback_result
-                fallback_used = True
-            except Exception as error:
-                logger.error("Fallback model %s also failed: %s", fallback_model, error)
-                errors[fallback_model] = format_error_with_retry(error, "генерацію зображення")
+            if request.model_mode != "Both" and not results and errors:
+                fallback_model = alternate_model
+                logger.info("Fallback: trying %s after %s failed", fallback_model, target_models[0])
+                notify("fallback", model=fallback_model)
+                try:
+                    fallback_name, fallback_result = await generate_with_model(fallback_model)
+                    results[fallback_name] = fallback_result
+                    fallback_used = True
+                    GENERATION_FALLBACKS_TOTAL.inc(model=fallback_model, reason="fallback")
+                except Exception as error:
+                    logger.error("Fallback model %s also failed: %s", fallback_model, error)
+                    errors[fallback_model] = format_error_with_retry(error, "генерацію зображення")
 
         if not results:
             all_errors = "; ".join(errors.values())
@@ -180,10 +299,10 @@ def execute_generation(request: GenerationRequest) -> dict[str, object]:
 
         response_results = {}
         for model_name, result in results.items():
+            image_bytes = result.get("image_bytes") or None
             response_results[model_name] = {
-                "image_base64": base64.b64encode(result["image_bytes"]).decode()
-                if result.get("image_bytes")
-                else None,
+                "image_bytes": image_bytes,
+                "mime_type": sniff_image_mime_type(image_bytes) if image_bytes else None,
                 "text_output": result.get("text_output", ""),
                 "error": None,
             }
@@ -191,12 +310,16 @@ def execute_generation(request: GenerationRequest) -> dict[str, object]:
         for model_name, error_message in errors.items():
             if model_name not in response_results:
                 response_results[model_name] = {
-                    "image_base64": None,
+                    "image_bytes": None,
+                    "mime_type": None,
                     "text_output": "",
                     "error": error_message,
                 }
 
-        return {"results": response_results, "fallback_used": fallback_used}
+        payload = {"results": response_results, "fallback_used": fallback_used}
+        if cache_key is not None and not errors and not fallback_used:
+            await asyncio.to_thread(get_result_cache().put, cache_key, payload)
+        return payload
     except GenerationExecutionError:
         raise
     except Exception as error:
@@ -205,11 +328,133 @@ def execute_generation(request: GenerationRequest) -> dict[str, object]:
         raise GenerationExecutionError(error_message) from error
 
 
+async def _generate_hedged(
+    primary_model: str,
+    alternate_model: str,
+    generate_with_model: Callable[[str], Awaitable[tuple[str, dict[str, object]]]],
+    results: dict[str, dict[str, object]],
+    errors: dict[str, str],
+    notify: ProgressCallback,
+) -> bool:
+    """Race the alternate model against a slow primary and keep the first image.
+
+    The alternate starts once the primary exceeds its hedge deadline (learned
+    p95 or ``HEDGE_DELAY_SECONDS``), or right away if the primary fails or
+    answers without an image. Only a result with an image wins and cancels the
+    other task; if neither model produces one, the primary's text-only answer
+    is kept over the alternate's. Returns True when the alternate model's
+    result is used.
+    """
+    hedge_delay = get_latency_tracker().hedge_delay(primary_model)
+    tasks = {asyncio.create_task(generate_with_model(primary_model)): primary_model}
+    pending = set(tasks)
+    hedge_started = False
+    imageless: dict[str, dict[str, object]] = {}
+    try:
+        while pending:
+            alternate_started = alternate_model in tasks.values()
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=None if alternate_started else hedge_delay,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                hedge_started = True
+                logger.info("Hedging: %s exceeded %.1fs, also trying %s", primary_model, hedge_delay, alternate_model)
+                notify("hedging", model=alternate_model, after_seconds=round(hedge_delay, 2))
+                task = asyncio.create_task(generate_with_model(alternate_model))
+                tasks[task] = alternate_model
+                pending.add(task)
+                continue
+
+            for task in done:
+                model = tasks[task]
+                error = task.exception()
+                if error is None:
+                    model_name, result = task.result()
+                    if result.get("image_bytes"):
+                        results[model_name] = result
+                    else:
+                        logger.warning("Model %s returned no image", model)
+                        imageless[model_name] = result
+                else:
+                    logger.warning("Model %s failed: %s", model, error)
+                    errors[model] = format_error_with_retry(error, "генерацію зображення")
+
+            if results:
+                break
+
+            if alternate_model not in tasks.values():
+                logger.info("Fallback: trying %s after %s returned no image", alternate_model, primary_model)
+                notify("fallback", model=alternate_model)
+                task = asyncio.create_task(generate_with_model(alternate_model))
+                tasks[task] = alternate_model
+                pending.add(task)
+
+        if not results and imageless:
+            model_name = primary_model if primary_model in imageless else alternate_model
+            results[model_name] = imageless[model_name]
+        if results and primary_model not in results:
+            reason = "hedge" if hedge_started else "fallback"
+            GENERATION_FALLBACKS_TOTAL.inc(model=alternate_model, reason=reason)
+            return True
+        return False
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def _ignore_progress(event_type: str, **data: object) -> None:
+    pass
+
+
+def encode_images_as_base64(payload: dict[str, object]) -> dict[str, object]:
+    """Inline raw image bytes as base64 for callers that want one self-contained JSON body."""
+    encoded_results = {}
+    for model_name, result in payload["results"].items():
+        image_bytes = result.get("image_bytes")
+        encoded_results[model_name] = {
+            "image_base64": base64.b64encode(image_bytes).decode() if image_bytes else None,
+            "text_output": result.get("text_output", ""),
+            "error": result.get("error"),
+        }
+    return {**payload, "results": encoded_results}
+
+
+async def prepare_reference_files(reference_images: tuple[ReferenceImage, ...]) -> list[io.BytesIO]:
+    """Preprocess reference images and wrap them as the file objects ``ImageService`` reads.
+
+    Uploads that spilled to disk are read back in a worker thread, so a large
+    photo never blocks the event loop.
+    """
+    return await asyncio.to_thread(_build_file_objects, await _preprocess_reference_images(reference_images))
+
+
+async def _preprocess_reference_images(reference_images: tuple[ReferenceImage, ...]) -> tuple[ReferenceImage, ...]:
+    """Swap reference photos for their downscaled variants before anything is uploaded."""
+    if not reference_images or not settings.REFERENCE_IMAGE_PREPROCESS_ENABLED:
+        return reference_images
+
+    preprocessor = get_reference_image_preprocessor()
+    contents = await asyncio.to_thread(lambda: [image.read_content() for image in reference_images])
+    variants = await asyncio.gather(
+        *(preprocessor.preprocess(content, image.sha256) for image, content in zip(reference_images, contents))
+    )
+    return tuple(
+        image
+        if variant is None
+        else ReferenceImage(filename=replace_extension(image.filename, variant.extension), content=variant.content)
+        for image, variant in zip(reference_images, variants)
+    )
+
+
 def _build_file_objects(reference_images: tuple[ReferenceImage, ...]) -> list[io.BytesIO]:
     """Convert persisted upload bytes back into file-like objects for Gemini."""
     file_objects: list[io.BytesIO] = []
     for image in reference_images:
-        file_obj = io.BytesIO(image.content)
+        file_obj = io.BytesIO(image.read_content())
         file_obj.name = image.filename or "image.jpg"
+        file_obj.mime_type = image.mime_type
         file_objects.append(file_obj)
     return file_objects
@@ -0,0 +1,194 @@
+"""Shrink reference photos before they are sent to Gemini.
+
+Phone photos are often 10-25 MB while the model only looks at roughly 1-2K
+pixels, so every reference image is EXIF-normalized, downscaled and
+re-encoded in a process pool before upload. Results are cached by content hash.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from backend.config import settings
+from backend.services.mime_utils import sniff_image_mime_type
+from backend.services.process_pool import create_process_pool
+
+logger = logging.getLogger(__name__)
+
+PREPROCESSABLE_MIME_TYPES = frozenset({"image/jpeg", "image/png", "image/webp", "image/bmp"})
+_OUTPUT_FORMATS = {"JPEG": (".jpg", "image/jpeg"), "WEBP": (".webp", "image/webp")}
+CACHE_MAX_ENTRIES = 512
+
+
+@dataclass(frozen=True)
+class PreprocessedImage:
+    """Bytes to upload in place of the original, with the format they are in."""
+
+    content: bytes
+    extension: str
+    mime_type: str
+
+
+def preprocess_image_bytes(content: bytes, max_edge: int, output_format: str, quality: int) -> PreprocessedImage | None:
+    """Apply EXIF orientation, fit into ``max_edge`` and re-encode.
+
+    Returns None when the original should be sent as is: it could not be
+    decoded, or it needs no rotation or resize and re-encoding would not make
+    it smaller. Runs in worker processes, so it only takes and returns plain data.
+    """
+    # Pillow is imported on first use so the web server boots without it.
+    from PIL import ExifTags, Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(content)) as original:
+            transformed = original.getexif().get(ExifTags.Base.Orientation, 1) != 1
+            image = ImageOps.exif_transpose(original)
+            if max(image.size) > max_edge:
+                image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+                transformed = True
+
+            if output_format == "JPEG" and "A" in image.getbands():
+                # JPEG has no alpha channel; flatten onto white instead of black.
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+                image = background
+            elif output_format == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            elif output_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+            buffer = io.BytesIO()
+            image.save(buffer, format=output_format, quality=quality, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning("Sending reference image unprocessed: %s", error)
+        return None
+
+    encoded = buffer.getvalue()
+    if not transformed and len(encoded) >= len(content):
+        return None
+    extension, mime_type = _OUTPUT_FORMATS[output_format]
+    return PreprocessedImage(content=encoded, extension=extension, mime_type=mime_type)
+
+
+class ReferenceImagePreprocessor:
+    """Run ``preprocess_image_bytes`` off the event loop and remember its results."""
+
+    def __init__(
+        self,
+        max_edge: int = settings.REFERENCE_IMAGE_MAX_EDGE,
+        output_format: str = settings.REFERENCE_IMAGE_FORMAT,
+        quality: int = settings.REFERENCE_IMAGE_QUALITY,
+        max_workers: int = settings.REFERENCE_IMAGE_PREPROCESS_WORKERS,
+        cache_max_bytes: int = settings.REFERENCE_IMAGE_CACHE_MAX_BYTES,
+    ) -> None:
+        if output_format not in _OUTPUT_FORMATS:
+            raise RuntimeError(f"Unsupported REFERENCE_IMAGE_FORMAT: {output_format}")
+        self._max_edge = max_edge
+        self._output_format = output_format
+        self._quality = quality
+        self._max_workers = max_workers
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self._cache: OrderedDict[str, PreprocessedImage | None] = OrderedDict()
+        self._inflight: dict[str, concurrent.futures.Future] = {}
+        self._cache_bytes = 0
+        self._cache_max_bytes = cache_max_bytes
+        self._lock = threading.Lock()
+
+    async def preprocess(self, content: bytes, content_hash: str | None = None) -> PreprocessedImage | None:
+        """Return the smaller variant of ``content``, or None to keep the original.
+
+        Concurrent calls for the same bytes (a batch sharing one photo) wait
+        for the first one instead of processing it again. If a worker process
+        dies, the pool is replaced for later calls and this photo is sent as is.
+        """
+        if sniff_image_mime_type(content, default="") not in PREPROCESSABLE_MIME_TYPES:
+            return None
+
+        key = content_hash or hashlib.sha256(content).hexdigest()
+        while True:
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = concurrent.futures.Future()
+                    break
+            await asyncio.shield(asyncio.wrap_future(pending))
+
+        try:
+            executor = self._get_executor()
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    executor,
+                    preprocess_image_bytes,
+                    content,
+                    self._max_edge,
+                    self._output_format,
+                    self._quality,
+                )
+            except concurrent.futures.BrokenExecutor as error:
+                logger.warning("Preprocessing pool broke, sending reference image unprocessed: %s", error)
+                self._discard_executor(executor)
+                return None
+            if result is not None:
+                logger.debug("Preprocessed reference image from %d to %d bytes", len(content), len(result.content))
+            self._remember(key, result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set_result(None)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, if any were started."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        # Worker processes are only started once the first photo needs them.
+        with self._lock:
+            if self._executor is None:
+                self._executor = create_process_pool(self._max_workers)
+            return self._executor
+
+    def _discard_executor(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        # Concurrent failures of the same pool must not throw away a replacement another call started.
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _remember(self, key: str, result: PreprocessedImage | None) -> None:
+        size = len(result.content) if result is not None else 0
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = result
+            self._cache_bytes += size
+            while self._cache and (
+                len(self._cache) > CACHE_MAX_ENTRIES or self._cache_bytes > self._cache_max_bytes
+            ):
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.content) if evicted is not None else 0
+
+
+def replace_extension(filename: str, extension: str) -> str:
+    """Keep the user's file stem but advertise the format the bytes are now in."""
+    return os.path.splitext(filename)[0] + extension
+
+
+_preprocessor = ReferenceImagePreprocessor()
+
+
+def get_reference_image_preprocessor() -> ReferenceImagePreprocessor:
+    """Return the preprocessor shared by every generation in this process."""
+    return _preprocessor
@@ -1,16 +1,37 @@
+import asyncio
 import base64
+import concurrent.futures
+import io
 import logging
-from google.genai import types
-from backend.services.gemini_client import get_gemini_client
+import time
+from backend.services import tracing
+from backend.services.gemini_client import get_gemini_client_pool
+from backend.services.metrics import (
+    GEMINI_FIRST_CHUNK_SECONDS,
+    GEMINI_GENERATION_SECONDS,
+    GEMINI_RECEIVED_BYTES_TOTAL,
+    GEMINI_UPLOAD_SECONDS,
+    GEMINI_UPLOADED_BYTES_TOTAL,
+)
 from backend.services.mime_utils import guess_mime_type
+from backend.services.upload_cache import get_upload_cache
 from backend.config import settings
 
 logger = logging.getLogger(__name__)
 
+_upload_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.IMAGE_UPLOAD_MAX_WORKERS,
+    thread_name_prefix="gemini-upload",
+)
+
+
+def _ignore_progress(event_type, **data):
+    pass
+
 
 class ImageService:
     def __init__(self):
-        self.client = get_gemini_client()
+        self.pool = get_gemini_client_pool()
 
     def generate_image(
         self,
@@ -22,30 +43,197 @@ class ImageService:
         model=None,
         thinking_level="HIGH",
     ):
+        model_name = self._resolve_model(prompt, model)
+
+        payloads = self._read_reference_images(person_images) if person_images else []
+        image_bytes = None
+        text_output = []
+
+        with self.pool.lease(self._upload_holders(payloads)) as member:
+            file_uris = self._upload_reference_images(member, payloads)
+            for chunk in member.client.models.generate_content_stream(
+                model=model_name,
+                contents=self._build_contents(prompt, payloads, file_uris),
+                config=self._build_config(model_name, aspect_ratio, resolution, temperature, thinking_level),
+            ):
+                image_bytes = self._collect_chunk(chunk, image_bytes, text_output)
+
+        return {
+            'image_bytes': image_bytes,
+            'text_output': "".join(text_output)
+        }
+
+    async def generate_image_async(
+        self,
+        prompt,
+        aspect_ratio="1:1",
+        person_images=None,
+        resolution="1K",
+        temperature=1.0,
+        model=None,
+        thinking_level="HIGH",
+        on_progress=None,
+    ):
+        """Same contract as ``generate_image`` but built on ``client.aio``.
+
+        Uploads and the response stream are awaited on the event loop, so a
+        worker can keep many generations in flight without a thread for each.
+        Both go through one pooled client, preferably one that already holds
+        the uploads.
+        ``on_progress(event_type, **data)`` is told about uploads, the start of
+        generation and every text part as it streams in.
+        """
+        model_name = self._resolve_model(prompt, model)
+        notify = on_progress or _ignore_progress
+        started_at = time.perf_counter()
+
+        payloads = self._read_reference_images(person_images) if person_images else []
+        upload_indexes = [index for index, (_, _, send_inline) in enumerate(payloads) if not send_inline]
+        inline_bytes = sum(len(content) for content, _, send_inline in payloads if send_inline)
+        if inline_bytes:
+            GEMINI_UPLOADED_BYTES_TOTAL.inc(inline_bytes, transport="inline")
+
+        image_bytes = None
+        text_output = []
+
+        with self.pool.lease(self._upload_holders(payloads)) as member:
+            if upload_indexes:
+                notify("uploading", model=model_name, files=len(upload_indexes))
+            uploads = await asyncio.gather(
+                *(self._upload_reference_image_async(member, *payloads[index][:2]) for index in upload_indexes)
+            )
+            if upload_indexes:
+                GEMINI_UPLOAD_SECONDS.observe(time.perf_counter() - started_at, model=model_name)
+                tracing.record_span("gemini.upload", started_at, model=model_name, files=len(upload_indexes))
+            file_uris = {index: upload.file_uri for index, upload in zip(upload_indexes, uploads)}
+
+            notify("generating", model=model_name)
+            requested_at = time.perf_counter()
+            stream = await member.client.aio.models.generate_content_stream(
+                model=model_name,
+                contents=self._build_contents(prompt, payloads, file_uris),
+                config=self._build_config(model_name, aspect_ratio, resolution, temperature, thinking_level),
+            )
+            first_chunk_at = None
+            async for chunk in stream:
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                    GEMINI_FIRST_CHUNK_SECONDS.observe(first_chunk_at - requested_at, model=model_name)
+                    tracing.record_span("gemini.first_chunk", requested_at, model=model_name)
+                seen_texts = len(text_output)
+                image_bytes = self._collect_chunk(chunk, image_bytes, text_output)
+                for text in text_output[seen_texts:]:
+                    notify("text", model=model_name, text=text)
+
+        GEMINI_GENERATION_SECONDS.observe(time.perf_counter() - started_at, model=model_name)
+        if first_chunk_at is not None:
+            tracing.record_span(
+                "gemini.stream",
+                first_chunk_at,
+                model=model_name,
+                image_bytes=len(image_bytes or b""),
+            )
+        if image_bytes:
+            GEMINI_RECEIVED_BYTES_TOTAL.inc(len(image_bytes), model=model_name)
+        return {
+            'image_bytes': image_bytes,
+            'text_output': "".join(text_output)
+        }
+
+    def build_batch_request(
+        self,
+        prompt,
+        aspect_ratio="1:1",
+        person_images=None,
+        resolution="1K",
+        temperature=1.0,
+        model=None,
+        thinking_level="HIGH",
+        metadata=None,
+        member=None,
+    ):
+        """Build one Batch API request with the same contents and config as ``generate_image``.
+
+        Reference images too big to travel inline are uploaded through the
+        (cached) Files API first, so a batch sharing images uploads each once.
+        ``member`` is the pooled client that will submit the batch; its uploads
+        are the only ones the batch can read.
+        """
+        from google.genai import types
+
+        model_name = self._resolve_model(prompt, model)
+
+        payloads = self._read_reference_images(person_images) if person_images else []
+        file_uris = self._upload_reference_images(member or self.pool.members[0], payloads)
+
+        return types.InlinedRequest(
+            model=model_name,
+            contents=self._build_contents(prompt, payloads, file_uris),
+            config=self._build_config(model_name, aspect_ratio, resolution, temperature, thinking_level),
+            metadata=metadata,
+        )
+
+    def read_response(self, response):
+        """Collect the image and text of a complete response, such as a Batch API result."""
+        text_output = []
+        image_bytes = self._collect_chunk(response, None, text_output)
+        return {
+            'image_bytes': image_bytes,
+            'text_output': "".join(text_output)
+        }
+
+    def _resolve_model(self, prompt, model):
         if not prompt or not prompt.strip():
             raise ValueError("Prompt is required for image generation.")
 
         model_name = model or settings.IMAGE_MODEL
         logger.debug(f"Generating image with model: {model_name}")
+        return model_name
 
-        file_parts = []
+    def _read_reference_images(self, person_images):
+        """Read reference images and decide which ones travel inline.
 
-        if person_images:
-            for uploaded_file in person_images:
-                uploaded_file.seek(0)
-                mime_type = guess_mime_type(uploaded_file.name, default='image/jpeg')
+        Images up to ``IMAGE_INLINE_MAX_BYTES`` are sent inline with the request,
+        bigger ones go through the (cached) Files API in parallel, so the
+        attachment stage costs roughly the slowest single upload.
+        """
+        payloads = []
+        inline_budget = settings.IMAGE_INLINE_MAX_TOTAL_BYTES
+        for uploaded_file in person_images:
+            uploaded_file.seek(0)
+            content = uploaded_file.read()
+            # Trust the type sniffed at ingestion over the client's file name; a PNG may be called photo.jpg.
+            mime_type = getattr(uploaded_file, 'mime_type', '') or guess_mime_type(
+                uploaded_file.name, default='image/jpeg'
+            )
+            send_inline = len(content) <= settings.IMAGE_INLINE_MAX_BYTES and len(content) <= inline_budget
+            if send_inline:
+                inline_budget -= len(content)
+            payloads.append((content, mime_type, send_inline))
+        return payloads
 
-                uploaded_file.seek(0)
-                uploaded_gemini_file = self.client.files.upload(
-                    file=uploaded_file,
-                    config={'mime_type': mime_type}
-                )
+    def _build_contents(self, prompt, payloads, file_uris):
+        from google.genai import types
+
+        file_parts = []
+        for index, (content, mime_type, send_inline) in enumerate(payloads):
+            if send_inline:
+                file_parts.append(types.Part.from_bytes(data=content, mime_type=mime_type))
+            else:
                 file_parts.append(
-                    types.Part(file_data=types.FileData(file_uri=uploaded_gemini_file.uri))
+                    types.Part(
+                        file_data=types.FileData(
+                            file_uri=file_uris[index],
+                            mime_type=mime_type,
+                        )
+                    )
                 )
 
         parts_list = file_parts + [types.Part.from_text(text=prompt)]
-        contents = [types.Content(role="user", parts=parts_list)]
+        return [types.Content(role="user", parts=parts_list)]
+
+    def _build_config(self, model_name, aspect_ratio, resolution, temperature, thinking_level):
+        from google.genai import types
 
         is_flash_model = "flash" in model_name.lower()
 
@@ -65,7 +253,7 @@ class ImageService:
                 ),
             ]
 
-        generate_content_config = types.GenerateContentConfig(
+        return types.GenerateContentConfig(
             thinking_config=thinking_config,
             image_config=types.ImageConfig(
                 aspect_ratio=aspect_ratio,
@@ -76,27 +264,56 @@ class ImageService:
             safety_settings=safety_settings,
         )
 
-        image_bytes = None
-        text_output = []
+    def _collect_chunk(self, chunk, image_bytes, text_output):
+        """Append streamed text and return the latest image bytes seen so far."""
+        if not chunk.parts:
+            return image_bytes
 
-        for chunk in self.client.models.generate_content_stream(
-            model=model_name,
-            contents=contents,
-            config=generate_content_config,
-        ):
-            if not chunk.parts:
-                continue
-
-            for part in chunk.parts:
-                if part.inline_data and part.inline_data.data:
-                    data = part.inline_data.data
-                    if isinstance(data, str):
-                        data = base64.b64decode(data)
-                    image_bytes = data
-                elif part.text:
-                    text_output.append(part.text)
+        for part in chunk.parts:
+            if part.inline_data and part.inline_data.data:
+                data = part.inline_data.data
+                if isinstance(data, str):
+                    data = base64.b64decode(data)
+                image_bytes = data
+            elif part.text:
+                text_output.append(part.text)
+        return image_bytes
 
-        return {
-            'image_bytes': image_bytes,
-            'text_output': "".join(text_output)
+    def _upload_holders(self, payloads):
+        """Name the pooled clients that already hold every Files API upload of this request."""
+        names = [member.name for member in self.pool.members]
+        holders = set(names)
+        for content, mime_type, send_inline in payloads:
+            if not send_inline:
+                holders &= get_upload_cache().holders(content, mime_type, names)
+        return holders
+
+    def _upload_reference_images(self, member, payloads):
+        pending_uploads = {
+            index: _upload_executor.submit(self._upload_reference_image, member, content, mime_type)
+            for index, (content, mime_type, send_inline) in enumerate(payloads)
+            if not send_inline
         }
+        return {index: future.result().file_uri for index, future in pending_uploads.items()}
+
+    def _upload_reference_image(self, member, content, mime_type):
+        return get_upload_cache().get_or_upload(
+            content,
+            mime_type,
+            lambda: member.client.files.upload(
+                file=io.BytesIO(content),
+                config={'mime_type': mime_type}
+            ),
+            namespace=member.name,
+        )
+
+    async def _upload_reference_image_async(self, member, content, mime_type):
+        async def upload():
+            # Only cache misses reach this point, so the counter tracks real traffic.
+            GEMINI_UPLOADED_BYTES_TOTAL.inc(len(content), transport="files_api")
+            return await member.client.aio.files.upload(
+                file=io.BytesIO(content),
+                config={'mime_type': mime_type}
+            )
+
+        return await get_upload_cache().get_or_upload_async(content, mime_type, upload, namespace=member.name)
@@ -0,0 +1,155 @@
+"""Produce lighter WebP/AVIF variants and thumbnails of generated images."""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import io
+import logging
+import threading
+from dataclasses import dataclass
+
+from backend.config import settings
+from backend.services.job_store import JobImage
+from backend.services.process_pool import create_process_pool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OutputVariant:
+    """How one named variant of a generated image is encoded."""
+
+    name: str
+    format: str
+    mime_type: str
+    quality: int
+    max_edge: int | None = None
+    options: tuple[tuple[str, object], ...] = ()
+
+
+OUTPUT_VARIANTS = {
+    "webp": OutputVariant("webp", "WEBP", "image/webp", quality=85, options=(("method", 4),)),
+    "avif": OutputVariant("avif", "AVIF", "image/avif", quality=60, options=(("speed", 8),)),
+    "thumbnail": OutputVariant(
+        "thumbnail",
+        "WEBP",
+        "image/webp",
+        quality=75,
+        max_edge=settings.OUTPUT_THUMBNAIL_MAX_EDGE,
+    ),
+}
+
+
+def transcode_image_bytes(data: bytes, variant: OutputVariant) -> bytes | None:
+    """Encode ``data`` as ``variant``; runs in worker processes, so it only handles plain data."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            if variant.max_edge is not None and max(image.size) > variant.max_edge:
+                image.thumbnail((variant.max_edge, variant.max_edge), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format=variant.format, quality=variant.quality, **dict(variant.options))
+    except (OSError, ValueError) as error:
+        logger.warning("Could not produce %s variant: %s", variant.name, error)
+        return None
+    return buffer.getvalue()
+
+
+class OutputImageTranscoder:
+    """Build the configured variants of generated images in a process pool."""
+
+    def __init__(
+        self,
+        variant_names: tuple[str, ...] = settings.OUTPUT_IMAGE_VARIANTS,
+        max_workers: int = settings.OUTPUT_TRANSCODE_WORKERS,
+    ) -> None:
+        unknown = [name for name in variant_names if name not in OUTPUT_VARIANTS]
+        if unknown:
+            raise RuntimeError(f"Unknown OUTPUT_IMAGE_VARIANTS: {', '.join(unknown)}")
+        from PIL import features
+
+        self._variants = [
+            OUTPUT_VARIANTS[name]
+            for name in variant_names
+            # Pillow builds without libavif simply skip that variant.
+            if OUTPUT_VARIANTS[name].format != "AVIF" or features.check("avif")
+        ]
+        self._max_workers = max_workers
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def variant_names(self) -> tuple[str, ...]:
+        return tuple(variant.name for variant in self._variants)
+
+    async def transcode(self, images: dict[str, JobImage]) -> dict[str, dict[str, JobImage]]:
+        """Return ``{model: {variant: image}}`` for every variant that is worth keeping.
+
+        Full-size variants that come out larger than the original are dropped,
+        since serving the original is then the better choice. If a worker
+        process dies, no variants are returned and the next job gets a new pool.
+        """
+        jobs = [(model_name, image, variant) for model_name, image in images.items() for variant in self._variants]
+        if not jobs:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            encoded = await asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, transcode_image_bytes, image.data, variant)
+                    for _, image, variant in jobs
+                )
+            )
+        except concurrent.futures.BrokenExecutor as error:
+            logger.warning("Transcoding pool broke, serving originals only: %s", error)
+            self._discard_executor(executor)
+            return {}
+
+        variants: dict[str, dict[str, JobImage]] = {}
+        for (model_name, image, variant), data in zip(jobs, encoded):
+            if data is None or (variant.max_edge is None and len(data) >= len(image.data)):
+                continue
+            variants.setdefault(model_name, {})[variant.name] = JobImage(
+                data=data,
+                mime_type=variant.mime_type,
+                etag=hashlib.sha256(data).hexdigest(),
+            )
+        return variants
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, if any were started."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = create_process_pool(self._max_workers)
+            return self._executor
+
+    def _discard_executor(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+_transcoder: OutputImageTranscoder | None = None
+_transcoder_lock = threading.Lock()
+
+
+def get_output_transcoder() -> OutputImageTranscoder:
+    """Return the transcoder shared by every job in this process, creating it on first use."""
+    global _transcoder
+    with _transcoder_lock:
+        if _transcoder is None:
+            _transcoder = OutputImageTranscoder()
+        return _transcoder
@@ -0,0 +1,71 @@
+"""In-process publish/subscribe of generation job progress for streaming endpoints."""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_JOBS = 200
+TERMINAL_EVENT_TYPES = frozenset({"completed", "failed"})
+
+
+@dataclass(frozen=True)
+class JobEvent:
+    """One progress notification, shaped like a Server-Sent Event."""
+
+    event_type: str
+    data: dict[str, object] = field(default_factory=dict)
+
+
+class JobEventBroker:
+    """Fan job events out to subscribers and replay history to late joiners.
+
+    Publishing happens on the event loop that runs the job; every subscriber
+    owns an ``asyncio.Queue`` on that same loop, so delivery never blocks.
+    """
+
+    def __init__(self, max_tracked_jobs: int = MAX_TRACKED_JOBS) -> None:
+        self._history: OrderedDict[str, list[JobEvent]] = OrderedDict()
+        self._subscribers: dict[str, set[asyncio.Queue[JobEvent]]] = {}
+        self._lock = threading.Lock()
+        self._max_tracked_jobs = max_tracked_jobs
+
+    def publish(self, job_id: str, event_type: str, **data: object) -> None:
+        """Record an event and hand it to everyone currently listening."""
+        event = JobEvent(event_type=event_type, data=data)
+        with self._lock:
+            self._history.setdefault(job_id, []).append(event)
+            self._history.move_to_end(job_id)
+            while len(self._history) > self._max_tracked_jobs:
+                self._history.popitem(last=False)
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for queue in subscribers:
+            queue.put_nowait(event)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue[JobEvent]:
+        """Return a queue pre-filled with past events, then fed with new ones."""
+        queue: asyncio.Queue[JobEvent] = asyncio.Queue()
+        with self._lock:
+            for event in self._history.get(job_id, ()):
+                queue.put_nowait(event)
+            self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue[JobEvent]) -> None:
+        """Stop delivering events to a disconnected client."""
+        with self._lock:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is None:
+                return
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def clear(self) -> None:
+        """Drop all recorded history and subscribers."""
+        with self._lock:
+            self._history.clear()
+            self._subscribers.clear()
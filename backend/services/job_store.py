@@ -0,0 +1,558 @@
+"""Job state storage backends shared by the generation job runner and status routes."""
+
+import dataclasses
+import hashlib
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Protocol
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL_SECONDS = 60 * 30
+# Queued or running rows only reach this bound when the worker that owned them died.
+ABANDONED_JOB_TTL_SECONDS = 60 * 60 * 6
+TERMINAL_JOB_STATUSES = frozenset({"completed", "failed"})
+ORIGINAL_VARIANT = "original"
+
+
+@dataclass(frozen=True, slots=True)
+class GenerationJob:
+    """Immutable snapshot of one generation task for lightweight polling."""
+
+    job_id: str
+    status: str
+    created_at: float
+    updated_at: float
+    result: Mapping[str, object] | None = None
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class JobImage:
+    """Raw generated image kept apart from the status payload and served on its own."""
+
+    data: bytes
+    mime_type: str
+    etag: str
+
+
+def split_result_images(result: dict[str, object]) -> tuple[dict[str, object], dict[str, JobImage]]:
+    """Move image bytes out of a generation result, leaving only small metadata behind.
+
+    Status polls then serialize a few hundred bytes, while the images are
+    fetched once from the binary result endpoint.
+    """
+    metadata_results = {}
+    images = {}
+    for model_name, model_result in result.get("results", {}).items():
+        image_bytes = model_result.get("image_bytes")
+        metadata = {key: value for key, value in model_result.items() if key != "image_bytes"}
+        if image_bytes:
+            image = JobImage(
+                data=image_bytes,
+                mime_type=model_result.get("mime_type") or "image/png",
+                etag=hashlib.sha256(image_bytes).hexdigest(),
+            )
+            images[model_name] = image
+            metadata.update(mime_type=image.mime_type, image_size=len(image_bytes), image_etag=image.etag)
+        else:
+            metadata.update(image_size=0, image_etag=None)
+        metadata_results[model_name] = metadata
+    return {**result, "results": metadata_results}, images
+
+
+def freeze_result(value: object) -> object:
+    """Turn a result into read-only mappings and tuples so snapshots can be shared safely."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze_result(item) for key, item in value.items()})
+    if isinstance(value, list | tuple):
+        return tuple(freeze_result(item) for item in value)
+    return value
+
+
+def thaw_result(value: object) -> object:
+    """Copy a frozen result back into dicts and lists, e.g. for ``json.dumps``."""
+    if isinstance(value, Mapping):
+        return {key: thaw_result(item) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [thaw_result(item) for item in value]
+    return value
+
+
+class GenerationJobStore(Protocol):
+    """Persist job state so polling endpoints can read what the runner wrote."""
+
+    def create_job(self, batch_id: str | None = None) -> str: ...
+
+    def get_batch_jobs(self, batch_id: str) -> list[GenerationJob]: ...
+
+    def mark_running(self, job_id: str) -> None: ...
+
+    def mark_completed(self, job_id: str, result: dict[str, object]) -> None: ...
+
+    def mark_failed(self, job_id: str, error: str) -> None: ...
+
+    def get_job(self, job_id: str) -> GenerationJob | None: ...
+
+    def mark_variants_ready(self, job_id: str, variants: dict[str, dict[str, JobImage]]) -> None: ...
+
+    def get_image(self, job_id: str, model_name: str, variant: str = ORIGINAL_VARIANT) -> JobImage | None: ...
+
+
+class InMemoryGenerationJobStore:
+    """Store short-lived job state inside a single FastAPI worker process.
+
+    Job records are immutable snapshots that are replaced on every state
+    change, so polls return them as is without copying. Finished jobs expire
+    through a heap that a background reaper thread drains. Completed jobs are
+    also evicted oldest-first once their images exceed ``max_result_bytes``.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = JOB_TTL_SECONDS,
+        max_result_bytes: int = settings.JOB_STORE_MAX_RESULT_BYTES,
+    ) -> None:
+        self._jobs: dict[str, GenerationJob] = {}
+        self._images: dict[str, dict[tuple[str, str], JobImage]] = {}
+        self._batches: dict[str, list[str]] = {}
+        self._job_batches: dict[str, str] = {}
+        self._result_bytes: OrderedDict[str, int] = OrderedDict()
+        self._total_result_bytes = 0
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._reaper_wakeup = threading.Condition(self._lock)
+        self._reaper: threading.Thread | None = None
+        self._closed = False
+        self._ttl_seconds = ttl_seconds
+        self._max_result_bytes = max_result_bytes
+
+    @property
+    def total_result_bytes(self) -> int:
+        return self._total_result_bytes
+
+    def create_job(self, batch_id: str | None = None) -> str:
+        """Create a queued job entry, optionally as the next item of a batch."""
+        now = time.time()
+        job = GenerationJob(
+            job_id=str(uuid.uuid4()),
+            status="queued",
+            created_at=now,
+            updated_at=now,
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            if batch_id is not None:
+                self._batches.setdefault(batch_id, []).append(job.job_id)
+                self._job_batches[job.job_id] = batch_id
+            self._ensure_reaper_locked()
+        return job.job_id
+
+    def get_batch_jobs(self, batch_id: str) -> list[GenerationJob]:
+        """Return the live jobs of a batch in submission order; empty once all of them expired."""
+        now = time.time()
+        with self._lock:
+            jobs = [self._jobs[job_id] for job_id in self._batches.get(batch_id, ()) if job_id in self._jobs]
+        return [job for job in jobs if not self._is_expired(job, now)]
+
+    def mark_running(self, job_id: str) -> None:
+        """Mark a queued job as actively processing."""
+        self._update(job_id, status="running", error=None)
+
+    def mark_completed(self, job_id: str, result: dict[str, object]) -> None:
+        """Persist the finished generation payload for polling clients."""
+        metadata, images = split_result_images(result)
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            self._images[job_id] = {(model_name, ORIGINAL_VARIANT): image for model_name, image in images.items()}
+            self._add_result_bytes_locked(job_id, sum(len(image.data) for image in images.values()))
+            self._update_locked(job_id, status="completed", result=freeze_result(metadata), error=None)
+            self._evict_over_budget_locked()
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        """Persist the terminal failure message for polling clients."""
+        self._update(job_id, status="failed", error=error, result=None)
+
+    def get_job(self, job_id: str) -> GenerationJob | None:
+        """Return the current job snapshot or None if it expired or never existed."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or self._is_expired(job, time.time()):
+            return None
+        return job
+
+    def mark_variants_ready(self, job_id: str, variants: dict[str, dict[str, JobImage]]) -> None:
+        """Attach transcoded variants of a completed job's images and list them in its result."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            images = self._images.get(job_id)
+            if job is None or images is None or job.result is None:
+                return
+            added_bytes = 0
+            model_results = dict(job.result.get("results", {}))
+            for model_name, model_variants in variants.items():
+                for variant, image in model_variants.items():
+                    previous = images.get((model_name, variant))
+                    added_bytes += len(image.data) - (len(previous.data) if previous is not None else 0)
+                    images[(model_name, variant)] = image
+                if model_name in model_results:
+                    model_results[model_name] = freeze_result(
+                        {**model_results[model_name], "variants": _variant_names(images, model_name)}
+                    )
+            # A new updated_at gives the status a new ETag, so revalidating pollers see the variants.
+            self._update_locked(job_id, result=freeze_result({**job.result, "results": model_results}))
+            self._add_result_bytes_locked(job_id, added_bytes)
+            self._evict_over_budget_locked()
+
+    def get_image(self, job_id: str, model_name: str, variant: str = ORIGINAL_VARIANT) -> JobImage | None:
+        """Return the raw image a completed job produced for ``model_name`` in ``variant``."""
+        with self._lock:
+            return self._images.get(job_id, {}).get((model_name, variant))
+
+    def reap(self, now: float | None = None) -> int:
+        """Drop every finished job whose TTL has passed and return how many were dropped."""
+        with self._lock:
+            return self._reap_locked(time.time() if now is None else now)
+
+    def close(self) -> None:
+        """Stop the reaper thread."""
+        with self._lock:
+            self._closed = True
+            self._reaper_wakeup.notify_all()
+
+    def _update(self, job_id: str, **changes: object) -> None:
+        with self._lock:
+            self._update_locked(job_id, **changes)
+
+    def _update_locked(self, job_id: str, **changes: object) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        now = time.time()
+        job = dataclasses.replace(job, updated_at=now, **changes)
+        self._jobs[job_id] = job
+        if job.status in TERMINAL_JOB_STATUSES:
+            expires_at = now + self._ttl_seconds
+            wake_reaper = not self._expiry_heap or expires_at < self._expiry_heap[0][0]
+            heapq.heappush(self._expiry_heap, (expires_at, job_id))
+            if wake_reaper:
+                self._reaper_wakeup.notify()
+
+    def _is_expired(self, job: GenerationJob, now: float) -> bool:
+        return job.status in TERMINAL_JOB_STATUSES and (now - job.updated_at) > self._ttl_seconds
+
+    def _reap_locked(self, now: float) -> int:
+        dropped = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < now:
+            _, job_id = heapq.heappop(self._expiry_heap)
+            job = self._jobs.get(job_id)
+            # Stale heap entries (the job changed again after this one was pushed) are skipped.
+            if job is not None and self._is_expired(job, now):
+                self._drop_locked(job_id)
+                dropped += 1
+        if dropped:
+            logger.debug("Reaped %d expired generation jobs", dropped)
+        return dropped
+
+    def _ensure_reaper_locked(self) -> None:
+        if self._reaper is None and not self._closed:
+            self._reaper = threading.Thread(target=self._run_reaper, name="job-store-reaper", daemon=True)
+            self._reaper.start()
+
+    def _run_reaper(self) -> None:
+        with self._lock:
+            while not self._closed:
+                now = time.time()
+                self._reap_locked(now)
+                timeout = max(0.0, self._expiry_heap[0][0] - now) if self._expiry_heap else None
+                self._reaper_wakeup.wait(timeout)
+
+    def _add_result_bytes_locked(self, job_id: str, size: int) -> None:
+        self._result_bytes[job_id] = self._result_bytes.get(job_id, 0) + size
+        self._total_result_bytes += size
+
+    def _evict_over_budget_locked(self) -> None:
+        # The newest result always stays, even if it alone is over the budget.
+        while self._total_result_bytes > self._max_result_bytes and len(self._result_bytes) > 1:
+            job_id = next(iter(self._result_bytes))
+            logger.info("Evicting generation job %s to stay within the result memory budget", job_id)
+            self._drop_locked(job_id)
+
+    def _drop_locked(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+        self._images.pop(job_id, None)
+        self._total_result_bytes -= self._result_bytes.pop(job_id, 0)
+        batch_id = self._job_batches.pop(job_id, None)
+        if batch_id is not None:
+            batch = self._batches[batch_id]
+            batch.remove(job_id)
+            if not batch:
+                del self._batches[batch_id]
+
+
+def _variant_names(images: dict[tuple[str, str], JobImage], model_name: str) -> list[str]:
+    return sorted(variant for image_model, variant in images if image_model == model_name)
+
+
+class SQLiteGenerationJobStore:
+    """Share job state between uvicorn workers through one SQLite file in WAL mode.
+
+    Every row carries an indexed ``expires_at`` so pruning is a range delete
+    instead of a scan, and it runs at most once per ``prune_interval_seconds``.
+    Like the in-memory store, the TTL starts when a job finishes; queued and
+    running rows are kept for ``abandoned_ttl_seconds`` so a job whose worker
+    died does not stay ``running`` forever.
+
+    Calls are short indexed statements on one connection per worker and run
+    on the caller's thread. Only the writes that carry image blobs are worth
+    moving off the event loop, and the job runner does so.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: int = JOB_TTL_SECONDS,
+        prune_interval_seconds: float = 30.0,
+        abandoned_ttl_seconds: int = ABANDONED_JOB_TTL_SECONDS,
+    ) -> None:
+        self._path = path
+        self._ttl_seconds = ttl_seconds
+        self._abandoned_ttl_seconds = abandoned_ttl_seconds
+        self._prune_interval_seconds = prune_interval_seconds
+        self._next_prune_at = 0.0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generation_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_generation_jobs_expires_at ON generation_jobs (expires_at)"
+            )
+            job_columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(generation_jobs)")}
+            if "batch_id" not in job_columns:
+                self._connection.execute("ALTER TABLE generation_jobs ADD COLUMN batch_id TEXT")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_generation_jobs_batch_id ON generation_jobs (batch_id)"
+            )
+            image_columns = {
+                row["name"] for row in self._connection.execute("PRAGMA table_info(generation_job_images)")
+            }
+            if image_columns and "variant" not in image_columns:
+                # Images only live for the job TTL, so the pre-variant table is simply rebuilt.
+                self._connection.execute("DROP TABLE generation_job_images")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generation_job_images (
+                    job_id TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    mime_type TEXT NOT NULL,
+                    etag TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, model_name, variant)
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_generation_job_images_expires_at"
+                " ON generation_job_images (expires_at)"
+            )
+
+    def create_job(self, batch_id: str | None = None) -> str:
+        """Insert a queued job row and prune expired records when due."""
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._prune_locked(now)
+            self._connection.execute(
+                "INSERT INTO generation_jobs (job_id, status, created_at, updated_at, expires_at, batch_id)"
+                " VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, now, now, self._expires_at("queued", now), batch_id),
+            )
+        return job_id
+
+    def get_batch_jobs(self, batch_id: str) -> list[GenerationJob]:
+        """Return the live jobs of a batch in submission order; empty once all of them expired."""
+        now = time.time()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM generation_jobs WHERE batch_id = ? AND expires_at > ? ORDER BY rowid",
+                (batch_id, now),
+            ).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def mark_running(self, job_id: str) -> None:
+        """Mark a queued job as actively processing."""
+        self._update(job_id, status="running", result=None, error=None)
+
+    def mark_completed(self, job_id: str, result: dict[str, object]) -> None:
+        """Persist the finished generation payload for polling clients on any worker."""
+        metadata, images = split_result_images(result)
+        expires_at = self._expires_at("completed", time.time())
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO generation_job_images"
+                " (job_id, model_name, variant, mime_type, etag, data, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, model_name, ORIGINAL_VARIANT, image.mime_type, image.etag, image.data, expires_at)
+                    for model_name, image in images.items()
+                ],
+            )
+        self._update(job_id, status="completed", result=json.dumps(metadata), error=None)
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        """Persist the terminal failure message for polling clients on any worker."""
+        self._update(job_id, status="failed", result=None, error=error)
+
+    def get_job(self, job_id: str) -> GenerationJob | None:
+        """Return the current job snapshot or None if it expired or never existed."""
+        now = time.time()
+        with self._lock:
+            self._prune_locked(now)
+            row = self._connection.execute(
+                "SELECT * FROM generation_jobs WHERE job_id = ? AND expires_at > ?",
+                (job_id, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return _job_from_row(row)
+
+    def mark_variants_ready(self, job_id: str, variants: dict[str, dict[str, JobImage]]) -> None:
+        """Attach transcoded variants of a completed job's images and list them in its result."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT result, expires_at FROM generation_jobs WHERE job_id = ? AND expires_at > ?",
+                    (job_id, now),
+                ).fetchone()
+                if row is None or row["result"] is None:
+                    self._connection.execute("ROLLBACK")
+                    return
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO generation_job_images"
+                    " (job_id, model_name, variant, mime_type, etag, data, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (job_id, model_name, variant, image.mime_type, image.etag, image.data, row["expires_at"])
+                        for model_name, model_variants in variants.items()
+                        for variant, image in model_variants.items()
+                    ],
+                )
+                result = json.loads(row["result"])
+                for model_name, model_result in result.get("results", {}).items():
+                    if model_name in variants:
+                        model_result["variants"] = [
+                            variant_row["variant"]
+                            for variant_row in self._connection.execute(
+                                "SELECT variant FROM generation_job_images"
+                                " WHERE job_id = ? AND model_name = ? ORDER BY variant",
+                                (job_id, model_name),
+                            )
+                        ]
+                self._connection.execute(
+                    "UPDATE generation_jobs SET result = ?, updated_at = ? WHERE job_id = ?",
+                    (json.dumps(result), time.time(), job_id),
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def get_image(self, job_id: str, model_name: str, variant: str = ORIGINAL_VARIANT) -> JobImage | None:
+        """Return the raw image a completed job produced for ``model_name`` in ``variant``."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT mime_type, etag, data FROM generation_job_images"
+                " WHERE job_id = ? AND model_name = ? AND variant = ? AND expires_at > ?",
+                (job_id, model_name, variant, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return JobImage(data=bytes(row["data"]), mime_type=row["mime_type"], etag=row["etag"])
+
+    def close(self) -> None:
+        """Release the SQLite connection held by this process."""
+        with self._lock:
+            self._connection.close()
+
+    def _update(self, job_id: str, *, status: str, result: str | None, error: str | None) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE generation_jobs SET status = ?, result = ?, error = ?, updated_at = ?, expires_at = ?"
+                " WHERE job_id = ?",
+                (status, result, error, now, self._expires_at(status, now), job_id),
+            )
+
+    def _expires_at(self, status: str, now: float) -> float:
+        if status in TERMINAL_JOB_STATUSES:
+            return now + self._ttl_seconds
+        return now + self._abandoned_ttl_seconds
+
+    def _prune_locked(self, now: float) -> None:
+        if now < self._next_prune_at:
+            return
+        self._next_prune_at = now + self._prune_interval_seconds
+        deleted = self._connection.execute(
+            "DELETE FROM generation_jobs WHERE expires_at <= ?",
+            (now,),
+        ).rowcount
+        self._connection.execute(
+            "DELETE FROM generation_job_images WHERE expires_at <= ?",
+            (now,),
+        )
+        if deleted:
+            logger.debug("Pruned %d expired generation jobs", deleted)
+
+
+def _job_from_row(row: sqlite3.Row) -> GenerationJob:
+    return GenerationJob(
+        job_id=row["job_id"],
+        status=row["status"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        result=json.loads(row["result"]) if row["result"] is not None else None,
+        error=row["error"],
+    )
+
+
+def create_job_store() -> GenerationJobStore:
+    """Build the job store selected by ``JOB_STORE_BACKEND``."""
+    if settings.JOB_STORE_BACKEND == "sqlite":
+        return SQLiteGenerationJobStore(settings.JOB_STORE_PATH)
+    if settings.JOB_STORE_BACKEND != "memory":
+        raise RuntimeError(f"Unknown JOB_STORE_BACKEND: {settings.JOB_STORE_BACKEND}")
+    return InMemoryGenerationJobStore()
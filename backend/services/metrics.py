@@ -0,0 +1,220 @@
+"""Prometheus text-format metrics for the generation pipeline.
+
+Values are kept per worker process; Prometheus sums them across workers
+when every worker is scraped (or the label ``instance`` is aggregated away).
+"""
+
+import abc
+import math
+import threading
+from collections.abc import Callable, Iterable
+from typing import TypeVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = tuple[str, ...]
+M = TypeVar("M", bound="_Metric")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    @abc.abstractmethod
+    def _render_samples(self) -> list[str]:
+        """Return the sample lines of this metric, without the HELP and TYPE header."""
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, read from a callback at scrape time."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._collect: Callable[[], dict[LabelValues, float]] | None = None
+
+    def set_function(self, collect: Callable[[], dict[LabelValues, float]]) -> None:
+        """Compute the gauge lazily, so hot paths never have to update it."""
+        self._collect = collect
+
+    def _render_samples(self) -> list[str]:
+        if self._collect is None:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(self._collect().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count of observed values."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self._buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts followed by the running sum.
+                series = self._series[key] = [0.0] * (len(self._buckets) + 1)
+            for index, bound in enumerate(self._buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-1] += value
+
+    def count(self, **labels: object) -> int:
+        with self._lock:
+            series = self._series.get(self._label_values(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, bucket_count in zip(self._buckets, series):
+                cumulative += bucket_count
+                labels = _format_labels((*self.label_names, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collect metrics and render them in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+GEMINI_UPLOAD_SECONDS = registry.register(
+    Histogram("gemini_upload_seconds", "Time spent uploading reference images per generation.", ("model",))
+)
+GEMINI_FIRST_CHUNK_SECONDS = registry.register(
+    Histogram(
+        "gemini_time_to_first_chunk_seconds",
+        "Time from sending the generation request to the first streamed chunk.",
+        ("model",),
+    )
+)
+GEMINI_GENERATION_SECONDS = registry.register(
+    Histogram("gemini_generation_seconds", "Total duration of one model call including uploads.", ("model",))
+)
+GEMINI_ERRORS_TOTAL = registry.register(
+    Counter("gemini_errors_total", "Failed Gemini attempts by HTTP status code.", ("model", "code"))
+)
+GEMINI_UPLOADED_BYTES_TOTAL = registry.register(
+    Counter("gemini_uploaded_bytes_total", "Reference image bytes sent to Gemini.", ("transport",))
+)
+GEMINI_RECEIVED_BYTES_TOTAL = registry.register(
+    Counter("gemini_received_image_bytes_total", "Generated image bytes received from Gemini.", ("model",))
+)
+GENERATION_FALLBACKS_TOTAL = registry.register(
+    Counter(
+        "generation_fallbacks_total",
+        "Generations answered by the alternate model.",
+        ("model", "reason"),
+    )
+)
+RESULT_SERVED_BYTES_TOTAL = registry.register(
+    Counter("generation_result_served_bytes_total", "Image bytes returned to clients.", ("variant",))
+)
+JOB_QUEUE_WAIT_SECONDS = registry.register(
+    Histogram("generation_job_queue_wait_seconds", "Time jobs spent queued before starting.", ("priority",))
+)
+JOB_QUEUE_DEPTH = registry.register(
+    Gauge("generation_job_queue_depth", "Jobs waiting for a free slot.", ("priority",))
+)
+JOBS_IN_FLIGHT = registry.register(
+    Gauge("generation_jobs_in_flight", "Jobs admitted by this worker by state.", ("state",))
+)
+GEMINI_CLIENT_IN_FLIGHT = registry.register(
+    Gauge("gemini_client_in_flight", "Gemini calls in flight per pooled client.", ("client",))
+)
+GEMINI_CLIENT_RATE_LIMITS_TOTAL = registry.register(
+    Counter("gemini_client_rate_limits_total", "Rate limit responses per pooled client.", ("client",))
+)
@@ -17,3 +17,28 @@ def guess_mime_type(filename: str, default: str = 'application/octet-stream') ->
         return mime_type
     ext = os.path.splitext(filename)[1].lower()
     return _MIME_FALLBACK.get(ext, default)
+
+
+_IMAGE_SIGNATURES: tuple[tuple[bytes, str], ...] = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+
+def sniff_image_mime_type(data: bytes, default: str = 'image/png') -> str:
+    """Detect an image MIME type from its leading bytes instead of trusting a filename."""
+    for signature, mime_type in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    if data[4:12] in (b'ftypheic', b'ftypheix', b'ftyphevc', b'ftyphevx'):
+        return 'image/heic'
+    if data[4:12] in (b'ftypmif1', b'ftypmsf1'):
+        return 'image/heif'
+    return default
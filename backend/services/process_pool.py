@@ -0,0 +1,17 @@
+"""Process pools for CPU-bound image work."""
+
+import concurrent.futures
+import multiprocessing
+
+
+def create_process_pool(max_workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """Start workers without forking the server.
+
+    The server process runs several threads (event loop, upload and SQLite
+    executors), and forking a multi-threaded process can deadlock the child.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context(method),
+    )
@@ -0,0 +1,339 @@
+"""Deterministic cache of finished generations keyed by the normalized request."""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "read", "refresh")
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """One generation payload kept in memory together with its size and lifetime."""
+
+    payload: dict[str, object]
+    size_bytes: int
+    expires_at: float
+
+
+def make_result_cache_key(
+    *,
+    prompt: str,
+    models: tuple[str, ...],
+    aspect_ratio: str,
+    resolution: str,
+    temperature: float,
+    reference_image_hashes: tuple[str, ...],
+) -> str:
+    """Hash everything that influences the generated image, and nothing else.
+
+    The final prompt is used rather than the template name, and reference
+    images are identified by their SHA-256 content hashes in upload order.
+    """
+    normalized = {
+        "prompt": prompt,
+        "models": list(models),
+        "aspect_ratio": aspect_ratio,
+        "resolution": resolution,
+        "temperature": round(float(temperature), 4),
+        "reference_images": list(reference_image_hashes),
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _payload_size(payload: dict[str, object]) -> int:
+    return sum(len(result.get("image_bytes") or b"") for result in payload.get("results", {}).values())
+
+
+class SQLiteResultCacheTier:
+    """Keep cached generations on disk so they survive restarts and are shared by workers."""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generation_results (
+                    cache_key TEXT PRIMARY KEY,
+                    metadata TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_generation_results_accessed_at ON generation_results (accessed_at)"
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generation_result_images (
+                    cache_key TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (cache_key, model_name)
+                )
+                """
+            )
+
+    def get(self, key: str, now: float) -> tuple[dict[str, object], float] | None:
+        """Return the stored payload and its expiry, or None when missing or stale."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT metadata, expires_at FROM generation_results WHERE cache_key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["expires_at"] <= now:
+                self._delete_locked([key])
+                return None
+            images = {
+                image["model_name"]: bytes(image["data"])
+                for image in self._connection.execute(
+                    "SELECT model_name, data FROM generation_result_images WHERE cache_key = ?",
+                    (key,),
+                )
+            }
+            self._connection.execute(
+                "UPDATE generation_results SET accessed_at = ? WHERE cache_key = ?",
+                (now, key),
+            )
+
+        payload = json.loads(row["metadata"])
+        for model_name, result in payload["results"].items():
+            result["image_bytes"] = images.get(model_name)
+        return payload, row["expires_at"]
+
+    def put(self, key: str, payload: dict[str, object], size_bytes: int, expires_at: float, now: float) -> None:
+        """Store a payload, then drop expired and least recently read rows over the byte cap."""
+        metadata = {
+            **payload,
+            "results": {
+                model_name: {field: value for field, value in result.items() if field != "image_bytes"}
+                for model_name, result in payload["results"].items()
+            },
+        }
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_locked([key])
+                self._connection.execute(
+                    "INSERT INTO generation_results (cache_key, metadata, size_bytes, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(metadata), size_bytes, expires_at, now),
+                )
+                self._connection.executemany(
+                    "INSERT INTO generation_result_images (cache_key, model_name, data) VALUES (?, ?, ?)",
+                    [
+                        (key, model_name, result["image_bytes"])
+                        for model_name, result in payload["results"].items()
+                        if result.get("image_bytes")
+                    ],
+                )
+                self._evict_locked(now)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM generation_results")
+            self._connection.execute("DELETE FROM generation_result_images")
+
+    def close(self) -> None:
+        """Release the SQLite connection held by this process."""
+        with self._lock:
+            self._connection.close()
+
+    def _evict_locked(self, now: float) -> None:
+        expired = [
+            row["cache_key"]
+            for row in self._connection.execute(
+                "SELECT cache_key FROM generation_results WHERE expires_at <= ?",
+                (now,),
+            )
+        ]
+        self._delete_locked(expired)
+
+        total_bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM generation_results"
+        ).fetchone()[0]
+        if total_bytes <= self._max_bytes:
+            return
+        evicted = []
+        for row in self._connection.execute(
+            "SELECT cache_key, size_bytes FROM generation_results ORDER BY accessed_at"
+        ).fetchall():
+            if total_bytes <= self._max_bytes:
+                break
+            evicted.append(row["cache_key"])
+            total_bytes -= row["size_bytes"]
+        self._delete_locked(evicted)
+        logger.debug("Evicted %d cached generations from disk", len(evicted))
+
+    def _delete_locked(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        self._connection.executemany("DELETE FROM generation_results WHERE cache_key = ?", [(key,) for key in keys])
+        self._connection.executemany(
+            "DELETE FROM generation_result_images WHERE cache_key = ?",
+            [(key,) for key in keys],
+        )
+
+
+class GenerationResultCache:
+    """Serve repeated generations from a memory LRU backed by an optional disk tier.
+
+    Memory entries are bounded by count and image bytes, disk entries by image
+    bytes; both expire after ``ttl_seconds``. A disk hit is promoted to memory.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.RESULT_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.RESULT_CACHE_MAX_BYTES,
+        ttl_seconds: float = settings.RESULT_CACHE_TTL_SECONDS,
+        disk_tier: SQLiteResultCacheTier | None = None,
+    ) -> None:
+        self._entries: OrderedDict[str, CachedResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._disk_tier = disk_tier
+        self._total_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> dict[str, object] | None:
+        """Return a fresh copy of the cached payload, checking memory before disk."""
+        now = time.time()
+        with self._lock:
+            entry = self._get_locked(key, now)
+            if entry is not None:
+                self.hits += 1
+                return _copy_payload(entry.payload)
+
+        stored = self._disk_tier.get(key, now) if self._disk_tier is not None else None
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            payload, expires_at = stored
+            self._put_locked(key, CachedResult(payload, _payload_size(payload), expires_at))
+        return _copy_payload(payload)
+
+    def put(self, key: str, payload: dict[str, object]) -> None:
+        """Remember a finished generation in both tiers."""
+        now = time.time()
+        entry = CachedResult(_copy_payload(payload), _payload_size(payload), now + self._ttl_seconds)
+        with self._lock:
+            self._put_locked(key, entry)
+        if self._disk_tier is not None:
+            try:
+                self._disk_tier.put(key, entry.payload, entry.size_bytes, entry.expires_at, now)
+            except sqlite3.Error as error:
+                logger.warning("Could not persist cached generation %s: %s", key, error)
+
+    def stats(self) -> dict[str, int]:
+        """Expose counters so operators can judge whether the cache pays off."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        """Forget every cached generation in both tiers and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            self.evictions = 0
+        if self._disk_tier is not None:
+            self._disk_tier.clear()
+
+    def _get_locked(self, key: str, now: float) -> CachedResult | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._pop_locked(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_locked(self, key: str, entry: CachedResult) -> None:
+        self._pop_locked(key)
+        self._entries[key] = entry
+        self._total_bytes += entry.size_bytes
+        while self._entries and (
+            len(self._entries) > self._max_entries or self._total_bytes > self._max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= evicted.size_bytes
+            self.evictions += 1
+
+    def _pop_locked(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+
+
+def _copy_payload(payload: dict[str, object]) -> dict[str, object]:
+    """Copy the nested result dicts so callers cannot mutate cached entries; bytes are shared."""
+    return {
+        **payload,
+        "results": {model_name: dict(result) for model_name, result in payload["results"].items()},
+    }
+
+
+def create_result_cache() -> GenerationResultCache:
+    """Build the cache with a disk tier unless ``RESULT_CACHE_PATH`` is empty."""
+    disk_tier = None
+    if settings.RESULT_CACHE_PATH:
+        disk_tier = SQLiteResultCacheTier(settings.RESULT_CACHE_PATH, settings.RESULT_CACHE_DISK_MAX_BYTES)
+    return GenerationResultCache(disk_tier=disk_tier)
+
+
+_result_cache: GenerationResultCache | None = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> GenerationResultCache:
+    """Return the cache shared by every generation in this process, opening it on first use."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = create_result_cache()
+        return _result_cache
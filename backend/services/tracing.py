@@ -0,0 +1,371 @@
+"""Span-style tracing of the generation pipeline.
+
+Spans nest through context variables, so a job started from a request
+stays in that request's trace even though it runs later in its own task.
+Finished spans are handed to a pluggable exporter in the OpenTelemetry
+OTLP/JSON shape on a background thread; the per-stage durations of a trace
+can also be returned to clients as ``timings``.
+"""
+
+import json
+import logging
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Protocol, TextIO
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_UNSET = 0
+STATUS_CODE_ERROR = 2
+EXPORT_BATCH_SIZE = 256
+
+# perf_counter gives monotonic durations; this offset places them on the wall clock.
+_WALL_CLOCK_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def _now_ns() -> int:
+    return time.perf_counter_ns() + _WALL_CLOCK_OFFSET_NS
+
+
+@dataclass
+class Span:
+    """One timed stage of a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start_time_ns: int
+    end_time_ns: int | None = None
+    kind: int = SPAN_KIND_INTERNAL
+    attributes: dict[str, object] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_seconds(self) -> float:
+        end_time_ns = self.end_time_ns if self.end_time_ns is not None else _now_ns()
+        return (end_time_ns - self.start_time_ns) / 1e9
+
+    def set_attribute(self, key: str, value: object) -> None:
+        self.attributes[key] = value
+
+
+class Trace:
+    """Finished spans of one trace, kept so they can be summarized as ``timings``."""
+
+    def __init__(self, trace_id: str | None = None) -> None:
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: list[Span] = []
+
+    def timings(self) -> list[dict[str, object]]:
+        """Return finished stages in start order as ``{"stage", "duration_ms", "model"?}``."""
+        timings = []
+        for span in sorted(self.spans, key=lambda span: span.start_time_ns):
+            timing: dict[str, object] = {"stage": span.name, "duration_ms": round(span.duration_seconds * 1000, 1)}
+            if "model" in span.attributes:
+                timing["model"] = span.attributes["model"]
+            if span.error is not None:
+                timing["error"] = True
+            timings.append(timing)
+        return timings
+
+
+class SpanExporter(Protocol):
+    """Receive batches of finished spans; called from the export thread only."""
+
+    def export(self, spans: Sequence[Span]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+def _attribute_value(value: object) -> dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: dict[str, object]) -> list[dict[str, object]]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp_json(spans: Sequence[Span], service_name: str = settings.TRACE_SERVICE_NAME) -> dict[str, object]:
+    """Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    encoded = []
+    for span in spans:
+        item: dict[str, object] = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.end_time_ns or span.start_time_ns),
+            "attributes": _attributes(span.attributes),
+            "status": {"code": STATUS_CODE_UNSET},
+        }
+        if span.parent_span_id is not None:
+            item["parentSpanId"] = span.parent_span_id
+        if span.error is not None:
+            item["status"] = {"code": STATUS_CODE_ERROR, "message": span.error}
+        encoded.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": encoded}],
+            }
+        ]
+    }
+
+
+class ConsoleSpanExporter:
+    """Print one OTLP/JSON document per batch, for local debugging."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        self._stream = stream
+
+    def export(self, spans: Sequence[Span]) -> None:
+        stream = self._stream or sys.stdout
+        stream.write(json.dumps(to_otlp_json(spans)) + "\n")
+        stream.flush()
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter:
+    """Append one OTLP/JSON document per batch to a JSON Lines file for offline analysis."""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+    def export(self, spans: Sequence[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(to_otlp_json(spans)) + "\n")
+
+    def shutdown(self) -> None:
+        pass
+
+
+class OTLPHttpSpanExporter:
+    """POST spans to an OpenTelemetry collector's OTLP/HTTP JSON endpoint."""
+
+    def __init__(self, endpoint: str, timeout_seconds: float = 5.0) -> None:
+        self._endpoint = endpoint
+        self._timeout_seconds = timeout_seconds
+
+    def export(self, spans: Sequence[Span]) -> None:
+        request = urllib.request.Request(
+            self._endpoint,
+            data=json.dumps(to_otlp_json(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self._timeout_seconds):
+            pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class BatchSpanProcessor:
+    """Queue finished spans and export them in batches on a daemon thread.
+
+    Request handlers only pay for a queue put; slow or failing exporters
+    never block the event loop.
+    """
+
+    def __init__(self, exporter: SpanExporter, batch_size: int = EXPORT_BATCH_SIZE) -> None:
+        self.exporter = exporter
+        self._batch_size = batch_size
+        self._queue: queue.SimpleQueue[Span | threading.Event | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._work, name="span-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every span submitted so far has been exported."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self.exporter.shutdown()
+
+    def _work(self) -> None:
+        batch: list[Span] = []
+        while True:
+            item = self._queue.get()
+            if isinstance(item, Span):
+                batch.append(item)
+                if len(batch) < self._batch_size and not self._queue.empty():
+                    continue
+            if batch:
+                self._export(batch)
+                batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _export(self, batch: list[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+        except Exception as error:
+            logger.warning("Could not export %d spans: %s", len(batch), error)
+
+
+def create_span_exporter(name: str = settings.TRACE_EXPORTER) -> SpanExporter | None:
+    """Build the exporter selected by ``TRACE_EXPORTER``, or None when tracing export is off."""
+    if name == "none":
+        return None
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        return FileSpanExporter(settings.TRACE_EXPORT_PATH)
+    if name == "otlp":
+        return OTLPHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT)
+    raise RuntimeError(f"Unknown TRACE_EXPORTER: {name}")
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_processor: BatchSpanProcessor | None = None
+_processor_configured = False
+_processor_lock = threading.Lock()
+
+
+def set_span_exporter(exporter: SpanExporter | None) -> None:
+    """Send finished spans to ``exporter`` from now on; None stops exporting."""
+    global _processor, _processor_configured
+    with _processor_lock:
+        previous, _processor = _processor, BatchSpanProcessor(exporter) if exporter is not None else None
+        _processor_configured = True
+    if previous is not None:
+        previous.shutdown()
+
+
+def flush_spans(timeout: float = 5.0) -> bool:
+    """Block until spans finished so far have reached the exporter."""
+    processor = _get_processor()
+    return processor.flush(timeout) if processor is not None else True
+
+
+def current_trace() -> Trace | None:
+    """Return the trace the calling task belongs to, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def child_trace() -> Iterator[Trace]:
+    """Collect the enclosed spans apart from the rest of the current trace.
+
+    The trace id and the current span stay the same, so exported spans still
+    hang under the request that started the work; ``timings`` of the child
+    list the stages finished so far plus its own, not those of its siblings,
+    such as the other items of a batch.
+    """
+    parent = _current_trace.get()
+    trace = Trace(parent.trace_id if parent is not None else None)
+    if parent is not None:
+        trace.spans = list(parent.spans)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, *, kind: int = SPAN_KIND_INTERNAL, **attributes: object) -> Iterator[Span]:
+    """Time the enclosed block as a child of the current span, starting a trace if needed."""
+    trace = _current_trace.get()
+    trace_token = None
+    if trace is None:
+        trace = Trace()
+        trace_token = _current_trace.set(trace)
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent is not None else None,
+        start_time_ns=_now_ns(),
+        kind=kind,
+        attributes=dict(attributes),
+    )
+    span_token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as error:
+        current.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        _current_span.reset(span_token)
+        if trace_token is not None:
+            _current_trace.reset(trace_token)
+        _finish(trace, current)
+
+
+def record_span(name: str, started_at: float, **attributes: object) -> Span:
+    """Record a stage that began at ``started_at`` (a ``time.perf_counter()`` value) and ends now.
+
+    Useful where a stage does not map onto one block, such as the wait for
+    the first streamed chunk.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    recorded = Span(
+        name=name,
+        trace_id=trace.trace_id if trace is not None else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent is not None else None,
+        start_time_ns=int(started_at * 1e9) + _WALL_CLOCK_OFFSET_NS,
+        attributes=dict(attributes),
+    )
+    _finish(trace, recorded)
+    return recorded
+
+
+def _finish(trace: Trace | None, finished: Span) -> None:
+    finished.end_time_ns = _now_ns()
+    if trace is not None:
+        trace.spans.append(finished)
+    processor = _get_processor()
+    if processor is not None:
+        processor.submit(finished)
+
+
+def _get_processor() -> BatchSpanProcessor | None:
+    global _processor, _processor_configured
+    if not _processor_configured:
+        # The export thread is only started once the first span finishes.
+        with _processor_lock:
+            if not _processor_configured:
+                exporter = create_span_exporter()
+                _processor = BatchSpanProcessor(exporter) if exporter is not None else None
+                _processor_configured = True
+    return _processor
@@ -0,0 +1,84 @@
+"""Opt-in capture of anonymized generation traffic for capacity replays.
+
+When ``TRAFFIC_CAPTURE_PATH`` is set, every generation and job submission
+appends one JSON line with its request shape (modes, sizes and hashes of
+reference images, prompt length but never its text). Submissions carry an
+``outcome``: ``scheduled`` jobs add the latencies observed by the server,
+``attached`` ones name the job they joined, and ``rejected`` ones say why.
+``python -m backend.tools.replay`` reissues the captured workload.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from backend.config import settings
+from backend.services.generation_service import GenerationRequest
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_FORMAT_VERSION = 1
+
+
+def describe_request(request: GenerationRequest) -> dict[str, object]:
+    """Keep what shapes the load a request puts on the service, and nothing a user wrote."""
+    return {
+        "model_mode": request.model_mode,
+        "resolution": request.resolution,
+        "aspect_ratio": request.aspect_ratio,
+        "prompt_type": request.prompt_type,
+        "temperature": request.temperature,
+        "cache_mode": request.cache_mode,
+        "prompt_chars": len(request.prompt),
+        "reference_images": [
+            {"size_bytes": image.size, "sha256": image.sha256}
+            for image in request.reference_images
+        ],
+    }
+
+
+class TrafficCapture:
+    """Append capture records to a JSON Lines file shared by every worker."""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record: dict[str, object]) -> None:
+        line = json.dumps({"version": CAPTURE_FORMAT_VERSION, **record}, ensure_ascii=False) + "\n"
+        with self._lock:
+            # One write per line in append mode keeps lines from different workers intact.
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+
+_capture: TrafficCapture | None = None
+_capture_lock = threading.Lock()
+
+
+def get_traffic_capture() -> TrafficCapture | None:
+    """Return the capture file writer, or None while capture is disabled."""
+    global _capture
+    path = settings.TRAFFIC_CAPTURE_PATH
+    if not path:
+        return None
+    with _capture_lock:
+        if _capture is None or _capture.path != path:
+            _capture = TrafficCapture(path)
+        return _capture
+
+
+async def capture_traffic(record: dict[str, object]) -> None:
+    """Write ``record`` off the event loop if capture is enabled; failures are only logged."""
+    capture = get_traffic_capture()
+    if capture is None:
+        return
+    try:
+        await asyncio.to_thread(capture.append, record)
+    except OSError as error:
+        logger.warning("Could not capture traffic record: %s", error)
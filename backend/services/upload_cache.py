@@ -0,0 +1,224 @@
+"""Process-wide cache of Gemini Files API uploads keyed by content hash."""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+UploadKey = tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class CachedUpload:
+    """Remember where Gemini stored one reference image and until when it is usable."""
+
+    file_uri: str
+    mime_type: str
+    size_bytes: int
+    expires_at: float
+
+
+def make_upload_key(content: bytes, mime_type: str, namespace: str = "") -> UploadKey:
+    """Identify an upload by what was sent, not by the filename the browser picked.
+
+    ``namespace`` names the pooled client that uploaded the file: a file URI
+    is only readable with the API key or project that created it.
+    """
+    return hashlib.sha256(content).hexdigest(), mime_type, namespace
+
+
+class GeminiUploadCache:
+    """Reuse uploaded file URIs across requests with LRU eviction and a byte budget."""
+
+    def __init__(
+        self,
+        max_entries: int = settings.UPLOAD_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.UPLOAD_CACHE_MAX_BYTES,
+        expiry_margin_seconds: float = settings.UPLOAD_CACHE_EXPIRY_MARGIN_SECONDS,
+    ) -> None:
+        self._entries: OrderedDict[UploadKey, CachedUpload] = OrderedDict()
+        self._inflight: dict[UploadKey, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._expiry_margin_seconds = expiry_margin_seconds
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: UploadKey) -> CachedUpload | None:
+        """Return a still-valid upload and mark it as recently used."""
+        with self._lock:
+            entry = self._get_locked(key, time.time())
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def holders(self, content: bytes, mime_type: str, namespaces: Iterable[str]) -> set[str]:
+        """Return the namespaces that hold a still-valid upload of these bytes, without counting hits."""
+        digest = hashlib.sha256(content).hexdigest()
+        now = time.time()
+        with self._lock:
+            return {
+                namespace
+                for namespace in namespaces
+                if (entry := self._entries.get((digest, mime_type, namespace))) is not None
+                and entry.expires_at > now
+            }
+
+    def put(self, key: UploadKey, uploaded_file: Any, size_bytes: int) -> CachedUpload:
+        """Record a fresh Files API response, evicting the least recently used entries."""
+        entry = CachedUpload(
+            file_uri=uploaded_file.uri,
+            mime_type=key[1],
+            size_bytes=size_bytes,
+            expires_at=self._expires_at(uploaded_file),
+        )
+        with self._lock:
+            self._pop_locked(key)
+            self._entries[key] = entry
+            self._total_bytes += size_bytes
+            self._evict_locked()
+        return entry
+
+    def get_or_upload(
+        self,
+        content: bytes,
+        mime_type: str,
+        upload: Callable[[], Any],
+        namespace: str = "",
+    ) -> CachedUpload:
+        """Return a cached upload or run ``upload`` once, even under concurrent callers.
+
+        Concurrent requests for the same bytes (for example both models in "Both"
+        mode) wait for the first upload instead of sending the file twice.
+        """
+        key = make_upload_key(content, mime_type, namespace)
+        while True:
+            entry, pending, is_owner = self._claim(key)
+            if entry is not None:
+                return entry
+            if is_owner:
+                break
+            pending.result()
+
+        try:
+            return self.put(key, upload(), len(content))
+        finally:
+            self._release(key, pending)
+
+    async def get_or_upload_async(
+        self,
+        content: bytes,
+        mime_type: str,
+        upload: Callable[[], Awaitable[Any]],
+        namespace: str = "",
+    ) -> CachedUpload:
+        """Async twin of ``get_or_upload`` that waits without blocking the event loop."""
+        key = make_upload_key(content, mime_type, namespace)
+        while True:
+            entry, pending, is_owner = self._claim(key)
+            if entry is not None:
+                return entry
+            if is_owner:
+                break
+            await asyncio.shield(asyncio.wrap_future(pending))
+
+        try:
+            return self.put(key, await upload(), len(content))
+        finally:
+            self._release(key, pending)
+
+    def stats(self) -> dict[str, int]:
+        """Expose counters so operators can judge whether the cache pays off."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        """Forget every cached upload and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def _claim(self, key: UploadKey) -> tuple[CachedUpload | None, concurrent.futures.Future | None, bool]:
+        """Return a cache hit, or the pending upload future and whether the caller owns it."""
+        with self._lock:
+            entry = self._get_locked(key, time.time())
+            if entry is not None:
+                self.hits += 1
+                return entry, None, False
+            pending = self._inflight.get(key)
+            if pending is not None:
+                return None, pending, False
+            self.misses += 1
+            pending = concurrent.futures.Future()
+            self._inflight[key] = pending
+            return None, pending, True
+
+    def _release(self, key: UploadKey, pending: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        if not pending.done():
+            pending.set_result(None)
+
+    def _expires_at(self, uploaded_file: Any) -> float:
+        expiration_time = getattr(uploaded_file, "expiration_time", None)
+        if expiration_time is not None:
+            expires_at = expiration_time.timestamp()
+        else:
+            expires_at = time.time() + settings.GEMINI_FILE_TTL_SECONDS
+        return expires_at - self._expiry_margin_seconds
+
+    def _get_locked(self, key: UploadKey, now: float) -> CachedUpload | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._pop_locked(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _pop_locked(self, key: UploadKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size_bytes
+
+    def _evict_locked(self) -> None:
+        while self._entries and (
+            len(self._entries) > self._max_entries or self._total_bytes > self._max_bytes
+        ):
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size_bytes
+            self.evictions += 1
+            logger.debug("Evicted cached upload %s (%d bytes)", key[0], entry.size_bytes)
+
+
+_upload_cache = GeminiUploadCache()
+
+
+def get_upload_cache() -> GeminiUploadCache:
+    """Return the cache shared by every ImageService in this process."""
+    return _upload_cache
@@ -0,0 +1,157 @@
+"""Stream reference image uploads into bounded storage that spills to disk.
+
+Uploads are copied in chunks: the SHA-256 is computed while reading, the
+per-file and per-request byte limits are enforced as soon as they are
+crossed, and the first chunk must carry a known image signature. Payloads
+above ``UPLOAD_SPOOL_MEMORY_BYTES`` move to an anonymous temporary file, so
+jobs waiting in the queue hold a file descriptor instead of the photo.
+"""
+
+import hashlib
+import tempfile
+import threading
+from collections.abc import Sequence
+from typing import IO, Protocol
+
+from backend.config import settings
+from backend.services.mime_utils import sniff_image_mime_type
+
+
+class UploadRejectedError(RuntimeError):
+    """Signal an upload that is too large or not an image; ``status_code`` is the HTTP answer."""
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncUpload(Protocol):
+    """The part of Starlette's ``UploadFile`` that ingestion reads."""
+
+    filename: str | None
+    size: int | None
+
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+class SpooledPayload:
+    """Bytes of one upload, in memory while small and in an unnamed temporary file beyond that.
+
+    The temporary file has no directory entry, so it disappears with the
+    last reference to the payload even if the process is killed.
+    """
+
+    def __init__(self, filename: str, memory_limit: int = settings.UPLOAD_SPOOL_MEMORY_BYTES) -> None:
+        self.filename = filename
+        self.size = 0
+        self.sha256 = ""
+        self.mime_type = ""
+        self._memory_limit = memory_limit
+        self._buffer: bytearray | bytes | None = bytearray()
+        self._file: IO[bytes] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None and self.size + len(chunk) > self._memory_limit:
+            self._file = tempfile.TemporaryFile(prefix="gemini-hub-upload-", dir=settings.UPLOAD_SPOOL_DIR)
+            self._file.write(self._buffer)
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+        self.size += len(chunk)
+
+    def seal(self, sha256: str) -> None:
+        """Finish writing; small payloads become one immutable ``bytes`` that reads share."""
+        self.sha256 = sha256
+        if self._file is None:
+            self._buffer = bytes(self._buffer)
+        else:
+            self._file.flush()
+
+    def read(self) -> bytes:
+        """Return the whole payload; spilled payloads are read back from disk on every call."""
+        if self._file is None:
+            return bytes(self._buffer)
+        with self._lock:
+            self._file.seek(0)
+            return self._file.read()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+async def ingest_uploads(
+    uploads: Sequence[AsyncUpload],
+    max_file_bytes: int = settings.UPLOAD_MAX_FILE_BYTES,
+    max_request_bytes: int = settings.UPLOAD_MAX_REQUEST_BYTES,
+) -> list[SpooledPayload]:
+    """Copy every non-empty upload into a ``SpooledPayload``.
+
+    Raises ``UploadRejectedError`` (413 or 415) on the first upload that breaks
+    a limit or is not an image; payloads read so far are closed.
+    """
+    payloads: list[SpooledPayload] = []
+    try:
+        for upload in uploads:
+            payload = await _ingest_upload(
+                upload,
+                max_file_bytes,
+                max_request_bytes,
+                used_bytes=sum(payload.size for payload in payloads),
+            )
+            if payload is not None:
+                payloads.append(payload)
+    except BaseException:
+        for payload in payloads:
+            payload.close()
+        raise
+    return payloads
+
+
+async def _ingest_upload(
+    upload: AsyncUpload,
+    max_file_bytes: int,
+    max_request_bytes: int,
+    used_bytes: int,
+) -> SpooledPayload | None:
+    filename = upload.filename or "image.jpg"
+    # Starlette knows the size once the multipart body is parsed, so oversized files are refused unread.
+    if upload.size is not None:
+        _check_size(filename, upload.size, max_file_bytes, max_request_bytes, used_bytes)
+
+    payload = SpooledPayload(filename)
+    hasher = hashlib.sha256()
+    try:
+        while chunk := await upload.read(settings.UPLOAD_CHUNK_BYTES):
+            if payload.size == 0:
+                payload.mime_type = sniff_image_mime_type(chunk, default="")
+                if not payload.mime_type:
+                    raise UploadRejectedError(f"Файл {filename} не є підтримуваним зображенням.", 415)
+            _check_size(filename, payload.size + len(chunk), max_file_bytes, max_request_bytes, used_bytes)
+            hasher.update(chunk)
+            payload.write(chunk)
+    except BaseException:
+        payload.close()
+        raise
+    if payload.size == 0:
+        return None
+    payload.seal(hasher.hexdigest())
+    return payload
+
+
+def _check_size(filename: str, size: int, max_file_bytes: int, max_request_bytes: int, used_bytes: int) -> None:
+    if size > max_file_bytes:
+        raise UploadRejectedError(f"Файл {filename} більший за {_megabytes(max_file_bytes)} МБ.", 413)
+    if used_bytes + size > max_request_bytes:
+        raise UploadRejectedError(f"Зображення разом більші за {_megabytes(max_request_bytes)} МБ.", 413)
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):g}"
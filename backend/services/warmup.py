@@ -0,0 +1,82 @@
+"""Build the Gemini clients and open their connections before the first generation.
+
+Without this, the first request after a boot or deploy pays for importing
+the SDK, creating the clients, DNS and the TLS handshake on top of its own
+latency. The FastAPI lifespan runs ``run_gemini_warmup`` in the background,
+so the server binds at once and ``/api/health`` reports ready when the
+warm-up is done; after that, clients that sat idle are pinged before their
+pooled connections expire.
+"""
+
+import asyncio
+import logging
+import time
+
+from backend.config import settings
+from backend.services.client_pool import GeminiClientPool, PooledClient
+from backend.services.gemini_client import get_gemini_client_pool
+
+logger = logging.getLogger(__name__)
+
+_warmup_finished = False
+
+
+def is_ready() -> bool:
+    """Tell whether the startup warm-up has finished, or is disabled."""
+    return _warmup_finished or not settings.GEMINI_WARMUP_ENABLED
+
+
+async def run_gemini_warmup() -> None:
+    """Warm every client up, then keep idle connections open until cancelled."""
+    pool = await warm_up_gemini_clients()
+    if pool is not None and settings.GEMINI_KEEPALIVE_PING_SECONDS > 0:
+        await keep_gemini_connections_warm(pool, settings.GEMINI_KEEPALIVE_PING_SECONDS)
+
+
+async def warm_up_gemini_clients() -> GeminiClientPool | None:
+    """Create the client pool off the event loop and send each client one model lookup.
+
+    Failures are logged rather than raised: a missing key or an unreachable
+    endpoint should surface on the first generation, not stop the worker
+    from serving the frontend. Readiness is reported either way.
+    """
+    global _warmup_finished
+    started_at = time.perf_counter()
+    try:
+        pool = await asyncio.to_thread(get_gemini_client_pool)
+        reached = await asyncio.gather(*(_ping(member) for member in pool.members))
+    except Exception as error:
+        logger.warning("Gemini warm-up failed: %s", error)
+        return None
+    finally:
+        _warmup_finished = True
+    logger.info(
+        "Warmed up %d of %d Gemini clients in %.2fs",
+        sum(reached),
+        len(pool.members),
+        time.perf_counter() - started_at,
+    )
+    return pool
+
+
+async def keep_gemini_connections_warm(pool: GeminiClientPool, interval_seconds: float) -> None:
+    """Ping clients that made no call for a whole interval, so their connections do not expire."""
+    seen_calls = {member.name: member.calls for member in pool.members}
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for member in pool.members:
+            if member.in_flight == 0 and member.calls == seen_calls[member.name]:
+                await _ping(member)
+            seen_calls[member.name] = member.calls
+
+
+async def _ping(member: PooledClient) -> bool:
+    try:
+        await asyncio.wait_for(
+            member.client.aio.models.get(model=settings.IMAGE_MODEL),
+            timeout=settings.GEMINI_WARMUP_TIMEOUT_SECONDS,
+        )
+    except Exception as error:
+        logger.warning("Could not reach Gemini through client %s: %s", member.name, error)
+        return False
+    return True
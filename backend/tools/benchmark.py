@@ -0,0 +1,140 @@
+"""Measure generation throughput, latency percentiles and peak memory.
+
+Drives ``/api/generate/submit`` plus status polling at a fixed concurrency:
+every worker submits a job, polls it to completion and starts the next one.
+Without ``--base-url`` the backend is started in this process on top of the
+offline Gemini simulator, so a benchmark needs no API key or network::
+
+    python -m backend.tools.benchmark --jobs 200 --concurrency 32
+    python -m backend.tools.benchmark --base-url http://127.0.0.1:8000 --server-pid 1234
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+
+from backend.tools.loadgen import (
+    GenerationApiClient,
+    JobOutcome,
+    UploadFile,
+    format_report,
+    peak_rss_bytes,
+    read_upload_file,
+    summarize,
+)
+
+SIMULATOR_OPTIONS = {
+    "upload_seconds": "GEMINI_SIMULATOR_UPLOAD_SECONDS",
+    "first_chunk_seconds": "GEMINI_SIMULATOR_FIRST_CHUNK_SECONDS",
+    "stream_seconds": "GEMINI_SIMULATOR_STREAM_SECONDS",
+    "rate_limit_rate": "GEMINI_SIMULATOR_RATE_LIMIT_RATE",
+    "unavailable_rate": "GEMINI_SIMULATOR_UNAVAILABLE_RATE",
+    "stall_rate": "GEMINI_SIMULATOR_STALL_RATE",
+}
+
+
+@contextlib.contextmanager
+def run_local_server(simulator_env: dict[str, str]) -> Iterator[str]:
+    """Serve the backend on a free local port with the simulator in place of Gemini."""
+    # Settings are read at import time, so the environment must be ready before the app loads.
+    os.environ["GEMINI_SIMULATOR_ENABLED"] = "true"
+    os.environ.update(simulator_env)
+    import uvicorn
+
+    from backend.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Benchmark server failed to start.")
+        time.sleep(0.05)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def run_benchmark(
+    client: GenerationApiClient,
+    *,
+    jobs: int,
+    concurrency: int,
+    fields: dict[str, str],
+    files: list[tuple[str, UploadFile]],
+    poll_interval_seconds: float,
+) -> tuple[list[JobOutcome], float]:
+    """Run ``jobs`` generations with ``concurrency`` in flight and return outcomes and wall time."""
+
+    def run_one(index: int) -> JobOutcome:
+        # Distinct prompts keep request coalescing and the result cache from merging jobs.
+        job_fields = {**fields, "prompt": f"{fields['prompt']} #{index}"}
+        return client.run_job(job_fields, files, poll_interval_seconds=poll_interval_seconds)
+
+    started_at = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(run_one, range(jobs)))
+    return outcomes, time.perf_counter() - started_at
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="Benchmark a running server instead of an in-process one.")
+    parser.add_argument("--server-pid", type=int, help="Report peak RSS of this server process (Linux).")
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--prompt", default="Benchmark portrait")
+    parser.add_argument("--model-mode", default="Pro", choices=("Flash", "Pro", "Both"))
+    parser.add_argument("--resolution", default="1K")
+    parser.add_argument("--aspect-ratio", default="1:1")
+    parser.add_argument("--priority", default="interactive")
+    parser.add_argument("--reference-image", action="append", default=[], help="May be given several times.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    simulator = parser.add_argument_group("simulator (in-process server only)")
+    for option in SIMULATOR_OPTIONS:
+        simulator.add_argument(f"--{option.replace('_', '-')}", type=float)
+    args = parser.parse_args(argv)
+
+    fields = {
+        "prompt": args.prompt,
+        "model_mode": args.model_mode,
+        "resolution": args.resolution,
+        "aspect_ratio": args.aspect_ratio,
+        "priority": args.priority,
+        "prompt_type": "custom",
+    }
+    files = [("reference_images", read_upload_file(path)) for path in args.reference_image]
+    simulator_env = {
+        env_name: str(getattr(args, option))
+        for option, env_name in SIMULATOR_OPTIONS.items()
+        if getattr(args, option) is not None
+    }
+
+    with contextlib.ExitStack() as stack:
+        base_url = args.base_url or stack.enter_context(run_local_server(simulator_env))
+        outcomes, elapsed = run_benchmark(
+            GenerationApiClient(base_url),
+            jobs=args.jobs,
+            concurrency=args.concurrency,
+            fields=fields,
+            files=files,
+            poll_interval_seconds=args.poll_interval,
+        )
+    # Remote servers are only measured when their pid is known; locally the server is this process.
+    rss = peak_rss_bytes(args.server_pid) if args.base_url is None or args.server_pid else None
+    report = summarize(outcomes, elapsed, rss)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0 if report["statuses"].get("completed", 0) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
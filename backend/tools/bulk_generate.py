@@ -0,0 +1,473 @@
+"""Generate images for a file of requests, resumably, outside the web server.
+
+The input is JSON Lines or CSV (chosen by extension) with one request per
+row: ``prompt`` plus optional ``id``, ``prompt_type``, ``model_mode``,
+``aspect_ratio``, ``resolution``, ``temperature`` and ``reference_images``
+(paths relative to the input file; a JSON list, or ``;``-separated in CSV).
+Images are written as ``<id>.<model>.<ext>`` in the output directory, where
+``checkpoint.jsonl`` records finished items so a rerun skips them.
+
+``--mode direct`` runs rows through the regular generation flow with bounded
+concurrency. ``--mode batch`` submits them to the Gemini Batch API, which is
+cheaper and has a higher quota but may take hours, and polls the batch jobs;
+a rerun resumes polling jobs that were already submitted instead of paying
+for them twice. Set ``GEMINI_SIMULATOR_ENABLED`` to run against the offline
+simulator::
+
+    python -m backend.tools.bulk_generate headshots.csv --output-dir out --mode batch
+    python -m backend.tools.bulk_generate headshots.jsonl --output-dir out --concurrency 8
+"""
+
+import argparse
+import asyncio
+import csv
+import dataclasses
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from backend.config import settings
+from backend.services.client_pool import PooledClient
+from backend.services.generation_service import (
+    GenerationExecutionError,
+    GenerationRequest,
+    ReferenceImage,
+    execute_generation,
+    prepare_reference_files,
+    target_models_for,
+    validate_generation_request,
+)
+from backend.services.image_service import ImageService
+from backend.services.mime_utils import sniff_image_mime_type
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+BATCH_TERMINAL_STATES = (
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+)
+_ITEM_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+@dataclass(frozen=True)
+class BulkItem:
+    """One input row: a validated request whose reference images are read only when it runs."""
+
+    item_id: str
+    request: GenerationRequest
+    image_paths: tuple[str, ...] = ()
+
+
+def load_items(path: str) -> list[BulkItem]:
+    """Read and validate every row up front, so a typo fails the run before any Gemini call.
+
+    Raises ``ValueError`` naming the offending row.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    items = []
+    seen_ids = set()
+    for row_number, row in enumerate(_read_rows(path), start=1):
+        try:
+            item = _parse_row(row, row_number, base_dir)
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"Row {row_number}: {error}") from error
+        if item.item_id in seen_ids:
+            raise ValueError(f"Row {row_number}: duplicate id {item.item_id}")
+        seen_ids.add(item.item_id)
+        items.append(item)
+    return items
+
+
+def _read_rows(path: str) -> Iterable[dict[str, object]]:
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(file):
+                images = (row.get("reference_images") or "").strip()
+                yield {
+                    **{name: value for name, value in row.items() if value not in (None, "")},
+                    "reference_images": [image.strip() for image in images.split(";") if image.strip()],
+                }
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_row(row: dict[str, object], row_number: int, base_dir: str) -> BulkItem:
+    item_id = str(row.get("id") or f"{row_number:05d}")
+    if not _ITEM_ID_PATTERN.match(item_id):
+        raise ValueError(f"id must be usable as a file name: {item_id}")
+    image_paths = tuple(os.path.join(base_dir, str(image)) for image in row.get("reference_images") or ())
+    for image_path in image_paths:
+        if not os.path.isfile(image_path):
+            raise ValueError(f"reference image not found: {image_path}")
+    request = validate_generation_request(
+        prompt=str(row.get("prompt", "")),
+        model_mode=str(row.get("model_mode", "Pro")),
+        aspect_ratio=str(row.get("aspect_ratio", "1:1")),
+        resolution=str(row.get("resolution", "1K")),
+        temperature=float(row.get("temperature", 1.0)),
+        prompt_type=str(row.get("prompt_type", "custom")),
+        reference_images=(),
+        cache_mode=str(row.get("cache", "off")),
+    )
+    return BulkItem(item_id=item_id, request=request, image_paths=image_paths)
+
+
+def load_reference_images(paths: tuple[str, ...]) -> tuple[ReferenceImage, ...]:
+    images = []
+    for path in paths:
+        with open(path, "rb") as file:
+            images.append(ReferenceImage(filename=os.path.basename(path), content=file.read()))
+    return tuple(images)
+
+
+class Checkpoint:
+    """Append-only JSON Lines log of finished items and submitted batch jobs.
+
+    Every record is flushed and synced before the run moves on, and a torn
+    last line from an interrupted write is ignored on load. Only completed
+    items are skipped on resume; failed ones are tried again. In batch mode
+    each model's result is recorded as its batch job finishes, so a ``Both``
+    item interrupted between its two batch jobs does not pay for the first
+    model again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.completed_ids: set[str] = set()
+        self.model_results: dict[str, dict[str, dict[str, object]]] = {}
+        self._submitted_batches: dict[str, dict[str, object]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        continue
+
+    @property
+    def open_batches(self) -> list[dict[str, object]]:
+        """Batch jobs that were submitted but whose results were never collected."""
+        return list(self._submitted_batches.values())
+
+    def record_item(self, item_id: str, status: str, outputs: list[str], error: str | None = None) -> None:
+        self._append({"event": "item", "id": item_id, "status": status, "outputs": outputs, "error": error})
+
+    def record_model_result(self, item_id: str, model: str, outputs: list[str], error: str | None = None) -> None:
+        self._append({"event": "model_result", "id": item_id, "model": model, "outputs": outputs, "error": error})
+
+    def record_batch_submitted(self, name: str, model: str, item_ids: list[str], client: str) -> None:
+        self._append(
+            {"event": "batch_submitted", "name": name, "model": model, "item_ids": item_ids, "client": client}
+        )
+
+    def record_batch_finished(self, name: str, state: str) -> None:
+        self._append({"event": "batch_finished", "name": name, "state": state})
+
+    def _append(self, record: dict[str, object]) -> None:
+        line = json.dumps({**record, "timestamp": round(time.time(), 3)}, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+            self._apply(record)
+
+    def _apply(self, record: dict[str, object]) -> None:
+        event = record.get("event")
+        if event == "item":
+            # A finished item starts over from scratch if it is ever run again.
+            self.model_results.pop(str(record["id"]), None)
+            if record.get("status") == "completed":
+                self.completed_ids.add(str(record["id"]))
+            else:
+                self.completed_ids.discard(str(record["id"]))
+        elif event == "model_result":
+            self.model_results.setdefault(str(record["id"]), {})[str(record["model"])] = {
+                "outputs": list(record["outputs"]),
+                "error": record.get("error"),
+            }
+        elif event == "batch_submitted":
+            self._submitted_batches[str(record["name"])] = record
+        elif event == "batch_finished":
+            self._submitted_batches.pop(str(record["name"]), None)
+
+
+def write_outputs(output_dir: str, item_id: str, results: dict[str, dict[str, object]]) -> list[str]:
+    """Write every returned image and return the file names, relative to ``output_dir``."""
+    outputs = []
+    for model_name, result in results.items():
+        image_bytes = result.get("image_bytes")
+        if not image_bytes:
+            continue
+        mime_type = result.get("mime_type") or sniff_image_mime_type(image_bytes)
+        filename = f"{item_id}.{model_name}{mimetypes.guess_extension(mime_type) or '.bin'}"
+        # Write then rename, so an interrupted run never leaves a truncated image behind.
+        temporary_path = os.path.join(output_dir, f".{filename}.tmp")
+        with open(temporary_path, "wb") as file:
+            file.write(image_bytes)
+        os.replace(temporary_path, os.path.join(output_dir, filename))
+        outputs.append(filename)
+    return outputs
+
+
+def _record_results(
+    checkpoint: Checkpoint,
+    output_dir: str,
+    item_id: str,
+    results: dict[str, dict[str, object]],
+) -> str:
+    outputs = write_outputs(output_dir, item_id, results)
+    errors = "; ".join(str(result["error"]) for result in results.values() if result.get("error"))
+    status = "completed" if outputs else "failed"
+    checkpoint.record_item(item_id, status, outputs, errors or None)
+    return status
+
+
+async def run_direct(
+    items: list[BulkItem],
+    checkpoint: Checkpoint,
+    output_dir: str,
+    concurrency: int,
+) -> list[str]:
+    """Run items through ``execute_generation`` with at most ``concurrency`` in flight."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(item: BulkItem) -> str:
+        async with slots:
+            images = await asyncio.to_thread(load_reference_images, item.image_paths)
+            try:
+                payload = await execute_generation(dataclasses.replace(item.request, reference_images=images))
+            except GenerationExecutionError as error:
+                logger.warning("Item %s failed: %s", item.item_id, error)
+                checkpoint.record_item(item.item_id, "failed", [], str(error))
+                return "failed"
+            return await asyncio.to_thread(_record_results, checkpoint, output_dir, item.item_id, payload["results"])
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+async def run_batch(
+    items: list[BulkItem],
+    checkpoint: Checkpoint,
+    output_dir: str,
+    *,
+    batch_size: int,
+    poll_interval_seconds: float,
+) -> list[str]:
+    """Submit items to the Gemini Batch API, one batch job per model and chunk, and collect them.
+
+    Batch jobs recorded in the checkpoint are polled rather than resubmitted,
+    and models whose results the checkpoint already holds are not requested.
+    Every model of a ``Both`` item is requested; there is no fallback to the
+    other model as in direct mode. Each chunk goes to the least-loaded pooled
+    client, and its batch job is polled through that same client.
+    """
+    image_service = ImageService()
+    pool = image_service.pool
+    pending = {item.item_id: item for item in items}
+    statuses = []
+
+    def finish_item(item_id: str) -> None:
+        models = target_models_for(pending[item_id].request.model_mode)
+        recorded = checkpoint.model_results.get(item_id, {})
+        if not all(model_name in recorded for model_name in models):
+            return
+        outputs = [output for model_name in models for output in recorded[model_name]["outputs"]]
+        errors = "; ".join(str(recorded[model_name]["error"]) for model_name in models if recorded[model_name]["error"])
+        status = "completed" if outputs else "failed"
+        checkpoint.record_item(item_id, status, outputs, errors or None)
+        statuses.append(status)
+        del pending[item_id]
+
+    for item_id in list(pending):
+        finish_item(item_id)
+    covered = {
+        (item_id, str(batch["model"]))
+        for batch in checkpoint.open_batches
+        for item_id in batch["item_ids"]
+    } | {(item_id, model_name) for item_id, results in checkpoint.model_results.items() for model_name in results}
+    active = [batch for batch in checkpoint.open_batches if any(item_id in pending for item_id in batch["item_ids"])]
+    by_model: dict[str, list[BulkItem]] = {}
+    for item in pending.values():
+        for model_name in target_models_for(item.request.model_mode):
+            if (item.item_id, model_name) not in covered:
+                by_model.setdefault(model_name, []).append(item)
+
+    for model_name, model_items in by_model.items():
+        remaining = list(model_items)
+        while remaining:
+            with pool.lease() as member:
+                chunk, requests = await _build_batch_chunk(image_service, member, remaining, model_name, batch_size)
+                del remaining[: len(chunk)]
+                batch_job = await asyncio.to_thread(
+                    member.client.batches.create,
+                    model=model_name,
+                    src=requests,
+                    config={"display_name": f"bulk-{chunk[0].item_id}-{len(chunk)}"},
+                )
+            item_ids = [item.item_id for item in chunk]
+            checkpoint.record_batch_submitted(batch_job.name, model_name, item_ids, member.name)
+            active.append({"name": batch_job.name, "model": model_name, "item_ids": item_ids, "client": member.name})
+            logger.info("Submitted batch job %s with %d %s requests", batch_job.name, len(chunk), model_name)
+
+    while active:
+        for batch in list(active):
+            # Checkpoints written before the pool existed carry no client; those jobs belong to the first key.
+            member = pool.get(str(batch.get("client"))) or pool.members[0]
+            batch_job = await asyncio.to_thread(member.client.batches.get, name=batch["name"])
+            state = batch_job.state.name if batch_job.state is not None else "JOB_STATE_UNSPECIFIED"
+            if state not in BATCH_TERMINAL_STATES:
+                continue
+            model_name = str(batch["model"])
+            for item_id, result in _read_batch_results(image_service, batch_job, batch, state):
+                if item_id not in pending:
+                    continue
+                outputs = await asyncio.to_thread(write_outputs, output_dir, item_id, {model_name: result})
+                checkpoint.record_model_result(item_id, model_name, outputs, result.get("error"))
+                finish_item(item_id)
+            checkpoint.record_batch_finished(str(batch["name"]), state)
+            active.remove(batch)
+            logger.info("Batch job %s finished with %s", batch["name"], state)
+        if active:
+            await asyncio.sleep(poll_interval_seconds)
+    return statuses
+
+
+async def _build_batch_chunk(
+    image_service: ImageService,
+    member: PooledClient,
+    items: list[BulkItem],
+    model_name: str,
+    batch_size: int,
+) -> tuple[list[BulkItem], list[object]]:
+    """Build requests for the leading items until ``batch_size`` or ``BATCH_INLINE_MAX_BYTES`` is reached.
+
+    Inline reference images make requests large, so the serialized size
+    decides as much as the count. The request that overflows a chunk is
+    built again for the next one, whose client may differ. The first request
+    always goes in, so an oversized one is still submitted and reported by
+    the Batch API.
+    """
+    chunk, requests, total_bytes = [], [], 0
+    for item in items[:batch_size]:
+        request = await _build_batch_request(image_service, member, item, model_name)
+        request_bytes = len(request.model_dump_json(exclude_none=True))
+        if chunk and total_bytes + request_bytes > settings.BATCH_INLINE_MAX_BYTES:
+            break
+        chunk.append(item)
+        requests.append(request)
+        total_bytes += request_bytes
+    return chunk, requests
+
+
+async def _build_batch_request(
+    image_service: ImageService,
+    member: PooledClient,
+    item: BulkItem,
+    model_name: str,
+) -> object:
+    images = await asyncio.to_thread(load_reference_images, item.image_paths)
+    file_objects = await prepare_reference_files(images)
+    request = item.request
+    return await asyncio.to_thread(
+        image_service.build_batch_request,
+        prompt=request.prompt,
+        aspect_ratio=request.aspect_ratio,
+        person_images=file_objects or None,
+        resolution=request.resolution,
+        temperature=request.temperature,
+        model=model_name,
+        thinking_level=settings.IMAGE_DEFAULT_THINKING_LEVEL if "flash" in model_name.lower() else None,
+        metadata={"item_id": item.item_id},
+        member=member,
+    )
+
+
+def _read_batch_results(
+    image_service: ImageService,
+    batch_job: object,
+    batch: dict[str, object],
+    state: str,
+) -> Iterable[tuple[str, dict[str, object]]]:
+    """Yield one result per item of a finished batch job, in the shape ``execute_generation`` returns."""
+    item_ids = list(batch["item_ids"])
+    responses = batch_job.dest.inlined_responses if batch_job.dest is not None else None
+    if not responses:
+        for item_id in item_ids:
+            yield item_id, _failed_result(f"Batch job ended with {state}")
+        return
+    for index, inlined in enumerate(responses):
+        # Responses come back in request order; metadata is checked first in case that ever changes.
+        item_id = (inlined.metadata or {}).get("item_id") or (item_ids[index] if index < len(item_ids) else None)
+        if item_id is None:
+            continue
+        if inlined.error is not None or inlined.response is None:
+            message = inlined.error.message if inlined.error is not None else "empty response"
+            yield item_id, _failed_result(message)
+            continue
+        result = image_service.read_response(inlined.response)
+        image_bytes = result["image_bytes"]
+        yield item_id, {
+            "image_bytes": image_bytes,
+            "mime_type": sniff_image_mime_type(image_bytes) if image_bytes else None,
+            "text_output": result["text_output"],
+            "error": None if image_bytes else "No image in response",
+        }
+
+
+def _failed_result(message: str) -> dict[str, object]:
+    return {"image_bytes": None, "mime_type": None, "text_output": "", "error": message}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSON Lines (.jsonl) or CSV (.csv) file of generation requests.")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--mode", choices=("direct", "batch"), default="direct")
+    parser.add_argument("--concurrency", type=int, default=4, help="Generations in flight (direct mode).")
+    parser.add_argument("--batch-size", type=int, default=100, help="Requests per batch job (batch mode).")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between batch job polls.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        items = load_items(args.input)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(args.output_dir, CHECKPOINT_FILENAME))
+    todo = [item for item in items if item.item_id not in checkpoint.completed_ids]
+    logger.info("%d of %d items left to generate", len(todo), len(items))
+
+    if args.mode == "batch":
+        statuses = asyncio.run(
+            run_batch(
+                todo,
+                checkpoint,
+                args.output_dir,
+                batch_size=args.batch_size,
+                poll_interval_seconds=args.poll_interval,
+            )
+        )
+    else:
+        statuses = asyncio.run(run_direct(todo, checkpoint, args.output_dir, args.concurrency))
+    failed = statuses.count("failed")
+    print(f"{len(items) - len(todo)} skipped, {statuses.count('completed')} completed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,251 @@
+"""HTTP load generation shared by the benchmark and replay tools.
+
+Only the standard library is used, so the tools run anywhere the backend does.
+"""
+
+import json
+import math
+import os
+import secrets
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from backend.services.mime_utils import guess_mime_type
+
+TERMINAL_STATUSES = ("completed", "failed")
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+@dataclass(frozen=True)
+class UploadFile:
+    """One file sent as a multipart form part."""
+
+    filename: str
+    content: bytes
+    mime_type: str = "application/octet-stream"
+
+
+@dataclass(frozen=True)
+class JobOutcome:
+    """How one submitted generation ended, as seen by the client."""
+
+    status: str
+    submit_seconds: float
+    total_seconds: float
+    http_status: int | None = None
+    attributes: dict[str, object] = field(default_factory=dict)
+
+
+def encode_multipart(fields: dict[str, str], files: Sequence[tuple[str, UploadFile]]) -> tuple[bytes, str]:
+    """Build a ``multipart/form-data`` body and its content type."""
+    boundary = f"----gemini-hub-{secrets.token_hex(12)}"
+    chunks: list[bytes] = []
+    for name, value in fields.items():
+        chunks.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, upload in files:
+        chunks.append(
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"; filename="{upload.filename}"\r\n'
+                f"Content-Type: {upload.mime_type}\r\n\r\n"
+            ).encode()
+        )
+        chunks.append(upload.content)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), f"multipart/form-data; boundary={boundary}"
+
+
+class GenerationApiClient:
+    """Submit generations to a running server and poll them to completion."""
+
+    def __init__(self, base_url: str, timeout_seconds: float = 30.0) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._timeout_seconds = timeout_seconds
+
+    def submit(
+        self,
+        fields: dict[str, str],
+        files: Sequence[tuple[str, UploadFile]] = (),
+        headers: dict[str, str] | None = None,
+    ) -> tuple[int, dict[str, object]]:
+        body, content_type = encode_multipart(fields, files)
+        return self._request(
+            "POST",
+            "/api/generate/submit",
+            body,
+            {"Content-Type": content_type, **(headers or {})},
+        )
+
+    def status(self, job_id: str) -> tuple[int, dict[str, object]]:
+        return self._request("GET", f"/api/generate/status/{job_id}")
+
+    def generate(
+        self,
+        fields: dict[str, str],
+        files: Sequence[tuple[str, UploadFile]] = (),
+        deadline_seconds: float = 600.0,
+    ) -> JobOutcome:
+        """Run one generation through the synchronous ``/api/generate`` route."""
+        body, content_type = encode_multipart(fields, files)
+        started_at = time.perf_counter()
+        try:
+            http_status, payload = self._request(
+                "POST",
+                "/api/generate",
+                body,
+                {"Content-Type": content_type},
+                timeout_seconds=deadline_seconds,
+            )
+        except OSError as error:
+            elapsed = time.perf_counter() - started_at
+            return JobOutcome("error", elapsed, elapsed, attributes={"error": str(error)})
+        elapsed = time.perf_counter() - started_at
+        status = {200: "completed", 429: "rejected", 500: "failed"}.get(http_status, "error")
+        return JobOutcome(status, elapsed, elapsed, http_status, {"fallback_used": bool(payload.get("fallback_used"))})
+
+    def run_job(
+        self,
+        fields: dict[str, str],
+        files: Sequence[tuple[str, UploadFile]] = (),
+        poll_interval_seconds: float = 0.5,
+        deadline_seconds: float = 600.0,
+    ) -> JobOutcome:
+        """Submit one generation and poll its status until it finishes or the deadline passes."""
+        started_at = time.perf_counter()
+        try:
+            http_status, payload = self.submit(fields, files)
+        except OSError as error:
+            elapsed = time.perf_counter() - started_at
+            return JobOutcome("error", elapsed, elapsed, attributes={"error": str(error)})
+        submit_seconds = time.perf_counter() - started_at
+        if http_status == 429:
+            return JobOutcome("rejected", submit_seconds, submit_seconds, http_status)
+        if http_status != 200:
+            return JobOutcome("error", submit_seconds, submit_seconds, http_status, {"error": payload.get("detail")})
+
+        job_id = str(payload["job_id"])
+        while time.perf_counter() - started_at < deadline_seconds:
+            time.sleep(poll_interval_seconds)
+            try:
+                http_status, payload = self.status(job_id)
+            except OSError:
+                continue
+            if http_status == 200 and payload.get("status") in TERMINAL_STATUSES:
+                return JobOutcome(
+                    str(payload["status"]),
+                    submit_seconds,
+                    time.perf_counter() - started_at,
+                    http_status,
+                    {"job_id": job_id, "fallback_used": bool(payload.get("fallback_used"))},
+                )
+            if http_status == 404:
+                break
+        return JobOutcome("timeout", submit_seconds, time.perf_counter() - started_at, attributes={"job_id": job_id})
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        headers: dict[str, str] | None = None,
+        timeout_seconds: float | None = None,
+    ) -> tuple[int, dict[str, object]]:
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers or {}, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout_seconds or self._timeout_seconds) as response:
+                return response.status, json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as error:
+            try:
+                payload = json.loads(error.read() or b"{}")
+            except ValueError:
+                payload = {}
+            return error.code, payload
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(
+    outcomes: Sequence[JobOutcome],
+    elapsed_seconds: float,
+    peak_rss_bytes: int | None = None,
+) -> dict[str, object]:
+    """Aggregate outcomes into throughput, latency percentiles and error counts."""
+    counts: dict[str, int] = {}
+    for outcome in outcomes:
+        counts[outcome.status] = counts.get(outcome.status, 0) + 1
+    completed = [outcome.total_seconds for outcome in outcomes if outcome.status == "completed"]
+    submits = [outcome.submit_seconds for outcome in outcomes]
+    report: dict[str, object] = {
+        "jobs": len(outcomes),
+        "statuses": counts,
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "throughput_jobs_per_second": round(len(completed) / elapsed_seconds, 3) if elapsed_seconds > 0 else 0.0,
+        "latency_seconds": {
+            f"p{round(fraction * 100)}": round(percentile(completed, fraction), 3) for fraction in PERCENTILES
+        },
+        "submit_latency_seconds": {
+            f"p{round(fraction * 100)}": round(percentile(submits, fraction), 3) for fraction in PERCENTILES
+        },
+    }
+    report["latency_seconds"]["max"] = round(max(completed, default=0.0), 3)
+    if peak_rss_bytes is not None:
+        report["peak_rss_mb"] = round(peak_rss_bytes / (1024 * 1024), 1)
+    return report
+
+
+def format_report(report: dict[str, object]) -> str:
+    """Render a report for terminals; ``--json`` prints the dict as is instead."""
+    latency = report["latency_seconds"]
+    submit_latency = report["submit_latency_seconds"]
+    statuses = ", ".join(f"{status}={count}" for status, count in sorted(report["statuses"].items()))
+    lines = [
+        f"jobs:        {report['jobs']} ({statuses})",
+        f"elapsed:     {report['elapsed_seconds']:.1f}s",
+        f"throughput:  {report['throughput_jobs_per_second']:.2f} jobs/s",
+        "latency:     " + "  ".join(f"{name}={value:.2f}s" for name, value in latency.items()),
+        "submit:      " + "  ".join(f"{name}={value * 1000:.0f}ms" for name, value in submit_latency.items()),
+    ]
+    if "peak_rss_mb" in report:
+        lines.append(f"peak RSS:    {report['peak_rss_mb']:.1f} MiB")
+    return "\n".join(lines)
+
+
+def peak_rss_bytes(pid: int | None = None) -> int | None:
+    """Peak resident memory of ``pid`` (Linux) or of this process; None when unknown."""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status", encoding="ascii") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def read_upload_file(path: str) -> UploadFile:
+    """Load a reference image from disk for use in submitted requests."""
+    with open(path, "rb") as file:
+        content = file.read()
+    return UploadFile(os.path.basename(path), content, guess_mime_type(path, default="image/jpeg"))
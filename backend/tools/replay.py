@@ -0,0 +1,229 @@
+"""Replay captured generation traffic and report latency and throughput.
+
+Reads the JSON Lines written by traffic capture (``TRAFFIC_CAPTURE_PATH``)
+and reissues every request at its original offset, divided by ``--speed``.
+Prompts and reference images are not captured, so they are replaced by
+stand-ins of the recorded length and size; repeated images keep repeating,
+so upload caching behaves as it did. Submissions that were rejected or
+attached to an earlier job are reissued too, the attached ones with the
+prompt of the job they joined. Without ``--base-url`` the backend runs
+in-process on the offline Gemini simulator::
+
+    python -m backend.tools.replay traffic.jsonl --speed 4
+    python -m backend.tools.replay traffic.jsonl --base-url http://127.0.0.1:8000 --server-pid 1234
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from backend.tools.benchmark import SIMULATOR_OPTIONS, run_local_server
+from backend.tools.loadgen import (
+    PERCENTILES,
+    GenerationApiClient,
+    JobOutcome,
+    UploadFile,
+    format_report,
+    peak_rss_bytes,
+    percentile,
+    summarize,
+)
+
+# Random-noise JPEGs come out at roughly this many bytes per pixel.
+NOISE_JPEG_BYTES_PER_PIXEL = 0.9
+
+
+@dataclass(frozen=True)
+class ReplayItem:
+    """One captured request, ready to be sent ``offset_seconds`` after the replay starts."""
+
+    offset_seconds: float
+    route: str
+    fields: dict[str, str]
+    files: tuple[tuple[str, UploadFile], ...]
+    recorded_latency_seconds: float | None
+
+
+def load_workload(path: str) -> list[dict[str, object]]:
+    """Read capture records in timestamp order, skipping lines that are not valid records."""
+    records = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "timestamp" in record and "request" in record:
+                records.append(record)
+    return sorted(records, key=lambda record: record["timestamp"])
+
+
+@functools.lru_cache(maxsize=64)
+def synthetic_reference_image(size_bytes: int, sha256: str) -> UploadFile:
+    """Build a decodable JPEG of exactly ``size_bytes`` that is unique and stable per original hash.
+
+    The noise is seeded from the hash, so the same image comes back after a
+    cache eviction or in another replay run.
+    """
+    from PIL import Image
+
+    seed = hashlib.sha256(sha256.encode()).digest()
+    noise_source = random.Random(seed)
+    edge = max(16, int(math.sqrt(size_bytes / NOISE_JPEG_BYTES_PER_PIXEL)))
+    buffer = io.BytesIO()
+    while True:
+        noise = Image.frombytes("RGB", (edge, edge), noise_source.randbytes(edge * edge * 3))
+        noise.paste(tuple(seed[:3]), (0, 0, 8, 8))
+        buffer = io.BytesIO()
+        noise.save(buffer, format="JPEG", quality=90)
+        if buffer.tell() <= size_bytes or edge == 16:
+            break
+        edge = max(16, int(edge * 0.9))
+    # Decoders ignore bytes after the end-of-image marker, so pad up to the recorded size.
+    padding = size_bytes - buffer.tell()
+    if padding > 0:
+        buffer.write((seed * (padding // len(seed) + 1))[:padding])
+    return UploadFile(f"{sha256[:12]}.jpg", buffer.getvalue(), "image/jpeg")
+
+
+def build_replay_items(records: list[dict[str, object]], speed: float = 1.0) -> list[ReplayItem]:
+    """Turn capture records into requests scheduled at their original offsets divided by ``speed``."""
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    if not records:
+        return []
+    first_timestamp = float(records[0]["timestamp"])
+    items = []
+    prompts_by_job: dict[str, str] = {}
+    for index, record in enumerate(records):
+        request = record["request"]
+        # Unique prompts keep request coalescing from merging jobs the original traffic ran apart,
+        # while submissions that attached to a job repeat its prompt so they can attach again.
+        prefix = f"Replay {index}. "
+        prompt = prefix + "x" * max(0, int(request.get("prompt_chars", 0)) - len(prefix))
+        if record.get("job_id"):
+            prompt = prompts_by_job.setdefault(str(record["job_id"]), prompt)
+        fields = {
+            "prompt": prompt,
+            "model_mode": str(request["model_mode"]),
+            "resolution": str(request["resolution"]),
+            "aspect_ratio": str(request["aspect_ratio"]),
+            "prompt_type": str(request.get("prompt_type", "custom")),
+            "temperature": str(request.get("temperature", 1.0)),
+            "cache": str(request.get("cache_mode", "off")),
+        }
+        if record.get("route", "submit") == "submit":
+            fields["priority"] = str(record.get("priority", "interactive"))
+        files = tuple(
+            ("reference_images", synthetic_reference_image(int(image["size_bytes"]), str(image["sha256"])))
+            for image in request.get("reference_images", [])
+        )
+        items.append(
+            ReplayItem(
+                offset_seconds=(float(record["timestamp"]) - first_timestamp) / speed,
+                route=str(record.get("route", "submit")),
+                fields=fields,
+                files=files,
+                recorded_latency_seconds=record.get("latency_seconds", {}).get("total"),
+            )
+        )
+    return items
+
+
+def replay(
+    client: GenerationApiClient,
+    items: list[ReplayItem],
+    *,
+    max_in_flight: int,
+    poll_interval_seconds: float,
+) -> tuple[list[JobOutcome], float]:
+    """Send every item at its offset (open loop) and wait for all of them to finish."""
+    slots = threading.BoundedSemaphore(max_in_flight)
+
+    def run(item: ReplayItem) -> JobOutcome:
+        try:
+            if item.route == "generate":
+                return client.generate(item.fields, item.files)
+            return client.run_job(item.fields, item.files, poll_interval_seconds=poll_interval_seconds)
+        finally:
+            slots.release()
+
+    started_at = time.perf_counter()
+    futures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for item in items:
+            delay = item.offset_seconds - (time.perf_counter() - started_at)
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            futures.append(executor.submit(run, item))
+        outcomes = [future.result() for future in futures]
+    return outcomes, time.perf_counter() - started_at
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="JSON Lines file written by traffic capture.")
+    parser.add_argument("--speed", type=float, default=1.0, help="2 replays twice as fast as recorded.")
+    parser.add_argument("--base-url", help="Replay against a running server instead of an in-process one.")
+    parser.add_argument("--server-pid", type=int, help="Report peak RSS of this server process (Linux).")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--limit", type=int, help="Replay only the first N records.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    simulator = parser.add_argument_group("simulator (in-process server only)")
+    for option in SIMULATOR_OPTIONS:
+        simulator.add_argument(f"--{option.replace('_', '-')}", type=float)
+    args = parser.parse_args(argv)
+
+    records = load_workload(args.capture)[: args.limit]
+    if not records:
+        parser.error(f"No capture records in {args.capture}")
+    items = build_replay_items(records, args.speed)
+    simulator_env = {
+        env_name: str(getattr(args, option))
+        for option, env_name in SIMULATOR_OPTIONS.items()
+        if getattr(args, option) is not None
+    }
+
+    with contextlib.ExitStack() as stack:
+        base_url = args.base_url or stack.enter_context(run_local_server(simulator_env))
+        outcomes, elapsed = replay(
+            GenerationApiClient(base_url),
+            items,
+            max_in_flight=args.max_in_flight,
+            poll_interval_seconds=args.poll_interval,
+        )
+    rss = peak_rss_bytes(args.server_pid) if args.base_url is None or args.server_pid else None
+    report = summarize(outcomes, elapsed, rss)
+    recorded = [item.recorded_latency_seconds for item in items if item.recorded_latency_seconds is not None]
+    report["offered_rate_jobs_per_second"] = (
+        round(len(items) / items[-1].offset_seconds, 3) if items[-1].offset_seconds > 0 else None
+    )
+    report["recorded_latency_seconds"] = {
+        f"p{round(fraction * 100)}": round(percentile(recorded, fraction), 3) for fraction in PERCENTILES
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+        print(
+            "recorded:    "
+            + "  ".join(f"{name}={value:.2f}s" for name, value in report["recorded_latency_seconds"].items())
+        )
+    return 0 if report["statuses"].get("completed", 0) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
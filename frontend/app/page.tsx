@@ -8,7 +8,13 @@ import { ControlsRow } from "@/components/controls-row";
 import { ReferenceUpload } from "@/components/reference-upload";
 import { PromptSection } from "@/components/prompt-section";
 import { Button } from "@/components/ui/button";
-import { ApiError, getGenerateJobStatus, getPrompts, submitGenerateJob } from "@/lib/api";
+import {
+  ApiError,
+  getGenerateJobStatus,
+  getPrompts,
+  streamGenerateJob,
+  submitGenerateJob,
+} from "@/lib/api";
 import type {
   AspectRatio,
   GenerateJobStatusResponse,
@@ -24,6 +30,9 @@ const ResultSection = dynamic(
   () => import("@/components/result-section").then((mod) => mod.ResultSection)
 );
 
+// Stays under the server's STATUS_LONG_POLL_MAX_SECONDS.
+const JOB_STATUS_WAIT_SECONDS = 20;
+
 export default function Home() {
   const [modelMode, setModelMode] = useState<ModelMode>("Flash");
   const [aspectRatio, setAspectRatio] = useState<AspectRatio>("16:9");
@@ -130,7 +139,7 @@ export default function Home() {
   const pollGenerationJob = useCallback(
     async (jobId: string, runId: number): Promise<GenerateJobStatusResponse> => {
       while (generationRunRef.current === runId) {
-        const response = await getGenerateJobStatus(jobId);
+        const response = await getGenerateJobStatus(jobId, JOB_STATUS_WAIT_SECONDS);
 
         if (generationRunRef.current !== runId) {
           throw new Error("Generation was cancelled.");
@@ -141,7 +150,8 @@ export default function Home() {
           return response;
         }
 
-        await new Promise((resolve) => window.setTimeout(resolve, 1500));
+        // The long-poll already waited for a change; only pause briefly between requests.
+        await new Promise((resolve) => window.setTimeout(resolve, 250));
       }
 
       throw new Error("Generation was cancelled.");
@@ -149,6 +159,27 @@ export default function Home() {
     []
   );
 
+  const waitForGenerationJob = useCallback(
+    async (jobId: string, runId: number): Promise<GenerateJobStatusResponse> => {
+      try {
+        const response = await streamGenerateJob(jobId, (status) => {
+          if (generationRunRef.current === runId) {
+            setJobStatus(status);
+          }
+        });
+        if (generationRunRef.current !== runId) {
+          throw new Error("Generation was cancelled.");
+        }
+        setJobStatus(response.status);
+        return response;
+      } catch (err) {
+        console.warn("Falling back to job status polling.", err);
+        return pollGenerationJob(jobId, runId);
+      }
+    },
+    [pollGenerationJob]
+  );
+
   const handleGenerate = async () => {
     if (!prompt.trim()) {
       toast.error("Будь ласка, введіть промпт!");
@@ -171,10 +202,11 @@ export default function Home() {
         temperature,
         promptType,
         referenceImages: referenceFiles,
+        idempotencyKey: crypto.randomUUID(),
       });
       setJobStatus(submission.status);
 
-      const response = await pollGenerationJob(submission.job_id, runId);
+      const response = await waitForGenerationJob(submission.job_id, runId);
       if (response.status === "failed") {
         throw new Error(response.error || "Генерація завершилася з помилкою.");
       }
@@ -183,7 +215,7 @@ export default function Home() {
 
       // Check if all results are errors (no images)
       const hasAnyImage = Object.values(responseResults).some(
-        (r) => r.image_base64 !== null
+        (r) => Boolean(r.image_url || r.image_base64)
       );
 
       if (!hasAnyImage) {
@@ -10,6 +10,7 @@ import {
   CollapsibleTrigger,
 } from "@/components/ui/collapsible";
 import { Skeleton } from "@/components/ui/skeleton";
+import { getResultDownloadSrc, getResultImageSrc, getResultThumbnailSrc } from "@/lib/api";
 import type { GenerationJobStatus, GenerationResult } from "@/lib/types";
 
 const MODEL_DISPLAY_NAMES: Record<string, string> = {
@@ -23,13 +24,9 @@ interface ResultSectionProps {
   jobStatus?: GenerationJobStatus | null;
 }
 
-function downloadImage(base64: string, filename: string) {
-  const byteString = atob(base64);
-  const bytes = new Uint8Array(byteString.length);
-  for (let i = 0; i < byteString.length; i++) {
-    bytes[i] = byteString.charCodeAt(i);
-  }
-  const blob = new Blob([bytes], { type: "image/png" });
+async function downloadImage(src: string, filename: string) {
+  const res = await fetch(src);
+  const blob = await res.blob();
   const url = URL.createObjectURL(blob);
   const a = document.createElement("a");
   a.href = url;
@@ -38,6 +35,13 @@ function downloadImage(base64: string, filename: string) {
   URL.revokeObjectURL(url);
 }
 
+function imageExtension(mimeType?: string | null): string {
+  if (mimeType === "image/jpeg") {
+    return "jpg";
+  }
+  return mimeType?.startsWith("image/") ? mimeType.slice("image/".length) : "png";
+}
+
 export const ResultSection = memo(function ResultSection({
   results,
   isGenerating,
@@ -89,25 +93,31 @@ export const ResultSection = memo(function ResultSection({
         <div className={`grid gap-4 ${entries.length > 1 ? "grid-cols-1 md:grid-cols-2" : "grid-cols-1 max-w-2xl mx-auto"}`}>
           {entries.map(([modelName, result]) => {
             const displayName = MODEL_DISPLAY_NAMES[modelName] || modelName;
+            const imageSrc = getResultImageSrc(result);
+            const thumbnailSrc = getResultThumbnailSrc(result);
             return (
               <div key={modelName} className="space-y-3">
                 <p className="font-semibold">{displayName}</p>
-                {result.image_base64 ? (
+                {imageSrc ? (
                   <>
-                    <Image
-                      src={`data:image/png;base64,${result.image_base64}`}
-                      alt={`Generated by ${displayName}`}
-                      width={1024}
-                      height={1024}
-                      unoptimized
-                      className="w-full rounded-md border"
-                    />
+                    {/* Phones preview the small thumbnail; the download button still fetches the original. */}
+                    <picture>
+                      {thumbnailSrc && <source media="(max-width: 767px)" srcSet={thumbnailSrc} />}
+                      <Image
+                        src={imageSrc}
+                        alt={`Generated by ${displayName}`}
+                        width={1024}
+                        height={1024}
+                        unoptimized
+                        className="w-full rounded-md border"
+                      />
+                    </picture>
                     <Button
                       className="w-full"
                       onClick={() =>
                         downloadImage(
-                          result.image_base64!,
-                          `generated_${modelName}_${Date.now()}.png`
+                          getResultDownloadSrc(result) ?? imageSrc,
+                          `generated_${modelName}_${Date.now()}.${imageExtension(result.mime_type)}`
                         )
                       }
                     >
@@ -1,6 +1,8 @@
 import {
   GenerateJobStatusResponse,
   GenerateJobSubmitResponse,
+  GenerationJobStatus,
+  GenerationResult,
   PromptsResponse,
 } from "./types";
 
@@ -105,6 +107,35 @@ function getApiUrl(path: string): string {
   return `${getApiBaseUrl()}${path}`;
 }
 
+export function getResultDownloadSrc(result: GenerationResult): string | null {
+  if (result.image_url) {
+    // Previews are negotiated to WebP/AVIF; downloads always get the original.
+    return getApiUrl(`${result.image_url}?variant=original`);
+  }
+  return getResultImageSrc(result);
+}
+
+export function getResultThumbnailSrc(result: GenerationResult): string | null {
+  if (result.thumbnail_url) {
+    return getApiUrl(result.thumbnail_url);
+  }
+  if (result.image_url) {
+    // The thumbnail may still be transcoding; the server answers with the original until it is ready.
+    return getApiUrl(`${result.image_url}?variant=thumbnail`);
+  }
+  return null;
+}
+
+export function getResultImageSrc(result: GenerationResult): string | null {
+  if (result.image_url) {
+    return getApiUrl(result.image_url);
+  }
+  if (result.image_base64) {
+    return `data:${result.mime_type || "image/png"};base64,${result.image_base64}`;
+  }
+  return null;
+}
+
 async function fetchWithTimeout(
   input: RequestInfo | URL,
   init: RequestInit = {},
@@ -164,10 +195,12 @@ export async function submitGenerateJob(params: {
   temperature: number;
   promptType: string;
   referenceImages: File[];
+  idempotencyKey?: string;
 }): Promise<GenerateJobSubmitResponse> {
   const res = await fetch(getApiUrl("/api/generate/submit"), {
     method: "POST",
     body: buildGenerateFormData(params),
+    headers: params.idempotencyKey ? { "Idempotency-Key": params.idempotencyKey } : undefined,
   });
 
   if (!res.ok) {
@@ -183,12 +216,15 @@ export async function submitGenerateJob(params: {
 }
 
 export async function getGenerateJobStatus(
-  jobId: string
+  jobId: string,
+  waitSeconds = 0
 ): Promise<GenerateJobStatusResponse> {
+  // With waitSeconds the server holds the request until the job changes (long-poll).
+  const query = waitSeconds > 0 ? `?wait=${waitSeconds}` : "";
   const res = await fetchWithTimeout(
-    getApiUrl(`/api/generate/status/${jobId}`),
+    getApiUrl(`/api/generate/status/${jobId}${query}`),
     undefined,
-    JOB_STATUS_TIMEOUT_MS
+    JOB_STATUS_TIMEOUT_MS + waitSeconds * 1000
   );
 
   if (!res.ok) {
@@ -203,6 +239,35 @@ export async function getGenerateJobStatus(
   return res.json();
 }
 
+const JOB_PROGRESS_EVENTS = ["queued", "running", "uploading", "generating", "fallback"] as const;
+
+export function streamGenerateJob(
+  jobId: string,
+  onStatus: (status: GenerationJobStatus) => void
+): Promise<GenerateJobStatusResponse> {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(getApiUrl(`/api/generate/events/${jobId}`));
+
+    for (const eventType of JOB_PROGRESS_EVENTS) {
+      source.addEventListener(eventType, () => {
+        onStatus(eventType === "queued" ? "queued" : "running");
+      });
+    }
+
+    for (const eventType of ["completed", "failed"] as const) {
+      source.addEventListener(eventType, (event) => {
+        source.close();
+        resolve(JSON.parse((event as MessageEvent<string>).data));
+      });
+    }
+
+    source.onerror = () => {
+      source.close();
+      reject(new ApiError("Job event stream was interrupted.", 0, null));
+    };
+  });
+}
+
 export async function getPrompts(): Promise<PromptsResponse> {
   try {
     const res = await fetchWithTimeout(
@@ -4,14 +4,28 @@ export type ImageResolution = "1K" | "2K";
 export type PromptType = "custom" | "women" | "men" | "darnytsia";
 
 export interface GenerationResult {
-  image_base64: string | null;
+  image_base64?: string | null;
+  image_url?: string | null;
+  thumbnail_url?: string | null;
+  variants?: string[];
+  mime_type?: string | null;
+  image_size?: number;
   text_output: string;
   error?: string | null;
 }
 
+export interface StageTiming {
+  stage: string;
+  duration_ms: number;
+  model?: string;
+  error?: boolean;
+}
+
 export interface GenerateResponse {
   results: Record<string, GenerationResult>;
   fallback_used?: boolean;
+  cached?: boolean;
+  timings?: StageTiming[];
 }
 
 export type GenerationJobStatus = "queued" | "running" | "completed" | "failed";
@@ -19,13 +33,20 @@ export type GenerationJobStatus = "queued" | "running" | "completed" | "failed";
 export interface GenerateJobSubmitResponse {
   job_id: string;
   status: GenerationJobStatus;
+  attached?: boolean;
+  queue_position?: number;
+  estimated_start_at?: number;
 }
 
 export interface GenerateJobStatusResponse {
   job_id: string;
   status: GenerationJobStatus;
+  queue_position?: number;
+  estimated_start_at?: number;
   results?: Record<string, GenerationResult>;
   fallback_used?: boolean;
+  cached?: boolean;
+  timings?: StageTiming[];
   error?: string | null;
 }
 
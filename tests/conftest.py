@@ -0,0 +1,4 @@
+import os
+
+# Keep test clients from contacting Gemini when a developer's shell exports a key.
+os.environ.setdefault("GEMINI_WARMUP_ENABLED", "false")
@@ -0,0 +1,186 @@
+import asyncio
+import dataclasses
+import io
+import json
+import random
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from backend.config import settings
+from backend.services.client_pool import GeminiClientPool
+from backend.services.gemini_simulator import SimulatedGeminiClient, SimulatorConfig
+from backend.tools import bulk_generate
+
+INSTANT = SimulatorConfig(
+    upload_seconds=0,
+    upload_seconds_per_mb=0,
+    first_chunk_seconds=0,
+    stream_seconds=0,
+    batch_seconds=0,
+    rate_limit_rate=0,
+    unavailable_rate=0,
+    stall_rate=0,
+    seed=1,
+)
+
+
+def _write_requests(tmp_path: Path) -> Path:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "gray").save(buffer, format="JPEG")
+    (tmp_path / "face.jpg").write_bytes(buffer.getvalue())
+    rows = [
+        {"id": "a", "prompt": "Studio headshot", "model_mode": "Flash", "reference_images": ["face.jpg"]},
+        {"id": "b", "prompt": "Outdoor headshot", "model_mode": "Flash", "reference_images": ["face.jpg"]},
+        {"id": "c", "prompt": "Office headshot", "model_mode": "Pro"},
+    ]
+    path = tmp_path / "requests.jsonl"
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return path
+
+
+def test_direct_mode_skips_items_finished_by_an_earlier_run(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A rerun only generates what the checkpoint does not list as completed."""
+    client = SimulatedGeminiClient(INSTANT)
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: GeminiClientPool([("default", client)]),
+    )
+    requests_path = _write_requests(tmp_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    bulk_generate.Checkpoint(str(output_dir / "checkpoint.jsonl")).record_item("a", "completed", ["a.png"])
+
+    first = bulk_generate.main([str(requests_path), "--output-dir", str(output_dir), "--concurrency", "2"])
+    second = bulk_generate.main([str(requests_path), "--output-dir", str(output_dir)])
+
+    assert (first, second) == (0, 0)
+    assert client.generate_calls == 2
+    assert sorted(path.name for path in output_dir.glob("*.png")) == [
+        "b.gemini-3.1-flash-image-preview.png",
+        "c.gemini-3-pro-image-preview.png",
+    ]
+
+
+def test_batch_mode_resumes_polling_submitted_jobs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """An interrupted batch run picks its batch jobs up again instead of resubmitting them."""
+    client = SimulatedGeminiClient(dataclasses.replace(INSTANT, batch_seconds=3600))
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: GeminiClientPool([("default", client)]),
+    )
+    requests_path = _write_requests(tmp_path)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    items = bulk_generate.load_items(str(requests_path))
+    checkpoint = bulk_generate.Checkpoint(str(output_dir / "checkpoint.jsonl"))
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            asyncio.wait_for(
+                bulk_generate.run_batch(items, checkpoint, str(output_dir), batch_size=10, poll_interval_seconds=60),
+                timeout=1,
+            )
+        )
+    assert client.batch_calls == 2
+    for batch in client._batch_jobs.values():
+        batch.ready_at = 0.0
+
+    exit_code = bulk_generate.main(
+        [str(requests_path), "--output-dir", str(output_dir), "--mode", "batch", "--poll-interval", "0"]
+    )
+
+    assert exit_code == 0
+    assert client.batch_calls == 2
+    assert bulk_generate.Checkpoint(str(output_dir / "checkpoint.jsonl")).completed_ids == {"a", "b", "c"}
+    assert len(list(output_dir.glob("*.png"))) == 3
+
+
+def test_batch_mode_keeps_a_finished_model_when_the_other_is_still_open(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A Both item interrupted between its two batch jobs does not pay for the finished model again."""
+    client = SimulatedGeminiClient(dataclasses.replace(INSTANT, batch_seconds=3600))
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: GeminiClientPool([("default", client)]),
+    )
+    requests_path = tmp_path / "requests.jsonl"
+    requests_path.write_text(json.dumps({"id": "both", "prompt": "Studio headshot", "model_mode": "Both"}) + "\n")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    items = bulk_generate.load_items(str(requests_path))
+
+    def run(timeout: float) -> list[str]:
+        checkpoint = bulk_generate.Checkpoint(str(output_dir / "checkpoint.jsonl"))
+        todo = [item for item in items if item.item_id not in checkpoint.completed_ids]
+        return asyncio.run(
+            asyncio.wait_for(
+                bulk_generate.run_batch(todo, checkpoint, str(output_dir), batch_size=10, poll_interval_seconds=0.05),
+                timeout=timeout,
+            )
+        )
+
+    with pytest.raises(TimeoutError):
+        run(timeout=0.5)
+    flash_batch = next(batch for batch in client._batch_jobs.values() if "flash" in batch.model)
+    flash_batch.ready_at = 0.0
+    with pytest.raises(TimeoutError):
+        run(timeout=0.5)
+    for batch in client._batch_jobs.values():
+        batch.ready_at = 0.0
+
+    assert run(timeout=5) == ["completed"]
+    assert client.batch_calls == 2
+    assert sorted(path.name for path in output_dir.glob("*.png")) == [
+        "both.gemini-3-pro-image-preview.png",
+        "both.gemini-3.1-flash-image-preview.png",
+    ]
+
+
+def test_batch_mode_splits_chunks_by_inlined_request_size(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Inline reference images make requests large, so a chunk closes before the Batch API size limit."""
+    client = SimulatedGeminiClient(INSTANT)
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: GeminiClientPool([("default", client)]),
+    )
+    monkeypatch.setattr(settings, "BATCH_INLINE_MAX_BYTES", 600_000)
+    noise = random.Random(7)
+    rows = []
+    for index in range(5):
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (640, 640), noise.randbytes(640 * 640 * 3)).save(buffer, format="JPEG", quality=90)
+        (tmp_path / f"face-{index}.jpg").write_bytes(buffer.getvalue())
+        rows.append({"id": f"item-{index}", "prompt": "Studio headshot", "reference_images": [f"face-{index}.jpg"]})
+    requests_path = tmp_path / "requests.jsonl"
+    requests_path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    output_dir = tmp_path / "out"
+
+    exit_code = bulk_generate.main(
+        [str(requests_path), "--output-dir", str(output_dir), "--mode", "batch", "--poll-interval", "0"]
+    )
+
+    batches = list(client._batch_jobs.values())
+    assert exit_code == 0
+    assert len(batches) > 1
+    assert sum(len(batch.requests) for batch in batches) == 5
+    for batch in batches:
+        assert sum(len(request.model_dump_json(exclude_none=True)) for request in batch.requests) <= 600_000
+
+
+def test_load_items_names_the_invalid_row(tmp_path: Path) -> None:
+    """Validation runs before any generation and points at the bad row."""
+    path = tmp_path / "requests.csv"
+    path.write_text("id,prompt,aspect_ratio\nfirst,Headshot,1:1\nsecond,Headshot,7:5\n")
+
+    with pytest.raises(ValueError, match="Row 2: Invalid aspect ratio: 7:5"):
+        bulk_generate.load_items(str(path))
@@ -0,0 +1,100 @@
+import io
+
+import pytest
+from google.genai import errors
+
+from backend.config import settings
+from backend.services.client_pool import GeminiClientPool
+from backend.services.gemini_simulator import SimulatedGeminiClient, SimulatorConfig
+from backend.services.image_service import ImageService
+from backend.services.upload_cache import get_upload_cache
+
+INSTANT = SimulatorConfig(
+    upload_seconds=0,
+    upload_seconds_per_mb=0,
+    first_chunk_seconds=0,
+    stream_seconds=0,
+    rate_limit_rate=0,
+    unavailable_rate=0,
+    stall_rate=0,
+    seed=1,
+)
+
+
+def _rate_limit_error(retry_delay: str | None = None) -> errors.ClientError:
+    details = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay}] if retry_delay else []
+    return errors.ClientError(
+        429,
+        {
+            "error": {
+                "code": 429,
+                "message": "Resource has been exhausted.",
+                "status": "RESOURCE_EXHAUSTED",
+                "details": details,
+            }
+        },
+    )
+
+
+def test_acquire_picks_the_least_loaded_client() -> None:
+    """Calls spread over keys instead of piling onto the first one."""
+    pool = GeminiClientPool([("key-1", object()), ("key-2", object()), ("key-3", object())])
+
+    picked = [pool.acquire().name for _ in range(3)]
+    pool.release(pool.get("key-2"))
+
+    assert picked == ["key-1", "key-2", "key-3"]
+    assert pool.acquire().name == "key-2"
+
+
+def test_rate_limited_client_cools_down_with_growing_delay() -> None:
+    """A 429 takes the key out of rotation; repeated 429s keep it out longer, up to the cap."""
+    pool = GeminiClientPool([("key-1", object()), ("key-2", object())], cooldown_seconds=10, max_cooldown_seconds=15)
+
+    first = pool.acquire()
+    pool.release(first, _rate_limit_error())
+    cooldowns = {client["name"]: client["cooldown_seconds"] for client in pool.snapshot()}
+    assert cooldowns == {"key-1": 10.0, "key-2": 0.0}
+    assert [pool.acquire().name for _ in range(2)] == ["key-2", "key-2"]
+
+    first.cooldown_until = 0.0
+    pool.release(pool.acquire(), _rate_limit_error())
+    assert pool.snapshot()[0]["cooldown_seconds"] == 15.0
+    assert pool.snapshot()[0]["recent_rate_limits"] == 2
+
+    first.cooldown_until = 0.0
+    pool.release(pool.acquire(), _rate_limit_error("60s"))
+    assert pool.snapshot()[0]["cooldown_seconds"] == 60.0
+
+
+def test_other_errors_do_not_cool_a_client_down() -> None:
+    pool = GeminiClientPool([("key-1", object())])
+
+    with pytest.raises(ValueError):
+        with pool.lease():
+            raise ValueError("bad prompt")
+
+    assert pool.snapshot() == [
+        {"name": "key-1", "in_flight": 0, "calls": 1, "recent_rate_limits": 0, "cooldown_seconds": 0.0}
+    ]
+
+
+def test_image_service_reuses_the_client_that_uploaded_the_reference(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A file URI only works with the key that uploaded it, so the same key serves the next call."""
+    clients = {"key-1": SimulatedGeminiClient(INSTANT), "key-2": SimulatedGeminiClient(INSTANT)}
+    pool = GeminiClientPool(list(clients.items()))
+    monkeypatch.setattr("backend.services.image_service.get_gemini_client_pool", lambda: pool)
+    get_upload_cache().clear()
+    service = ImageService()
+
+    def reference() -> io.BytesIO:
+        image = io.BytesIO(b"\xff\xd8\xff" + b"\x00" * (settings.IMAGE_INLINE_MAX_BYTES + 1))
+        image.name = "face.jpg"
+        return image
+
+    with pool.lease():
+        service.generate_image(prompt="Studio headshot", person_images=[reference()])
+    service.generate_image(prompt="Outdoor headshot", person_images=[reference()])
+
+    assert [client.upload_calls for client in clients.values()] == [0, 1]
+    assert [client.generate_calls for client in clients.values()] == [0, 2]
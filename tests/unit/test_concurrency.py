@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from backend.services.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    ModelConcurrencyGovernor,
+    ModelLatencyTracker,
+)
+
+
+def test_limiter_halves_on_overload_and_grows_on_success() -> None:
+    """Apply multiplicative decrease on 429/503 and additive increase on success."""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, max_limit=16)
+
+    limiter.record_overload()
+    assert limiter.limit == 4
+    limiter.record_overload()
+    assert limiter.limit == 4
+
+    for _ in range(5):
+        limiter.record_success()
+    assert limiter.limit == 5
+
+
+def test_limiter_queues_calls_beyond_the_limit() -> None:
+    """Hold extra callers until a slot is released."""
+
+    async def scenario() -> list[str]:
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        order: list[str] = []
+
+        async def worker(name: str) -> None:
+            await limiter.acquire()
+            order.append(f"{name}-start")
+            await asyncio.sleep(0)
+            order.append(f"{name}-end")
+            limiter.release()
+
+        await asyncio.gather(worker("a"), worker("b"))
+        return order
+
+    assert asyncio.run(scenario()) == ["a-start", "a-end", "b-start", "b-end"]
+
+
+def test_governor_retries_transient_errors_with_backoff() -> None:
+    """Retry 503s within the attempt limit and report each retry."""
+    governor = ModelConcurrencyGovernor(max_attempts=3, base_delay_seconds=0)
+    attempts: list[int] = []
+    retries: list[int] = []
+
+    async def flaky() -> str:
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("503 UNAVAILABLE")
+        return "image"
+
+    result = asyncio.run(
+        governor.call("model", flaky, on_retry=lambda attempt, delay, error: retries.append(attempt))
+    )
+
+    assert result == "image"
+    assert retries == [1, 2]
+    assert governor.snapshot()["models"]["model"]["in_flight"] == 0
+
+
+def test_governor_does_not_retry_permanent_errors() -> None:
+    """Surface validation errors immediately instead of burning quota."""
+    governor = ModelConcurrencyGovernor(base_delay_seconds=0)
+    attempts: list[int] = []
+
+    async def invalid() -> str:
+        attempts.append(1)
+        raise RuntimeError("400 INVALID_ARGUMENT")
+
+    with pytest.raises(RuntimeError, match="400"):
+        asyncio.run(governor.call("model", invalid))
+
+    assert attempts == [1]
+
+
+def test_governor_stops_retrying_when_budget_is_spent() -> None:
+    """Cap retries across calls so an outage cannot multiply outgoing traffic."""
+    governor = ModelConcurrencyGovernor(max_attempts=5, base_delay_seconds=0)
+    governor._retry_budget._tokens = 1.0
+    attempts: list[int] = []
+
+    async def overloaded() -> str:
+        attempts.append(1)
+        raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+    with pytest.raises(RuntimeError, match="429"):
+        asyncio.run(governor.call("model", overloaded))
+
+    assert len(attempts) == 2
+    assert governor.snapshot()["models"]["model"]["limit"] < 4
+
+
+def test_latency_tracker_uses_p95_once_history_is_large_enough(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Fall back to the configured hedge delay until enough samples exist."""
+    monkeypatch.setattr("backend.config.settings.HEDGE_DELAY_SECONDS", 25.0)
+    tracker = ModelLatencyTracker(window=100, min_samples=20)
+
+    for seconds in range(1, 20):
+        tracker.record("model", float(seconds))
+    assert tracker.hedge_delay("model") == 25.0
+
+    for seconds in range(20, 101):
+        tracker.record("model", float(seconds))
+    assert tracker.hedge_delay("model") == 96.0
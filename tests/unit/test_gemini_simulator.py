@@ -0,0 +1,82 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from backend.config import settings
+from backend.services.client_pool import GeminiClientPool
+from backend.services.error_utils import error_status_code, is_overload_error
+from backend.services.gemini_simulator import SimulatedGeminiClient, SimulatorConfig, image_dimensions
+from backend.services.image_service import ImageService
+from backend.services.upload_cache import get_upload_cache
+
+INSTANT = SimulatorConfig(
+    upload_seconds=0,
+    upload_seconds_per_mb=0,
+    first_chunk_seconds=0,
+    stream_seconds=0,
+    rate_limit_rate=0,
+    unavailable_rate=0,
+    stall_rate=0,
+    seed=1,
+)
+
+
+def _use_simulator(monkeypatch: pytest.MonkeyPatch, client: SimulatedGeminiClient) -> None:
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: GeminiClientPool([("default", client)]),
+    )
+
+
+def test_image_service_streams_simulated_image(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The stand-in speaks the client API ImageService uses, including Files API uploads."""
+    client = SimulatedGeminiClient(INSTANT)
+    _use_simulator(monkeypatch, client)
+    get_upload_cache().clear()
+    reference = io.BytesIO(b"\xff\xd8\xff" + b"\x00" * (settings.IMAGE_INLINE_MAX_BYTES + 1))
+    reference.name = "face.jpg"
+
+    result = asyncio.run(
+        ImageService().generate_image_async(
+            prompt="portrait",
+            aspect_ratio="16:9",
+            resolution="1K",
+            person_images=[reference],
+        )
+    )
+
+    with Image.open(io.BytesIO(result["image_bytes"])) as image:
+        assert image.format == "PNG"
+        assert image.size == image_dimensions("1K", "16:9")
+        assert image.width > image.height
+    assert result["text_output"].startswith("Simulated")
+    assert client.upload_calls == 1
+    assert client.generate_calls == 1
+
+
+def test_simulator_injects_rate_limit_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Injected 429s look like real Gemini quota errors to the retry and AIMD logic."""
+    client = SimulatedGeminiClient(SimulatorConfig(**{**INSTANT.__dict__, "rate_limit_rate": 1.0}))
+    _use_simulator(monkeypatch, client)
+
+    with pytest.raises(Exception) as raised:
+        asyncio.run(ImageService().generate_image_async(prompt="portrait"))
+
+    assert error_status_code(raised.value) == 429
+    assert is_overload_error(raised.value)
+
+
+def test_simulator_stall_delays_the_image_chunk() -> None:
+    """Stalls hold back the final chunk so timeouts and hedging can be exercised."""
+    client = SimulatedGeminiClient(SimulatorConfig(**{**INSTANT.__dict__, "stall_rate": 1.0, "stall_seconds": 0.2}))
+
+    async def consume() -> float:
+        stream = await client.aio.models.generate_content_stream(model="m", contents=[], config=None)
+        started_at = asyncio.get_running_loop().time()
+        async for _ in stream:
+            pass
+        return asyncio.get_running_loop().time() - started_at
+
+    assert asyncio.run(consume()) >= 0.2
@@ -1,4 +1,5 @@
 import base64
+import json
 from collections.abc import Iterator
 
 import pytest
@@ -6,7 +7,7 @@ from fastapi.testclient import TestClient
 
 from backend.config import prompts
 from backend.main import app
-from backend.services.generation_jobs import GenerationJob, InMemoryGenerationJobStore
+from backend.services.job_store import GenerationJob, InMemoryGenerationJobStore
 from backend.services.generation_service import GenerationExecutionError
 
 
@@ -25,7 +26,7 @@ def _make_fake_image_service(
     """Build a fake image service so tests can assert API-to-service inputs."""
 
     class FakeImageService:
-        def generate_image(self, *, prompt: str, **_: object) -> dict[str, object]:
+        async def generate_image_async(self, *, prompt: str, **_: object) -> dict[str, object]:
             captured["prompt"] = prompt
             return {
                 "image_bytes": image_bytes,
@@ -41,19 +42,32 @@ def clear_job_store() -> Iterator[None]:
     from backend.services import generation_jobs
 
     generation_jobs._job_store._jobs.clear()
+    generation_jobs._job_store._images.clear()
+    generation_jobs._job_store._result_bytes.clear()
+    generation_jobs._job_store._total_result_bytes = 0
+    generation_jobs._job_store._batches.clear()
+    generation_jobs._job_store._job_batches.clear()
+    generation_jobs._job_events.clear()
+    generation_jobs._job_deduplicator.clear()
     yield
     generation_jobs._job_store._jobs.clear()
+    generation_jobs._job_store._images.clear()
+    generation_jobs._job_store._result_bytes.clear()
+    generation_jobs._job_store._total_result_bytes = 0
+    generation_jobs._job_store._batches.clear()
+    generation_jobs._job_store._job_batches.clear()
+    generation_jobs._job_events.clear()
+    generation_jobs._job_deduplicator.clear()
 
 
 def _run_jobs_immediately(monkeypatch: pytest.MonkeyPatch) -> None:
     """Execute background jobs inline to keep API tests deterministic."""
     from backend.services import generation_jobs
 
-    monkeypatch.setattr(
-        generation_jobs._job_executor,
-        "submit",
-        lambda fn, *args, **kwargs: fn(*args, **kwargs),
-    )
+    async def run_inline(job_id: str, job, *args: object, **_: object) -> None:
+        await job(*args)
+
+    monkeypatch.setattr(generation_jobs._job_scheduler, "submit", run_inline)
 
 
 def test_generate_uses_default_women_prompt(
@@ -128,7 +142,7 @@ def test_generate_returns_images_for_both_models(
     captured_models: list[str] = []
 
     class FakeImageService:
-        def generate_image(
+        async def generate_image_async(
             self,
             *,
             prompt: str,
@@ -190,7 +204,7 @@ def test_generate_returns_partial_results_when_one_model_fails(
     """Ensure Both mode keeps successful output when the other model fails."""
 
     class FakeImageService:
-        def generate_image(self, *, model: str, **_: object) -> dict[str, object]:
+        async def generate_image_async(self, *, model: str, **_: object) -> dict[str, object]:
             if model == "gemini-3-pro-image-preview":
                 raise RuntimeError("pro failed")
             return {
@@ -230,6 +244,145 @@ def test_generate_returns_partial_results_when_one_model_fails(
     assert "pro failed" in results["gemini-3-pro-image-preview"]["error"]
 
 
+def test_limits_report_client_pool_state(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Operators see per-key load and cooldowns next to the per-model limits."""
+    from backend.services.client_pool import GeminiClientPool
+
+    pool = GeminiClientPool([("key-1", object()), ("key-2", object())])
+    pool.acquire(["key-2"])
+    monkeypatch.setattr("backend.routers.generate.get_gemini_client_pool", lambda: pool)
+
+    limits = client.get("/api/generate/limits").json()
+
+    assert "models" in limits
+    assert [(entry["name"], entry["in_flight"]) for entry in limits["clients"]] == [("key-1", 0), ("key-2", 1)]
+
+
+def test_generate_hedges_slow_primary_with_other_model(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Start the other model after the hedge deadline and keep the first image."""
+    import asyncio
+
+    cancelled: list[str] = []
+
+    class FakeImageService:
+        async def generate_image_async(self, *, model: str, **_: object) -> dict[str, object]:
+            if model == "gemini-3-pro-image-preview":
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(model)
+                    raise
+            return {"image_bytes": b"flash-image", "text_output": "flash-ok"}
+
+    monkeypatch.setattr("backend.services.generation_service.ImageService", FakeImageService)
+    monkeypatch.setattr("backend.config.settings.HEDGE_ENABLED", True)
+    monkeypatch.setattr("backend.config.settings.HEDGE_DELAY_SECONDS", 0.01)
+
+    response = client.post(
+        "/api/generate",
+        data={
+            "prompt": "Create a portrait",
+            "model_mode": "Pro",
+            "aspect_ratio": "1:1",
+            "temperature": "1",
+            "prompt_type": "custom",
+        },
+    )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["fallback_used"] is True
+    assert list(payload["results"]) == ["gemini-3.1-flash-image-preview"]
+    assert cancelled == ["gemini-3-pro-image-preview"]
+
+
+def test_generate_hedge_keeps_image_over_earlier_text_only_answer(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A text-only answer does not win the race; the other model keeps running."""
+    import asyncio
+
+    cancelled: list[str] = []
+
+    class FakeImageService:
+        async def generate_image_async(self, *, model: str, **_: object) -> dict[str, object]:
+            if model == "gemini-3-pro-image-preview":
+                await asyncio.sleep(0.05)
+                return {"image_bytes": None, "text_output": "no image this time"}
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+            return {"image_bytes": b"flash-image", "text_output": "flash-ok"}
+
+    monkeypatch.setattr("backend.services.generation_service.ImageService", FakeImageService)
+    monkeypatch.setattr("backend.config.settings.HEDGE_ENABLED", True)
+    monkeypatch.setattr("backend.config.settings.HEDGE_DELAY_SECONDS", 0.01)
+
+    response = client.post(
+        "/api/generate",
+        data={"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"},
+    )
+
+    payload = response.json()
+    assert payload["fallback_used"] is True
+    assert list(payload["results"]) == ["gemini-3.1-flash-image-preview"]
+    assert base64.b64decode(payload["results"]["gemini-3.1-flash-image-preview"]["image_base64"]) == b"flash-image"
+    assert cancelled == []
+
+
+def test_generate_serves_repeated_request_from_result_cache(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Reuse an identical earlier generation when the client opts into the cache."""
+    from backend.services import result_cache
+
+    calls: list[str] = []
+
+    class FakeImageService:
+        async def generate_image_async(self, *, model: str, **_: object) -> dict[str, object]:
+            calls.append(model)
+            return {"image_bytes": b"cached-image", "text_output": "ok"}
+
+    monkeypatch.setattr("backend.services.generation_service.ImageService", FakeImageService)
+    monkeypatch.setattr(result_cache, "_result_cache", result_cache.GenerationResultCache())
+
+    data = {
+        "prompt": "Create a portrait",
+        "model_mode": "Pro",
+        "aspect_ratio": "1:1",
+        "temperature": "1",
+        "prompt_type": "custom",
+        "cache": "read",
+    }
+    first = client.post("/api/generate", data=data).json()
+    second = client.post("/api/generate", data=data).json()
+    refreshed = client.post("/api/generate", data={**data, "cache": "refresh"}).json()
+
+    assert "cached" not in first
+    assert second["cached"] is True
+    assert second["results"] == first["results"]
+    assert "cached" not in refreshed
+    assert calls == ["gemini-3-pro-image-preview", "gemini-3-pro-image-preview"]
+
+
+def test_generate_rejects_unknown_cache_mode(client: TestClient) -> None:
+    """Validate the cache control before any work is queued."""
+    response = client.post(
+        "/api/generate",
+        data={"prompt": "Create a portrait", "prompt_type": "custom", "cache": "always"},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cache mode: always"
+
+
 def test_generate_forwards_selected_resolution(
     client: TestClient,
     monkeypatch: pytest.MonkeyPatch,
@@ -238,7 +391,7 @@ def test_generate_forwards_selected_resolution(
     captured: dict[str, str] = {}
 
     class FakeImageService:
-        def generate_image(self, *, resolution: str, **_: object) -> dict[str, object]:
+        async def generate_image_async(self, *, resolution: str, **_: object) -> dict[str, object]:
             captured["resolution"] = resolution
             return {
                 "image_bytes": b"fake-image",
@@ -297,20 +450,21 @@ def test_submit_generate_job_returns_completed_result(
     from backend.services import generation_jobs
 
     _run_jobs_immediately(monkeypatch)
-    monkeypatch.setattr(
-        generation_jobs,
-        "execute_generation",
-        lambda request: {
+
+    async def fake_execute_generation(_: object, **__: object) -> dict[str, object]:
+        return {
             "results": {
                 "gemini-3-pro-image-preview": {
-                    "image_base64": "abc",
+                    "image_bytes": b"\x89PNG\r\n\x1a\nabc",
+                    "mime_type": "image/png",
                     "text_output": "done",
                     "error": None,
                 }
             },
             "fallback_used": False,
-        },
-    )
+        }
+
+    monkeypatch.setattr(generation_jobs, "execute_generation", fake_execute_generation)
 
     submission = client.post(
         "/api/generate/submit",
@@ -329,12 +483,15 @@ def test_submit_generate_job_returns_completed_result(
 
     status_response = client.get(f"/api/generate/status/{payload['job_id']}")
     assert status_response.status_code == 200
+    result_url = f"/api/generate/result/{payload['job_id']}/gemini-3-pro-image-preview"
     assert status_response.json() == {
         "job_id": payload["job_id"],
         "status": "completed",
         "results": {
             "gemini-3-pro-image-preview": {
-                "image_base64": "abc",
+                "image_url": result_url,
+                "mime_type": "image/png",
+                "image_size": 11,
                 "text_output": "done",
                 "error": None,
             }
@@ -343,6 +500,130 @@ def test_submit_generate_job_returns_completed_result(
     }
 
 
+def test_generate_result_serves_raw_image_with_cache_headers(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Serve finished images as bytes once, and let clients revalidate with ETag."""
+    from backend.services import generation_jobs
+
+    _run_jobs_immediately(monkeypatch)
+
+    async def fake_execute_generation(_: object, **__: object) -> dict[str, object]:
+        return {
+            "results": {
+                "gemini-3-pro-image-preview": {
+                    "image_bytes": b"\xff\xd8\xffjpeg",
+                    "mime_type": "image/jpeg",
+                    "text_output": "",
+                    "error": None,
+                }
+            },
+            "fallback_used": False,
+        }
+
+    monkeypatch.setattr(generation_jobs, "execute_generation", fake_execute_generation)
+    job_id = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"},
+    ).json()["job_id"]
+    result_url = client.get(f"/api/generate/status/{job_id}").json()["results"][
+        "gemini-3-pro-image-preview"
+    ]["image_url"]
+
+    response = client.get(result_url)
+
+    assert response.status_code == 200
+    assert response.content == b"\xff\xd8\xffjpeg"
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["content-length"] == "7"
+    assert "immutable" in response.headers["cache-control"]
+
+    revalidation = client.get(result_url, headers={"If-None-Match": response.headers["etag"]})
+
+    assert revalidation.status_code == 304
+    assert revalidation.content == b""
+    assert client.get(f"/api/generate/result/{job_id}/unknown-model").status_code == 404
+
+
+def test_generate_result_negotiates_transcoded_variants(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Pick a variant from Accept or the query, falling back to the original."""
+    from backend.services import generation_jobs
+    from backend.services.job_store import JobImage
+
+    store = generation_jobs._job_store
+    job_id = store.create_job()
+    store.mark_completed(
+        job_id,
+        {"results": {"model": {"image_bytes": b"\x89PNG\r\n\x1a\noriginal", "mime_type": "image/png"}}},
+    )
+    url = f"/api/generate/result/{job_id}/model"
+
+    pending = client.get(url, headers={"Accept": "image/webp,*/*"})
+    assert pending.headers["content-type"] == "image/png"
+    assert pending.headers["cache-control"] == "private, no-cache"
+
+    store.mark_variants_ready(
+        job_id,
+        {
+            "model": {
+                "webp": JobImage(b"webp", "image/webp", "etag-webp"),
+                "thumbnail": JobImage(b"thumb", "image/webp", "etag-thumb"),
+            }
+        },
+    )
+
+    negotiated = client.get(url, headers={"Accept": "image/avif,image/webp,*/*"})
+    assert negotiated.content == b"webp"
+    assert "Accept" in negotiated.headers["vary"]
+    assert client.get(url, params={"variant": "original"}, headers={"Accept": "image/webp"}).headers[
+        "content-type"
+    ] == "image/png"
+    assert client.get(url, params={"variant": "bogus"}).status_code == 400
+
+    result = client.get(f"/api/generate/status/{job_id}").json()["results"]["model"]
+    assert result["variants"] == ["original", "thumbnail", "webp"]
+    assert client.get(result["thumbnail_url"]).content == b"thumb"
+
+
+def test_generate_result_parses_accept_and_if_none_match(client: TestClient) -> None:
+    """Refused formats and ETags that merely contain the current one are not treated as matches."""
+    from backend.services import generation_jobs
+    from backend.services.job_store import JobImage
+
+    store = generation_jobs._job_store
+    job_id = store.create_job()
+    store.mark_completed(
+        job_id,
+        {"results": {"model": {"image_bytes": b"\x89PNG\r\n\x1a\noriginal", "mime_type": "image/png"}}},
+    )
+    store.mark_variants_ready(
+        job_id,
+        {
+            "model": {
+                "avif": JobImage(b"avif", "image/avif", "etag-avif"),
+                "webp": JobImage(b"webp", "image/webp", "etag-webp"),
+            }
+        },
+    )
+    url = f"/api/generate/result/{job_id}/model"
+
+    assert client.get(url, headers={"Accept": "image/avif;q=0, image/webp"}).content == b"webp"
+    assert client.get(url, headers={"Accept": "image/avif;q=0.5, image/webp;q=0.9"}).content == b"webp"
+    assert client.get(url, headers={"Accept": "image/avif, image/webp"}).content == b"avif"
+
+    superstring = client.get(url, params={"variant": "webp"}, headers={"If-None-Match": '"etag-webp-old"'})
+    listed = client.get(url, params={"variant": "webp"}, headers={"If-None-Match": '"other", W/"etag-webp"'})
+    wildcard = client.get(url, params={"variant": "webp"}, headers={"If-None-Match": "*"})
+
+    assert superstring.status_code == 200
+    assert listed.status_code == 304
+    assert wildcard.status_code == 304
+
+
 def test_submit_generate_job_returns_failed_status(
     client: TestClient,
     monkeypatch: pytest.MonkeyPatch,
@@ -352,7 +633,7 @@ def test_submit_generate_job_returns_failed_status(
 
     _run_jobs_immediately(monkeypatch)
 
-    def raise_failure(_: object) -> dict[str, object]:
+    async def raise_failure(_: object, **__: object) -> dict[str, object]:
         raise GenerationExecutionError("boom")
 
     monkeypatch.setattr(generation_jobs, "execute_generation", raise_failure)
@@ -380,6 +661,297 @@ def test_submit_generate_job_returns_failed_status(
     }
 
 
+def test_generate_events_stream_progress_and_result_urls(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Stream state transitions, text parts and the final result URL over SSE."""
+    _run_jobs_immediately(monkeypatch)
+
+    class FakeImageService:
+        async def generate_image_async(self, *, model: str, on_progress, **_: object) -> dict[str, object]:
+            on_progress("generating", model=model)
+            on_progress("text", model=model, text="partial text")
+            return {"image_bytes": b"\x89PNG\r\n\x1a\nimg", "text_output": "partial text"}
+
+    monkeypatch.setattr("backend.services.generation_service.ImageService", FakeImageService)
+    job_id = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"},
+    ).json()["job_id"]
+
+    response = client.get(f"/api/generate/events/{job_id}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert [event_type for event_type, _ in events] == [
+        "queued",
+        "running",
+        "generating",
+        "text",
+        "model_completed",
+        "completed",
+    ]
+    assert events[3][1]["text"] == "partial text"
+    final = events[-1][1]
+    assert final["results"]["gemini-3-pro-image-preview"]["image_url"] == (
+        f"/api/generate/result/{job_id}/gemini-3-pro-image-preview"
+    )
+
+
+def test_generate_events_completed_event_carries_timings(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The frozen timings of a finished job still serialize on the SSE stream."""
+    from backend.config import settings
+
+    _run_jobs_immediately(monkeypatch)
+    monkeypatch.setattr(settings, "GENERATION_TIMINGS_ENABLED", True)
+    monkeypatch.setattr(
+        "backend.services.generation_service.ImageService",
+        _make_fake_image_service({}, image_bytes=b"\x89PNG\r\n\x1a\nimg"),
+    )
+    job_id = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"},
+    ).json()["job_id"]
+
+    response = client.get(f"/api/generate/events/{job_id}")
+
+    completed = response.text.strip().split("\n\n")[-1].split("\n")
+    assert completed[0] == "event: completed"
+    timings = json.loads(completed[1].removeprefix("data: "))["timings"]
+    assert "generation.job" in {timing["stage"] for timing in timings}
+
+
+def test_submit_returns_429_with_retry_after_when_queue_is_full(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tell clients to back off instead of growing the queue without limit."""
+    from backend.services import generation_jobs
+
+    def reject() -> None:
+        raise generation_jobs.JobQueueFullError(retry_after_seconds=42)
+
+    monkeypatch.setattr(generation_jobs._job_scheduler, "ensure_capacity", reject)
+
+    response = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"},
+    )
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "42"
+    assert generation_jobs._job_store._jobs == {}
+
+
+def _hold_jobs_in_queue(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Accept submissions without running them so they stay in flight."""
+    from backend.services import generation_jobs
+
+    async def keep_queued(job_id: str, job, *args: object, **_: object) -> None:
+        return None
+
+    monkeypatch.setattr(generation_jobs._job_scheduler, "submit", keep_queued)
+
+
+def test_submit_coalesces_identical_in_flight_requests(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Attach a duplicate submission to the job that is already queued."""
+    _hold_jobs_in_queue(monkeypatch)
+    data = {"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"}
+
+    first = client.post("/api/generate/submit", data=data).json()
+    duplicate = client.post("/api/generate/submit", data=data).json()
+    different = client.post("/api/generate/submit", data={**data, "model_mode": "Flash"}).json()
+
+    assert duplicate["job_id"] == first["job_id"]
+    assert duplicate["attached"] is True
+    assert "attached" not in first
+    assert different["job_id"] != first["job_id"]
+
+
+def test_submit_returns_same_job_for_repeated_idempotency_key(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Replay the original job for a retried key even after it finished."""
+    _run_jobs_immediately(monkeypatch)
+
+    async def fake_execute_generation(_, **__) -> dict[str, object]:
+        return {"results": {}, "fallback_used": False}
+
+    monkeypatch.setattr("backend.services.generation_jobs.execute_generation", fake_execute_generation)
+    data = {"prompt": "Create a portrait", "model_mode": "Pro", "prompt_type": "custom"}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/generate/submit", data=data, headers=headers).json()
+    retried = client.post("/api/generate/submit", data=data, headers=headers).json()
+    fresh = client.post("/api/generate/submit", data=data).json()
+    conflict = client.post("/api/generate/submit", data={**data, "prompt": "Other"}, headers=headers)
+
+    assert retried["job_id"] == first["job_id"]
+    assert retried["status"] == "completed"
+    assert fresh["job_id"] != first["job_id"]
+    assert conflict.status_code == 422
+
+
+def test_submit_rejects_unknown_priority(client: TestClient) -> None:
+    """Only the interactive and bulk lanes exist."""
+    response = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "prompt_type": "custom", "priority": "urgent"},
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid priority: urgent"}
+
+
+def test_batch_fans_out_variants_and_aggregates_status(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Each variant becomes its own job over the shared images, and the batch reports them together."""
+    from backend.services import generation_jobs
+
+    _run_jobs_immediately(monkeypatch)
+    seen: list[tuple[str, str, tuple[int, ...]]] = []
+
+    async def fake_execute_generation(request, **__) -> dict[str, object]:
+        seen.append((request.prompt, request.resolution, tuple(id(image) for image in request.reference_images)))
+        if request.resolution == "2K":
+            raise GenerationExecutionError("Gemini недоступний")
+        return {"results": {}, "fallback_used": False}
+
+    monkeypatch.setattr(generation_jobs, "execute_generation", fake_execute_generation)
+    items = [{"prompt": "Warm light"}, {"prompt": "Warm light"}, {"prompt": "Cold light", "reference_images": [1]}]
+    items.append({"prompt": "Cold light", "resolution": "2K"})
+
+    response = client.post(
+        "/api/generate/batch",
+        data={"items": json.dumps(items), "prompt_type": "custom", "model_mode": "Flash"},
+        files=[
+            ("reference_images", ("a.jpg", b"\xff\xd8\xff first", "image/jpeg")),
+            ("reference_images", ("b.jpg", b"\xff\xd8\xff second", "image/jpeg")),
+        ],
+    )
+
+    assert response.status_code == 200
+    submission = response.json()
+    assert submission["total"] == 4
+    assert len(set(submission["job_ids"])) == 4
+    shared = seen[0][2]
+    assert seen[1][2] == shared and seen[2][2] == (shared[1],)
+
+    status = client.get(f"/api/generate/batch/{submission['batch_id']}").json()
+    assert status["status"] == "completed"
+    assert status["counts"] == {"queued": 0, "running": 0, "completed": 3, "failed": 1}
+    assert [item["job_id"] for item in status["items"]] == submission["job_ids"]
+    assert status["items"][3]["error"] == "Gemini недоступний"
+
+
+def test_batch_rejects_invalid_item_before_queueing_any(client: TestClient) -> None:
+    """One bad variant fails the whole batch with its index, and nothing is queued."""
+    from backend.services import generation_jobs
+
+    items = [{"prompt": "Warm light"}, {"prompt": "Cold light", "aspect_ratio": "7:5"}]
+    response = client.post(
+        "/api/generate/batch",
+        data={"items": json.dumps(items), "prompt_type": "custom"},
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Item 1: Invalid aspect ratio: 7:5"}
+    assert generation_jobs._job_store._jobs == {}
+    assert client.get("/api/generate/batch/missing").status_code == 404
+
+
+def test_batch_rejects_missing_or_empty_prompts(client: TestClient) -> None:
+    """A null prompt is rejected instead of being sent to Gemini as the text "None"."""
+    from backend.services import generation_jobs
+
+    def submit(item: dict[str, object]) -> tuple[int, dict[str, object]]:
+        response = client.post("/api/generate/batch", data={"items": json.dumps([{"prompt": "Warm light"}, item])})
+        return response.status_code, response.json()
+
+    assert submit({"prompt": None}) == (422, {"detail": "Item 1: prompt must be a string"})
+    assert submit({"prompt": 42}) == (422, {"detail": "Item 1: prompt must be a string"})
+    assert submit({"prompt": "   "}) == (400, {"detail": "Item 1: Prompt is required."})
+    assert generation_jobs._job_store._jobs == {}
+
+
+def test_submit_rejects_uploads_that_are_not_images(client: TestClient) -> None:
+    """Files are sniffed by their leading bytes, whatever their name and content type claim."""
+    from backend.services import generation_jobs
+
+    response = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "prompt_type": "custom"},
+        files=[("reference_images", ("face.jpg", b"<html>not an image</html>", "image/jpeg"))],
+    )
+
+    assert response.status_code == 415
+    assert generation_jobs._job_store._jobs == {}
+
+
+def test_status_answers_304_while_unchanged_and_hints_poll_interval(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Pollers that send the last ETag get an empty 304 until the job moves on."""
+    from backend.services import generation_jobs
+
+    _hold_jobs_in_queue(monkeypatch)
+    job_id = client.post(
+        "/api/generate/submit",
+        data={"prompt": "Create a portrait", "prompt_type": "custom"},
+    ).json()["job_id"]
+
+    first = client.get(f"/api/generate/status/{job_id}")
+    etag = first.headers["etag"]
+    unchanged = client.get(f"/api/generate/status/{job_id}?wait=0.2", headers={"If-None-Match": etag})
+    generation_jobs._job_store.mark_running(job_id)
+    changed = client.get(f"/api/generate/status/{job_id}?wait=5", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert 1 <= int(first.headers["retry-after"]) <= 15
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert changed.status_code == 200
+    assert changed.json()["status"] == "running"
+    assert changed.headers["etag"] != etag
+
+
+def test_status_etag_changes_when_variants_become_ready(client: TestClient) -> None:
+    """Revalidating after transcoding returns the new variant URLs instead of a 304."""
+    from backend.services import generation_jobs
+    from backend.services.job_store import JobImage
+
+    store = generation_jobs._job_store
+    job_id = store.create_job()
+    store.mark_completed(
+        job_id,
+        {"results": {"model": {"image_bytes": b"\x89PNG\r\n\x1a\noriginal", "mime_type": "image/png"}}},
+    )
+    etag = client.get(f"/api/generate/status/{job_id}").headers["etag"]
+
+    store.mark_variants_ready(job_id, {"model": {"thumbnail": JobImage(b"thumb", "image/webp", "etag-thumb")}})
+    revalidated = client.get(f"/api/generate/status/{job_id}", headers={"If-None-Match": etag})
+
+    assert revalidated.status_code == 200
+    assert revalidated.json()["results"]["model"]["thumbnail_url"] == (
+        f"/api/generate/result/{job_id}/model?variant=thumbnail"
+    )
+
+
 def test_generate_status_returns_404_for_unknown_job(client: TestClient) -> None:
     """Reject polling for jobs that never existed or already expired."""
     response = client.get("/api/generate/status/missing")
@@ -399,6 +971,6 @@ def test_job_store_prunes_expired_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
         result={"results": {}},
     )
 
-    monkeypatch.setattr("backend.services.generation_jobs.time.time", lambda: 20.0)
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 20.0)
 
     assert store.get_job("expired") is None
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from backend.services.generation_jobs import GenerationJobScheduler, JobQueueFullError
+
+
+async def _drain(scheduler: GenerationJobScheduler) -> None:
+    """Let the loop run until every queued and running job has finished."""
+    while scheduler._tasks or scheduler.queue_depth:
+        await asyncio.sleep(0)
+
+
+def test_scheduler_runs_interactive_jobs_before_bulk_jobs() -> None:
+    """Interactive work jumps ahead of bulk work that was queued earlier."""
+    started: list[str] = []
+
+    async def scenario() -> None:
+        scheduler = GenerationJobScheduler(max_concurrency=1, max_queue_depth=10)
+        release = asyncio.Event()
+
+        async def blocker() -> None:
+            started.append("blocker")
+            await release.wait()
+
+        async def record(name: str) -> None:
+            started.append(name)
+
+        await scheduler.submit("blocker", blocker)
+        await scheduler.submit("bulk", record, "bulk", priority="bulk")
+        await scheduler.submit("interactive", record, "interactive")
+        await asyncio.sleep(0)
+        release.set()
+        await _drain(scheduler)
+
+    asyncio.run(scenario())
+
+    assert started == ["blocker", "interactive", "bulk"]
+
+
+def test_scheduler_reports_queue_position_and_rejects_overflow() -> None:
+    """Expose queue positions and refuse work beyond the configured depth."""
+
+    async def scenario() -> None:
+        scheduler = GenerationJobScheduler(
+            max_concurrency=1,
+            max_queue_depth=2,
+            initial_duration_seconds=10.0,
+        )
+        release = asyncio.Event()
+
+        async def blocker() -> None:
+            await release.wait()
+
+        await scheduler.submit("running", blocker)
+        await scheduler.submit("first", blocker, priority="bulk")
+        await scheduler.submit("second", blocker)
+        await asyncio.sleep(0)
+
+        assert scheduler.get_position("running") is None
+        second = scheduler.get_position("second")
+        first = scheduler.get_position("first")
+        assert (second.position, first.position) == (1, 2)
+        assert second.estimated_start_at < first.estimated_start_at
+
+        with pytest.raises(JobQueueFullError) as excinfo:
+            await scheduler.submit("overflow", blocker)
+        assert 1 <= excinfo.value.retry_after_seconds <= 10
+
+        release.set()
+        await _drain(scheduler)
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_admits_batches_as_a_whole() -> None:
+    """A batch either fits in the free slots plus the queue or is refused entirely."""
+    scheduler = GenerationJobScheduler(max_concurrency=2, max_queue_depth=3)
+
+    scheduler.ensure_capacity(5)
+    with pytest.raises(JobQueueFullError):
+        scheduler.ensure_capacity(6)
+
+
+def test_long_poll_wakes_up_when_the_job_changes() -> None:
+    """A status wait returns as soon as the job's events report a change, not at its timeout."""
+    from backend.services import generation_jobs
+
+    async def scenario() -> tuple[str, float]:
+        job_id = generation_jobs._job_store.create_job()
+        loop = asyncio.get_running_loop()
+
+        def finish() -> None:
+            generation_jobs._job_store.mark_completed(job_id, {"results": {}})
+            generation_jobs._job_events.publish(job_id, "completed", status="completed")
+
+        loop.call_later(0.05, finish)
+        started_at = loop.time()
+        job = await generation_jobs.wait_for_generation_job_change(
+            job_id,
+            timeout=10,
+            is_unchanged=lambda current: current.status == "queued",
+        )
+        return job.status, loop.time() - started_at
+
+    status, elapsed = asyncio.run(scenario())
+
+    assert status == "completed"
+    assert elapsed < 1
@@ -1,8 +1,15 @@
+import asyncio
+import threading
+
 import pytest
 
+from backend.config import settings
 from backend.services.generation_service import (
+    ReferenceImage,
+    prepare_reference_files,
     validate_generation_request,
 )
+from backend.services.upload_ingestion import SpooledPayload
 
 
 def test_validate_generation_request_rejects_unknown_resolution() -> None:
@@ -17,3 +24,29 @@ def test_validate_generation_request_rejects_unknown_resolution() -> None:
             prompt_type="custom",
             reference_images=(),
         )
+
+
+@pytest.mark.parametrize("preprocess", [True, False])
+def test_prepare_reference_files_reads_spilled_uploads_off_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+    preprocess: bool,
+) -> None:
+    """Reading a large upload back from disk must not stall other requests."""
+    monkeypatch.setattr(settings, "REFERENCE_IMAGE_PREPROCESS_ENABLED", preprocess)
+    payload = SpooledPayload("face.jpg", memory_limit=0)
+    payload.write(b"\xff\xd8\xff" + b"\x00" * 64)
+    payload.seal("0" * 64)
+    reading_threads = []
+    read = payload.read
+
+    def record_thread() -> bytes:
+        reading_threads.append(threading.current_thread())
+        return read()
+
+    monkeypatch.setattr(payload, "read", record_thread)
+
+    [file_object] = asyncio.run(prepare_reference_files((ReferenceImage(filename="face.jpg", payload=payload),)))
+
+    assert file_object.read() == b"\xff\xd8\xff" + b"\x00" * 64
+    assert reading_threads
+    assert threading.main_thread() not in reading_threads
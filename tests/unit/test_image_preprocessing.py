@@ -0,0 +1,101 @@
+import asyncio
+import concurrent.futures
+import io
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from backend.services.image_preprocessing import ReferenceImagePreprocessor, preprocess_image_bytes
+
+
+def _photo(size: tuple[int, int], orientation: int | None = None, fmt: str = "JPEG") -> bytes:
+    image = Image.effect_noise(size, 64).convert("RGB")
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, exif=exif)
+    return buffer.getvalue()
+
+
+def test_preprocess_downscales_to_max_edge() -> None:
+    """Fit large photos into the configured edge while keeping the aspect ratio."""
+    result = preprocess_image_bytes(_photo((1200, 600)), max_edge=400, output_format="JPEG", quality=85)
+
+    with Image.open(io.BytesIO(result.content)) as image:
+        assert image.size == (400, 200)
+        assert image.format == "JPEG"
+    assert result.mime_type == "image/jpeg"
+
+
+def test_preprocess_applies_exif_orientation() -> None:
+    """Rotate pixels so Gemini sees the photo the way the phone displayed it."""
+    result = preprocess_image_bytes(_photo((300, 100), orientation=6), max_edge=1000, output_format="WEBP", quality=85)
+
+    with Image.open(io.BytesIO(result.content)) as image:
+        assert image.size == (100, 300)
+        assert image.format == "WEBP"
+    assert result.extension == ".webp"
+
+
+def test_preprocess_keeps_small_upright_originals_and_undecodable_bytes() -> None:
+    """Return None when re-encoding would not help or the bytes are not an image."""
+    small = _photo((64, 64))
+
+    assert preprocess_image_bytes(small, max_edge=1000, output_format="JPEG", quality=100) is None
+    assert preprocess_image_bytes(b"\xff\xd8\xffbroken", max_edge=1000, output_format="JPEG", quality=85) is None
+
+
+def test_preprocessor_runs_in_process_pool_and_caches_by_content() -> None:
+    """Reuse the preprocessed variant for identical uploads."""
+    preprocessor = ReferenceImagePreprocessor(max_edge=100, output_format="JPEG", quality=80, max_workers=1)
+    photo = _photo((400, 400))
+
+    async def scenario():
+        first = await preprocessor.preprocess(photo)
+        second = await preprocessor.preprocess(photo)
+        skipped = await preprocessor.preprocess(b"not an image")
+        return first, second, skipped
+
+    try:
+        first, second, skipped = asyncio.run(scenario())
+    finally:
+        preprocessor.shutdown()
+
+    assert first is second
+    assert len(first.content) < len(photo)
+    assert skipped is None
+
+
+class _BrokenPool:
+    """Stand-in for a process pool whose worker was killed, e.g. by the OOM killer."""
+
+    def __init__(self) -> None:
+        self.shut_down = False
+
+    def submit(self, *_: object) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, **_: object) -> None:
+        self.shut_down = True
+
+
+def test_preprocessor_replaces_a_broken_pool_and_sends_the_original() -> None:
+    """A dead worker costs one photo its preprocessing, not every later generation."""
+    preprocessor = ReferenceImagePreprocessor(max_edge=100, output_format="JPEG", quality=80, max_workers=1)
+    broken = preprocessor._executor = _BrokenPool()
+    photo = _photo((400, 400))
+
+    async def scenario():
+        return await preprocessor.preprocess(photo), await preprocessor.preprocess(photo)
+
+    try:
+        fallback, retried = asyncio.run(scenario())
+    finally:
+        preprocessor.shutdown()
+
+    assert fallback is None
+    assert broken.shut_down
+    assert retried is not None and len(retried.content) < len(photo)
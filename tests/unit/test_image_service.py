@@ -1,13 +1,20 @@
+import asyncio
 import base64
+import io
 from types import SimpleNamespace
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from backend.config import settings
+from backend.services.client_pool import GeminiClientPool
 from backend.services.image_service import ImageService
 
 
+def _pool_of(client: object) -> GeminiClientPool:
+    return GeminiClientPool([("default", client)])
+
+
 def test_generate_image_returns_image_and_text(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
@@ -30,8 +37,8 @@ def test_generate_image_returns_image_and_text(
         )
     ]
     monkeypatch.setattr(
-        "backend.services.image_service.get_gemini_client",
-        lambda: mock_client,
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: _pool_of(mock_client),
     )
 
     service = ImageService()
@@ -50,11 +57,156 @@ def test_generate_image_rejects_empty_prompt(
 ) -> None:
     """Prevent requests that would hit the Gemini API without prompt text."""
     monkeypatch.setattr(
-        "backend.services.image_service.get_gemini_client",
-        lambda: MagicMock(),
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: _pool_of(MagicMock()),
     )
 
     service = ImageService()
 
     with pytest.raises(ValueError, match="Prompt is required for image generation."):
         service.generate_image(prompt="")
+
+
+def test_generate_image_reuses_cached_reference_uploads(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Avoid re-uploading the same reference photo on repeated generations."""
+    from backend.services.upload_cache import GeminiUploadCache
+
+    mock_client = MagicMock()
+    mock_client.files.upload.return_value = SimpleNamespace(
+        uri="files/ref",
+        expiration_time=None,
+    )
+    mock_client.models.generate_content_stream.return_value = []
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: _pool_of(mock_client),
+    )
+    cache = GeminiUploadCache()
+    monkeypatch.setattr("backend.services.image_service.get_upload_cache", lambda: cache)
+    monkeypatch.setattr(settings, "IMAGE_INLINE_MAX_BYTES", 0)
+
+    service = ImageService()
+    for _ in range(2):
+        reference = io.BytesIO(b"same-photo")
+        reference.name = "face.jpg"
+        service.generate_image(prompt="test prompt", person_images=[reference])
+
+    mock_client.files.upload.assert_called_once()
+    assert cache.stats()["hits"] == 1
+
+
+def test_generate_image_inlines_small_and_uploads_large_references(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Send small photos inline and keep prompt part order for uploaded ones."""
+    from backend.services.upload_cache import GeminiUploadCache
+
+    mock_client = MagicMock()
+    mock_client.files.upload.side_effect = lambda *, file, config: SimpleNamespace(
+        uri=f"files/{file.read().decode()}",
+        expiration_time=None,
+    )
+    mock_client.models.generate_content_stream.return_value = []
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: _pool_of(mock_client),
+    )
+    monkeypatch.setattr(
+        "backend.services.image_service.get_upload_cache",
+        lambda: GeminiUploadCache(),
+    )
+    monkeypatch.setattr(settings, "IMAGE_INLINE_MAX_BYTES", 5)
+
+    references = []
+    for name, content in (("a.jpg", b"large-one"), ("b.png", b"tiny"), ("c.jpg", b"large-two")):
+        reference = io.BytesIO(content)
+        reference.name = name
+        references.append(reference)
+
+    ImageService().generate_image(prompt="test prompt", person_images=references)
+
+    parts = mock_client.models.generate_content_stream.call_args.kwargs["contents"][0].parts
+    assert parts[0].file_data.file_uri == "files/large-one"
+    assert parts[1].inline_data.data == b"tiny"
+    assert parts[1].inline_data.mime_type == "image/png"
+    assert parts[2].file_data.file_uri == "files/large-two"
+    assert parts[3].text == "test prompt"
+    assert mock_client.files.upload.call_count == 2
+
+
+def test_generate_image_async_streams_through_aio_client(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Use the async client for both uploads and the response stream."""
+    from backend.services.upload_cache import GeminiUploadCache
+
+    async def stream():
+        yield SimpleNamespace(
+            parts=[
+                SimpleNamespace(inline_data=None, text="async "),
+                SimpleNamespace(inline_data=SimpleNamespace(data=b"async-image"), text=None),
+            ]
+        )
+        yield SimpleNamespace(parts=[SimpleNamespace(inline_data=None, text="text")])
+
+    mock_client = MagicMock()
+    mock_client.aio.files.upload = AsyncMock(
+        return_value=SimpleNamespace(uri="files/async", expiration_time=None)
+    )
+    mock_client.aio.models.generate_content_stream = AsyncMock(return_value=stream())
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: _pool_of(mock_client),
+    )
+    monkeypatch.setattr(
+        "backend.services.image_service.get_upload_cache",
+        lambda: GeminiUploadCache(),
+    )
+    monkeypatch.setattr(settings, "IMAGE_INLINE_MAX_BYTES", 0)
+    reference = io.BytesIO(b"photo")
+    reference.name = "face.jpg"
+
+    result = asyncio.run(
+        ImageService().generate_image_async(prompt="test prompt", person_images=[reference])
+    )
+
+    assert result == {"image_bytes": b"async-image", "text_output": "async text"}
+    mock_client.aio.files.upload.assert_awaited_once()
+    mock_client.models.generate_content_stream.assert_not_called()
+    parts = mock_client.aio.models.generate_content_stream.call_args.kwargs["contents"][0].parts
+    assert parts[0].file_data.file_uri == "files/async"
+
+
+def test_reference_mime_type_comes_from_the_ingested_bytes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A PNG uploaded as photo.jpg is sent as image/png, not as the file name suggests."""
+    from backend.services.generation_service import ReferenceImage, prepare_reference_files
+    from backend.services.upload_ingestion import ingest_uploads
+
+    class Upload:
+        filename = "photo.jpg"
+        size = None
+
+        def __init__(self) -> None:
+            self._file = io.BytesIO(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+
+        async def read(self, size: int = -1) -> bytes:
+            return self._file.read(size)
+
+    mock_client = MagicMock()
+    mock_client.models.generate_content_stream.return_value = []
+    monkeypatch.setattr(
+        "backend.services.image_service.get_gemini_client_pool",
+        lambda: _pool_of(mock_client),
+    )
+    monkeypatch.setattr(settings, "REFERENCE_IMAGE_PREPROCESS_ENABLED", False)
+    [payload] = asyncio.run(ingest_uploads([Upload()]))
+
+    references = asyncio.run(prepare_reference_files((ReferenceImage(filename="photo.jpg", payload=payload),)))
+    ImageService().generate_image(prompt="test prompt", person_images=references)
+
+    parts = mock_client.models.generate_content_stream.call_args.kwargs["contents"][0].parts
+    assert parts[0].inline_data.mime_type == "image/png"
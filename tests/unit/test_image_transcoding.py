@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import io
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from backend.services.image_transcoding import OUTPUT_VARIANTS, OutputImageTranscoder, transcode_image_bytes
+from backend.services.job_store import JobImage
+
+
+def _png(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_thumbnail_variant_fits_max_edge() -> None:
+    """Shrink previews to the configured edge and encode them as WebP."""
+    data = transcode_image_bytes(_png((1024, 512)), OUTPUT_VARIANTS["thumbnail"])
+
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == "WEBP"
+        assert max(image.size) == OUTPUT_VARIANTS["thumbnail"].max_edge
+
+
+def test_transcoder_builds_variants_in_process_pool() -> None:
+    """Return smaller variants per model and skip images that cannot be decoded."""
+    transcoder = OutputImageTranscoder(variant_names=("webp", "thumbnail"), max_workers=1)
+    original = _png((512, 512))
+    images = {
+        "model": JobImage(data=original, mime_type="image/png", etag="original"),
+        "broken": JobImage(data=b"\x89PNG\r\n\x1a\nbroken", mime_type="image/png", etag="broken"),
+    }
+
+    try:
+        variants = asyncio.run(transcoder.transcode(images))
+    finally:
+        transcoder.shutdown()
+
+    assert sorted(variants) == ["model"]
+    assert sorted(variants["model"]) == ["thumbnail", "webp"]
+    assert variants["model"]["webp"].mime_type == "image/webp"
+    assert len(variants["model"]["webp"].data) < len(original)
+
+
+def test_transcoder_replaces_a_broken_pool() -> None:
+    """After a worker dies, later jobs get variants again instead of originals forever."""
+
+    class BrokenPool:
+        def submit(self, *_: object) -> concurrent.futures.Future:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+            return future
+
+        def shutdown(self, **_: object) -> None:
+            pass
+
+    transcoder = OutputImageTranscoder(variant_names=("thumbnail",), max_workers=1)
+    transcoder._executor = BrokenPool()
+    images = {"model": JobImage(data=_png((512, 512)), mime_type="image/png", etag="original")}
+
+    async def scenario():
+        return await transcoder.transcode(images), await transcoder.transcode(images)
+
+    try:
+        broken, recovered = asyncio.run(scenario())
+    finally:
+        transcoder.shutdown()
+
+    assert broken == {}
+    assert sorted(recovered["model"]) == ["thumbnail"]
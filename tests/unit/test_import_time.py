@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+# Time spent importing backend.main beyond FastAPI itself; google.genai alone used to take about a second.
+IMPORT_TIME_BUDGET_SECONDS = 1.0
+DEFERRED_MODULES = ("google.genai", "PIL.Image", "httpx")
+
+
+def test_backend_main_imports_within_budget() -> None:
+    """Uvicorn must bind quickly after a boot; the Gemini SDK and Pillow load on first use."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, backend.main; print(*[name for name in {DEFERRED_MODULES!r} if name in sys.modules])",
+        ],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_microseconds: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            cumulative_microseconds.setdefault(name.strip(), int(cumulative))
+
+    own_seconds = (cumulative_microseconds["backend.main"] - cumulative_microseconds["fastapi"]) / 1_000_000
+
+    assert result.stdout.split() == []
+    assert own_seconds < IMPORT_TIME_BUDGET_SECONDS
@@ -0,0 +1,187 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from backend.services.job_store import InMemoryGenerationJobStore, JobImage, SQLiteGenerationJobStore
+
+
+def test_sqlite_store_shares_jobs_between_worker_connections(tmp_path: Path) -> None:
+    """A job written by one worker process must be readable by another."""
+    path = str(tmp_path / "jobs.sqlite3")
+    submitting_worker = SQLiteGenerationJobStore(path)
+    polling_worker = SQLiteGenerationJobStore(path)
+
+    job_id = submitting_worker.create_job()
+    assert polling_worker.get_job(job_id).status == "queued"
+
+    submitting_worker.mark_running(job_id)
+    submitting_worker.mark_completed(job_id, {"results": {"model": {"text_output": "done"}}})
+
+    job = polling_worker.get_job(job_id)
+    assert job.status == "completed"
+    assert job.result == {
+        "results": {"model": {"text_output": "done", "image_size": 0, "image_etag": None}}
+    }
+    assert job.error is None
+
+
+def test_stores_list_batch_jobs_in_item_order(tmp_path: Path) -> None:
+    """Batch membership lives on the jobs, so a batch expires together with them."""
+    for store in (InMemoryGenerationJobStore(), SQLiteGenerationJobStore(str(tmp_path / "jobs.sqlite3"))):
+        job_ids = [store.create_job(batch_id="batch") for _ in range(3)]
+        store.create_job()
+        store.mark_failed(job_ids[1], "boom")
+
+        jobs = store.get_batch_jobs("batch")
+
+        assert [job.job_id for job in jobs] == job_ids
+        assert [job.status for job in jobs] == ["queued", "failed", "queued"]
+        assert store.get_batch_jobs("other") == []
+
+
+def test_sqlite_store_keeps_images_out_of_job_rows(tmp_path: Path) -> None:
+    """Store raw image bytes separately so status reads never load them."""
+    store = SQLiteGenerationJobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create_job()
+    store.mark_completed(
+        job_id,
+        {"results": {"model": {"image_bytes": b"png-bytes", "mime_type": "image/png", "text_output": ""}}},
+    )
+
+    metadata = store.get_job(job_id).result["results"]["model"]
+    image = store.get_image(job_id, "model")
+
+    assert "image_bytes" not in metadata
+    assert metadata["image_size"] == len(b"png-bytes")
+    assert image.data == b"png-bytes"
+    assert image.mime_type == "image/png"
+    assert image.etag == metadata["image_etag"]
+    assert store.get_image(job_id, "other-model") is None
+
+
+def test_sqlite_store_uses_wal_journal(tmp_path: Path) -> None:
+    """WAL lets status reads proceed while another worker writes."""
+    store = SQLiteGenerationJobStore(str(tmp_path / "jobs.sqlite3"))
+
+    journal_mode = store._connection.execute("PRAGMA journal_mode").fetchone()[0]
+
+    assert journal_mode == "wal"
+
+
+def test_sqlite_store_expires_jobs_after_ttl(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Expired rows disappear from reads and are deleted by the indexed prune."""
+    store = SQLiteGenerationJobStore(
+        str(tmp_path / "jobs.sqlite3"),
+        ttl_seconds=10,
+        prune_interval_seconds=0,
+    )
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 100.0)
+    job_id = store.create_job()
+    store.mark_failed(job_id, "boom")
+
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 111.0)
+
+    assert store.get_job(job_id) is None
+    remaining = store._connection.execute("SELECT COUNT(*) FROM generation_jobs").fetchone()[0]
+    assert remaining == 0
+
+
+def test_sqlite_store_serves_transcoded_variants(tmp_path: Path) -> None:
+    """Keep variants next to the original and list them in the job result."""
+    store = SQLiteGenerationJobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create_job()
+    store.mark_completed(
+        job_id,
+        {"results": {"model": {"image_bytes": b"png-bytes", "mime_type": "image/png", "text_output": ""}}},
+    )
+
+    completed_at = store.get_job(job_id).updated_at
+    store.mark_variants_ready(job_id, {"model": {"webp": JobImage(b"webp", "image/webp", "etag-webp")}})
+
+    assert store.get_job(job_id).updated_at > completed_at
+    assert store.get_job(job_id).result["results"]["model"]["variants"] == ["original", "webp"]
+    assert store.get_image(job_id, "model", "webp").data == b"webp"
+    assert store.get_image(job_id, "model").data == b"png-bytes"
+    assert store.get_image(job_id, "model", "avif") is None
+
+
+def _completed_with_image(store: InMemoryGenerationJobStore, image: bytes) -> str:
+    job_id = store.create_job()
+    store.mark_completed(job_id, {"results": {"model": {"image_bytes": image, "mime_type": "image/png"}}})
+    return job_id
+
+
+def test_memory_store_evicts_oldest_results_over_byte_budget() -> None:
+    """Bound memory by image bytes instead of by job count."""
+    store = InMemoryGenerationJobStore(max_result_bytes=10)
+    oldest = _completed_with_image(store, b"123456")
+    newest = _completed_with_image(store, b"123456")
+
+    assert store.get_job(oldest) is None
+    assert store.get_image(oldest, "model") is None
+    assert store.get_job(newest).status == "completed"
+    assert store.total_result_bytes == 6
+    store.close()
+
+
+def test_memory_store_polls_share_one_immutable_snapshot() -> None:
+    """Return the same read-only record to every poll instead of copying it."""
+    store = InMemoryGenerationJobStore()
+    job_id = _completed_with_image(store, b"image")
+
+    first = store.get_job(job_id)
+    assert store.get_job(job_id) is first
+    with pytest.raises(TypeError):
+        first.result["results"]["model"]["image_size"] = 0
+    with pytest.raises(AttributeError):
+        first.status = "failed"
+    store.close()
+
+
+def test_memory_store_reaper_drops_expired_jobs_from_the_heap() -> None:
+    """Expire finished jobs without scanning the ones that are still running."""
+    store = InMemoryGenerationJobStore(ttl_seconds=10)
+    finished = store.create_job()
+    running = store.create_job()
+    store.mark_failed(finished, "boom")
+    store.mark_running(running)
+
+    assert store.reap(now=time.time() + 5) == 0
+    assert store.reap(now=time.time() + 11) == 1
+    assert store._jobs.keys() == {running}
+    store.close()
+
+
+def test_sqlite_store_keeps_running_jobs_past_ttl(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The TTL starts when a job finishes, so a slow generation stays visible while it runs."""
+    store = SQLiteGenerationJobStore(
+        str(tmp_path / "jobs.sqlite3"),
+        ttl_seconds=10,
+        prune_interval_seconds=0,
+        abandoned_ttl_seconds=1000,
+    )
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 100.0)
+    job_id = store.create_job()
+    abandoned_id = store.create_job()
+    store.mark_running(job_id)
+
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 150.0)
+    assert store.get_job(job_id).status == "running"
+    store.mark_completed(job_id, {"results": {}})
+
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 155.0)
+    assert store.get_job(job_id).status == "completed"
+
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 161.0)
+    assert store.get_job(job_id) is None
+    assert store.get_job(abandoned_id).status == "queued"
+
+    monkeypatch.setattr("backend.services.job_store.time.time", lambda: 1101.0)
+    assert store.get_job(abandoned_id) is None
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.tools.loadgen import JobOutcome, UploadFile, encode_multipart, percentile, summarize
+
+
+def test_summarize_reports_throughput_and_percentiles() -> None:
+    """Only completed jobs count towards throughput and end-to-end latency."""
+    outcomes = [JobOutcome("completed", 0.01, float(seconds)) for seconds in range(1, 11)]
+    outcomes.append(JobOutcome("rejected", 0.02, 0.02, 429))
+
+    report = summarize(outcomes, elapsed_seconds=5.0, peak_rss_bytes=256 * 1024 * 1024)
+
+    assert report["statuses"] == {"completed": 10, "rejected": 1}
+    assert report["throughput_jobs_per_second"] == 2.0
+    assert report["latency_seconds"]["p50"] == 5.0
+    assert report["latency_seconds"]["p90"] == 9.0
+    assert report["latency_seconds"]["max"] == 10.0
+    assert report["peak_rss_mb"] == 256.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_encoded_multipart_is_accepted_by_submit_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The stdlib encoder produces bodies FastAPI parses like a browser form."""
+    from backend.services import generation_jobs
+
+    captured = {}
+
+    async def capture(request, **_: object):
+        captured["request"] = request
+        return generation_jobs.GenerationSubmission(job_id="job-1")
+
+    monkeypatch.setattr("backend.routers.generate.submit_generation_job", capture)
+    body, content_type = encode_multipart(
+        {"prompt": "Load test", "model_mode": "Flash"},
+        [("reference_images", UploadFile("face.png", b"\x89PNG\r\n\x1a\nabc", "image/png"))],
+    )
+
+    with TestClient(app) as client:
+        response = client.post("/api/generate/submit", content=body, headers={"Content-Type": content_type})
+
+    assert response.status_code == 200
+    request = captured["request"]
+    assert request.prompt == "Load test"
+    assert request.model_mode == "Flash"
+    assert request.reference_images[0].read_content() == b"\x89PNG\r\n\x1a\nabc"
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.services import metrics
+from backend.services.concurrency import ModelConcurrencyGovernor
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count() -> None:
+    """Follow the Prometheus text format so any scraper can read it."""
+    histogram = metrics.Histogram("latency_seconds", "Latency.", ("model",), buckets=(1.0, 5.0))
+    histogram.observe(0.5, model="flash")
+    histogram.observe(3.0, model="flash")
+    histogram.observe(10.0, model="flash")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{model="flash",le="1"} 1',
+        'latency_seconds_bucket{model="flash",le="5"} 2',
+        'latency_seconds_bucket{model="flash",le="+Inf"} 3',
+        'latency_seconds_sum{model="flash"} 13.5',
+        'latency_seconds_count{model="flash"} 3',
+    ]
+
+
+def test_counter_rejects_unexpected_labels() -> None:
+    """Catch instrumentation typos instead of silently creating new series."""
+    counter = metrics.Counter("things_total", "Things.", ("kind",))
+
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_metric_without_samples_fails_when_created() -> None:
+    """A metric type that cannot render is caught at import time, not on the first scrape."""
+
+    class Summary(metrics._Metric):
+        metric_type = "summary"
+
+    with pytest.raises(TypeError):
+        Summary("latency_summary", "Latency.")
+
+
+def test_governor_counts_failed_attempts_by_status_code() -> None:
+    """Attribute Gemini failures to the HTTP codes error_utils recognizes."""
+    governor = ModelConcurrencyGovernor(max_attempts=2, base_delay_seconds=0)
+    before = metrics.GEMINI_ERRORS_TOTAL.value(model="metrics-model", code=503)
+
+    async def overloaded() -> str:
+        raise RuntimeError("503 UNAVAILABLE")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(governor.call("metrics-model", overloaded))
+
+    assert metrics.GEMINI_ERRORS_TOTAL.value(model="metrics-model", code=503) == before + 2
+
+
+def test_metrics_endpoint_exposes_queue_gauges() -> None:
+    """Serve the registry in the Prometheus exposition format."""
+    with TestClient(app) as client:
+        response = client.get("/api/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'generation_jobs_in_flight{state="running"} 0' in response.text
+    assert 'generation_job_queue_depth{priority="bulk"} 0' in response.text
+    assert "# TYPE gemini_time_to_first_chunk_seconds histogram" in response.text
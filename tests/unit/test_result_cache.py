@@ -0,0 +1,78 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from backend.services.result_cache import GenerationResultCache, SQLiteResultCacheTier, make_result_cache_key
+
+
+def _payload(image: bytes) -> dict[str, object]:
+    return {
+        "results": {"model": {"image_bytes": image, "mime_type": "image/png", "text_output": "ok", "error": None}},
+        "fallback_used": False,
+    }
+
+
+def _key(**overrides: object) -> str:
+    params: dict[str, object] = {
+        "prompt": "portrait",
+        "models": ("model",),
+        "aspect_ratio": "1:1",
+        "resolution": "1K",
+        "temperature": 1.0,
+        "reference_image_hashes": (hashlib.sha256(b"photo").hexdigest(),),
+    }
+    params.update(overrides)
+    return make_result_cache_key(**params)
+
+
+def test_cache_key_changes_with_every_output_relevant_field() -> None:
+    """Never serve a result generated for different settings or reference photos."""
+    base = _key()
+    assert _key() == base
+    assert _key(temperature=0.5) != base
+    assert _key(resolution="2K") != base
+    assert _key(reference_image_hashes=(hashlib.sha256(b"other").hexdigest(),)) != base
+    assert _key(models=("other",)) != base
+
+
+def test_memory_tier_evicts_least_recently_used_and_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Respect the byte budget and TTL of the in-memory tier."""
+    now = [1_000.0]
+    monkeypatch.setattr("backend.services.result_cache.time.time", lambda: now[0])
+    cache = GenerationResultCache(max_entries=10, max_bytes=10, ttl_seconds=60)
+
+    cache.put("a", _payload(b"123456"))
+    cache.put("b", _payload(b"123456"))
+    assert cache.get("a") is None
+    assert cache.get("b")["results"]["model"]["image_bytes"] == b"123456"
+
+    now[0] += 61
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_a_new_memory_tier(tmp_path: Path) -> None:
+    """Serve results stored by another process and promote them into memory."""
+    path = str(tmp_path / "results.sqlite3")
+    writer = GenerationResultCache(disk_tier=SQLiteResultCacheTier(path, max_bytes=1024))
+    writer.put("key", _payload(b"image"))
+
+    reader = GenerationResultCache(disk_tier=SQLiteResultCacheTier(path, max_bytes=1024))
+    payload = reader.get("key")
+
+    assert payload["results"]["model"]["image_bytes"] == b"image"
+    assert payload["results"]["model"]["text_output"] == "ok"
+    assert reader.stats()["disk_hits"] == 1
+    reader.get("key")
+    assert reader.stats()["hits"] == 1
+
+
+def test_disk_tier_evicts_oldest_rows_over_byte_cap(tmp_path: Path) -> None:
+    """Keep the on-disk tier within its configured size."""
+    tier = SQLiteResultCacheTier(str(tmp_path / "results.sqlite3"), max_bytes=8)
+    tier.put("old", _payload(b"123456"), 6, expires_at=2_000, now=1_000)
+    tier.put("new", _payload(b"123456"), 6, expires_at=2_000, now=1_001)
+
+    assert tier.get("old", now=1_002) is None
+    assert tier.get("new", now=1_002) is not None
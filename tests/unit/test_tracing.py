@@ -0,0 +1,159 @@
+import asyncio
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.services import tracing
+
+
+class RecordingExporter:
+    def __init__(self) -> None:
+        self.spans: list[tracing.Span] = []
+
+    def export(self, spans: list[tracing.Span]) -> None:
+        self.spans.extend(spans)
+
+    def shutdown(self) -> None:
+        pass
+
+
+@pytest.fixture
+def exporter() -> Iterator[RecordingExporter]:
+    recording = RecordingExporter()
+    tracing.set_span_exporter(recording)
+    yield recording
+    tracing.set_span_exporter(None)
+
+
+def test_nested_spans_share_trace_and_link_parents(exporter: RecordingExporter) -> None:
+    """Child spans, including ones in tasks started inside a span, join the same trace."""
+
+    async def run() -> tracing.Trace:
+        with tracing.span("root", kind=tracing.SPAN_KIND_SERVER):
+            trace = tracing.current_trace()
+
+            async def child() -> None:
+                with tracing.span("child", model="flash"):
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(child(), child())
+        return trace
+
+    trace = asyncio.run(run())
+    assert tracing.flush_spans()
+
+    root = next(span for span in exporter.spans if span.name == "root")
+    children = [span for span in exporter.spans if span.name == "child"]
+    assert len(children) == 2
+    assert {span.trace_id for span in exporter.spans} == {trace.trace_id}
+    assert all(span.parent_span_id == root.span_id for span in children)
+    assert [timing["stage"] for timing in trace.timings()] == ["root", "child", "child"]
+    assert trace.timings()[1]["model"] == "flash"
+    assert tracing.current_trace() is None
+
+
+def test_span_records_errors_and_otlp_status() -> None:
+    """Failed stages are exported with the OTLP error status code."""
+    with pytest.raises(RuntimeError):
+        with tracing.span("broken", attempt=2) as failed:
+            raise RuntimeError("boom")
+
+    document = tracing.to_otlp_json([failed])
+    resource_spans = document["resourceSpans"][0]
+    encoded = resource_spans["scopeSpans"][0]["spans"][0]
+    assert resource_spans["resource"]["attributes"][0]["key"] == "service.name"
+    assert encoded["name"] == "broken"
+    assert encoded["status"] == {"code": tracing.STATUS_CODE_ERROR, "message": "RuntimeError: boom"}
+    assert encoded["attributes"] == [{"key": "attempt", "value": {"intValue": "2"}}]
+    assert int(encoded["endTimeUnixNano"]) >= int(encoded["startTimeUnixNano"])
+    assert "parentSpanId" not in encoded
+
+
+def test_file_exporter_appends_otlp_json_lines(tmp_path: Path) -> None:
+    """Offline traces land in a JSON Lines file that OTLP tooling can ingest."""
+    path = tmp_path / "spans.jsonl"
+    tracing.set_span_exporter(tracing.FileSpanExporter(str(path)))
+    try:
+        with tracing.span("outer"):
+            with tracing.span("inner"):
+                pass
+        assert tracing.flush_spans()
+    finally:
+        tracing.set_span_exporter(None)
+
+    documents = [json.loads(line) for line in path.read_text().splitlines()]
+    names = [span["name"] for document in documents for span in document["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert names == ["inner", "outer"]
+
+
+def test_submitted_job_reports_stage_timings(monkeypatch: pytest.MonkeyPatch, exporter: RecordingExporter) -> None:
+    """Jobs keep the submitting request's trace, so timings cover upload reading and execution."""
+    from backend.config import settings
+    from backend.services import generation_jobs
+
+    async def run_inline(job_id: str, job, *args: object, **_: object) -> None:
+        await job(*args)
+
+    async def fake_execute_generation(_: object, **__: object) -> dict[str, object]:
+        with tracing.span("generation.model", model="gemini-3-pro-image-preview"):
+            pass
+        return {"results": {}, "fallback_used": False}
+
+    monkeypatch.setattr(settings, "GENERATION_TIMINGS_ENABLED", True)
+    monkeypatch.setattr(generation_jobs._job_scheduler, "submit", run_inline)
+    monkeypatch.setattr(generation_jobs, "execute_generation", fake_execute_generation)
+
+    with TestClient(app) as client:
+        submission = client.post(
+            "/api/generate/submit",
+            data={"prompt": "Trace me", "model_mode": "Pro"},
+            files=[("reference_images", ("face.png", b"\x89PNG\r\n\x1a\nabc", "image/png"))],
+        )
+        status = client.get(f"/api/generate/status/{submission.json()['job_id']}").json()
+
+    stages = [timing["stage"] for timing in status["timings"]]
+    # The job ran inline, so the request span was still open; timings only list finished stages.
+    assert stages[0] == "router.read_uploads"
+    assert "generation.job" in stages
+    assert {"stage": "generation.model", "model": "gemini-3-pro-image-preview"}.items() <= next(
+        timing for timing in status["timings"] if timing["stage"] == "generation.model"
+    ).items()
+
+    assert tracing.flush_spans()
+    assert len({span.trace_id for span in exporter.spans}) == 1
+
+
+def test_jobs_submitted_together_report_only_their_own_stages(exporter: RecordingExporter) -> None:
+    """Batch items share the submitting request's context but not each other's timings."""
+    from backend.services.generation_jobs import GenerationJobScheduler
+
+    timings: dict[str, list[str]] = {}
+
+    async def job(name: str) -> None:
+        with tracing.span("generation.job", job_id=name):
+            await asyncio.sleep(0)
+        timings[name] = [timing["stage"] for timing in tracing.current_trace().timings()]
+
+    async def run() -> tracing.Span:
+        scheduler = GenerationJobScheduler(max_concurrency=3, max_queue_depth=10)
+        with tracing.span("POST /api/generate/batch", kind=tracing.SPAN_KIND_SERVER) as submit_span:
+            with tracing.span("router.read_uploads"):
+                pass
+            for name in ("a", "b", "c"):
+                await scheduler.submit(name, job, name)
+        while scheduler._tasks or scheduler.queue_depth:
+            await asyncio.sleep(0)
+        return submit_span
+
+    submit_span = asyncio.run(run())
+    assert tracing.flush_spans()
+
+    request_stages = ["POST /api/generate/batch", "router.read_uploads"]
+    assert timings == {name: [*request_stages, "generation.queue_wait", "generation.job"] for name in "abc"}
+    jobs = [span for span in exporter.spans if span.name == "generation.job"]
+    assert {span.trace_id for span in jobs} == {submit_span.trace_id}
+    assert {span.parent_span_id for span in jobs} == {submit_span.span_id}
@@ -0,0 +1,146 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from backend.main import app
+from backend.tools.replay import build_replay_items, load_workload, synthetic_reference_image
+
+
+def test_submitted_jobs_are_captured_without_prompt_text(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Capture keeps the load shape and latencies of a job but never what the user wrote."""
+    from backend.config import settings
+    from backend.services import generation_jobs
+
+    async def run_inline(job_id: str, job, *args: object, **_: object) -> None:
+        await job(*args)
+
+    async def fake_execute_generation(_: object, **__: object) -> dict[str, object]:
+        return {"results": {}, "fallback_used": True}
+
+    capture_path = tmp_path / "traffic.jsonl"
+    monkeypatch.setattr(settings, "TRAFFIC_CAPTURE_PATH", str(capture_path))
+    monkeypatch.setattr(generation_jobs._job_scheduler, "submit", run_inline)
+    monkeypatch.setattr(generation_jobs, "execute_generation", fake_execute_generation)
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/generate/submit",
+            data={"prompt": "Secret family portrait", "model_mode": "Flash", "priority": "bulk"},
+            files=[("reference_images", ("face.png", b"\x89PNG\r\n\x1a\nabc", "image/png"))],
+        )
+    assert response.status_code == 200
+
+    raw = capture_path.read_text()
+    assert "Secret" not in raw
+    record = json.loads(raw)
+    assert record["route"] == "submit"
+    assert record["priority"] == "bulk"
+    assert record["status"] == "completed"
+    assert record["fallback_used"] is True
+    assert record["request"]["model_mode"] == "Flash"
+    assert record["request"]["prompt_chars"] == len("Secret family portrait")
+    assert record["request"]["reference_images"][0]["size_bytes"] == 11
+    assert set(record["latency_seconds"]) == {"queue_wait", "run", "total"}
+
+
+def test_attached_and_rejected_submissions_are_captured(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Replays must offer the full load, including submissions that never ran a job of their own."""
+    from backend.config import settings
+    from backend.services import generation_jobs
+
+    async def hold(*_: object, **__: object) -> None:
+        pass
+
+    def full(count: int = 1) -> None:
+        raise generation_jobs.JobQueueFullError(retry_after_seconds=5)
+
+    capture_path = tmp_path / "traffic.jsonl"
+    monkeypatch.setattr(settings, "TRAFFIC_CAPTURE_PATH", str(capture_path))
+    monkeypatch.setattr(generation_jobs._job_scheduler, "submit", hold)
+    generation_jobs._job_deduplicator.clear()
+
+    with TestClient(app) as client:
+        scheduled = client.post("/api/generate/submit", data={"prompt": "Portrait", "model_mode": "Flash"}).json()
+        attached = client.post("/api/generate/submit", data={"prompt": "Portrait", "model_mode": "Flash"}).json()
+        monkeypatch.setattr(generation_jobs._job_scheduler, "ensure_capacity", full)
+        rejected = client.post("/api/generate/submit", data={"prompt": "Landscape", "model_mode": "Flash"})
+    generation_jobs._job_deduplicator.clear()
+
+    assert attached["attached"] is True
+    assert rejected.status_code == 429
+    records = [json.loads(line) for line in capture_path.read_text().splitlines()]
+    assert [(record["outcome"], record["status"]) for record in records] == [
+        ("attached", "queued"),
+        ("rejected", "queue_full"),
+    ]
+    assert records[0]["job_id"] == scheduled["job_id"]
+    assert "Portrait" not in capture_path.read_text()
+
+
+def test_replay_schedules_records_at_scaled_offsets(tmp_path: Path) -> None:
+    """Replays keep the recorded spacing, compressed by the speed factor."""
+    capture_path = tmp_path / "traffic.jsonl"
+    image = {"size_bytes": 5000, "sha256": "ab" * 32}
+    records = [
+        {
+            "timestamp": 110.0,
+            "route": "generate",
+            "request": {
+                "model_mode": "Pro",
+                "resolution": "2K",
+                "aspect_ratio": "16:9",
+                "prompt_chars": 40,
+                "reference_images": [image],
+            },
+            "latency_seconds": {"total": 20.0},
+        },
+        {
+            "timestamp": 100.0,
+            "route": "submit",
+            "priority": "bulk",
+            "request": {
+                "model_mode": "Flash",
+                "resolution": "1K",
+                "aspect_ratio": "1:1",
+                "prompt_chars": 3,
+                "reference_images": [],
+            },
+        },
+    ]
+    capture_path.write_text("\n".join(json.dumps(record) for record in records) + "\nnot json\n")
+
+    items = build_replay_items(load_workload(str(capture_path)), speed=2.0)
+
+    assert [item.offset_seconds for item in items] == [0.0, 5.0]
+    assert items[0].fields["priority"] == "bulk"
+    assert items[1].route == "generate"
+    assert len(items[1].fields["prompt"]) == 40
+    assert items[1].recorded_latency_seconds == 20.0
+    upload = items[1].files[0][1]
+    assert len(upload.content) == 5000
+    with Image.open(io.BytesIO(upload.content)) as decoded:
+        assert decoded.format == "JPEG"
+    assert synthetic_reference_image(5000, "ab" * 32) is upload
+    synthetic_reference_image.cache_clear()
+    assert synthetic_reference_image(5000, "ab" * 32).content == upload.content
+    assert synthetic_reference_image(5000, "cd" * 32).content != upload.content
+
+
+def test_replay_repeats_the_prompt_of_the_job_a_submission_attached_to() -> None:
+    """Attached submissions replay as duplicates, so coalescing sees the same load again."""
+    request = {"model_mode": "Flash", "resolution": "1K", "aspect_ratio": "1:1", "prompt_chars": 30}
+    records = [
+        {"timestamp": 100.0, "request": request, "outcome": "scheduled", "job_id": "job-1"},
+        {"timestamp": 101.0, "request": request, "outcome": "attached", "job_id": "job-1"},
+        {"timestamp": 102.0, "request": request, "outcome": "rejected", "job_id": None},
+    ]
+
+    items = build_replay_items(records)
+
+    assert len(items) == 3
+    assert items[0].fields["prompt"] == items[1].fields["prompt"]
+    assert items[2].fields["prompt"] != items[0].fields["prompt"]
@@ -0,0 +1,64 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services.upload_cache import GeminiUploadCache, make_upload_key
+
+
+def _uploaded(uri: str, expiration_time: datetime.datetime | None = None) -> SimpleNamespace:
+    """Mimic the subset of ``types.File`` the cache reads."""
+    return SimpleNamespace(uri=uri, expiration_time=expiration_time)
+
+
+def test_get_or_upload_reuses_uri_for_identical_content() -> None:
+    """Upload the same bytes once and serve every later request from cache."""
+    cache = GeminiUploadCache()
+    calls: list[str] = []
+
+    def upload() -> SimpleNamespace:
+        calls.append("upload")
+        return _uploaded("files/abc")
+
+    first = cache.get_or_upload(b"photo", "image/jpeg", upload)
+    second = cache.get_or_upload(b"photo", "image/jpeg", upload)
+
+    assert first.file_uri == second.file_uri == "files/abc"
+    assert calls == ["upload"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_keys_include_mime_type() -> None:
+    """Treat the same bytes declared with another MIME type as a separate upload."""
+    assert make_upload_key(b"photo", "image/png") != make_upload_key(b"photo", "image/jpeg")
+
+
+def test_entries_expire_before_gemini_deletes_the_file(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stop reusing a URI once it is within the safety margin of its expiry."""
+    cache = GeminiUploadCache(expiry_margin_seconds=60)
+    expiration = datetime.datetime.fromtimestamp(1_000, tz=datetime.UTC)
+    monkeypatch.setattr("backend.services.upload_cache.time.time", lambda: 500.0)
+    cache.get_or_upload(b"photo", "image/jpeg", lambda: _uploaded("files/old", expiration))
+
+    monkeypatch.setattr("backend.services.upload_cache.time.time", lambda: 950.0)
+    refreshed = cache.get_or_upload(b"photo", "image/jpeg", lambda: _uploaded("files/new"))
+
+    assert refreshed.file_uri == "files/new"
+
+
+def test_lru_eviction_respects_entry_and_byte_budget() -> None:
+    """Drop the least recently used uploads when either budget is exceeded."""
+    cache = GeminiUploadCache(max_entries=2, max_bytes=10)
+    cache.get_or_upload(b"aaaa", "image/jpeg", lambda: _uploaded("files/a"))
+    cache.get_or_upload(b"bbbb", "image/jpeg", lambda: _uploaded("files/b"))
+    cache.get_or_upload(b"aaaa", "image/jpeg", lambda: _uploaded("files/a2"))
+    cache.get_or_upload(b"cccc", "image/jpeg", lambda: _uploaded("files/c"))
+
+    assert cache.get(make_upload_key(b"bbbb", "image/jpeg")) is None
+    assert cache.get(make_upload_key(b"aaaa", "image/jpeg")).file_uri == "files/a"
+
+    cache.get_or_upload(b"dddddddd", "image/jpeg", lambda: _uploaded("files/d"))
+
+    assert cache.stats()["bytes"] <= 10
+    assert cache.stats()["evictions"] >= 2
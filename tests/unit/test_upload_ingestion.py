@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from backend.services.upload_ingestion import UploadRejectedError, ingest_uploads
+
+JPEG_HEADER = b"\xff\xd8\xff\xe0"
+
+
+class FakeUpload:
+    """Serve bytes through the async ``read(size)`` interface of Starlette's ``UploadFile``."""
+
+    def __init__(self, filename: str, content: bytes, size: int | None = None) -> None:
+        self.filename = filename
+        self.size = size
+        self._file = io.BytesIO(content)
+        self.reads = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads += 1
+        return self._file.read(size)
+
+
+def test_large_uploads_spill_to_disk_and_are_hashed_while_read() -> None:
+    """Big photos leave the heap; small ones stay in memory, and empty files are skipped."""
+    large = JPEG_HEADER + b"\x01" * (2 * 1024 * 1024)
+    small = JPEG_HEADER + b"small"
+
+    payloads = asyncio.run(
+        ingest_uploads([FakeUpload("large.jpg", large), FakeUpload("empty.jpg", b""), FakeUpload("small.jpg", small)])
+    )
+
+    assert [payload.filename for payload in payloads] == ["large.jpg", "small.jpg"]
+    assert [payload.spilled for payload in payloads] == [True, False]
+    assert payloads[0].sha256 == hashlib.sha256(large).hexdigest()
+    assert payloads[0].read() == large
+    assert payloads[1].read() == small
+    assert payloads[0].mime_type == "image/jpeg"
+
+
+def test_uploads_that_are_not_images_are_rejected() -> None:
+    with pytest.raises(UploadRejectedError) as excinfo:
+        asyncio.run(ingest_uploads([FakeUpload("notes.jpg", b"%PDF-1.7 not a photo")]))
+
+    assert excinfo.value.status_code == 415
+
+
+def test_size_limits_are_enforced_before_reading_everything() -> None:
+    """A declared size over the limit is refused unread; the request budget spans all files."""
+    declared = FakeUpload("huge.jpg", JPEG_HEADER, size=50)
+    with pytest.raises(UploadRejectedError) as excinfo:
+        asyncio.run(ingest_uploads([declared], max_file_bytes=10))
+    assert excinfo.value.status_code == 413
+    assert declared.reads == 0
+
+    uploads = [FakeUpload("a.jpg", JPEG_HEADER + b"a" * 60), FakeUpload("b.jpg", JPEG_HEADER + b"b" * 60)]
+    with pytest.raises(UploadRejectedError):
+        asyncio.run(ingest_uploads(uploads, max_file_bytes=100, max_request_bytes=100))
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from collections.abc import Iterator
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.main import app
+from backend.services import warmup
+from backend.services.client_pool import GeminiClientPool
+from backend.services.gemini_client import get_gemini_client_pool
+
+
+@pytest.fixture
+def simulated_pool(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Let the lifespan build a real pool, backed by the simulator."""
+    monkeypatch.setattr(settings, "GEMINI_SIMULATOR_ENABLED", True)
+    monkeypatch.setattr(settings, "GEMINI_WARMUP_ENABLED", True)
+    monkeypatch.setattr(warmup, "_warmup_finished", False)
+    get_gemini_client_pool.cache_clear()
+    yield
+    get_gemini_client_pool.cache_clear()
+
+
+def test_health_reports_ready_only_after_warm_up(simulated_pool: None) -> None:
+    """Requests arriving while the clients are created are told the worker is still starting."""
+    assert TestClient(app).get("/api/health").status_code == 503
+
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 5
+        while client.get("/api/health").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        response = client.get("/api/health")
+
+    assert response.json() == {"status": "ok"}
+    assert [member.name for member in get_gemini_client_pool().members] == ["simulator"]
+
+
+def test_keep_alive_pings_only_idle_clients() -> None:
+    """Clients that served traffic during the interval already kept their connections open."""
+    pinged: list[str] = []
+
+    def client(name: str) -> object:
+        async def get(*, model: str) -> None:
+            pinged.append(name)
+
+        return SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(get=get)))
+
+    pool = GeminiClientPool([("busy", client("busy")), ("idle", client("idle"))])
+
+    async def run() -> None:
+        task = asyncio.create_task(warmup.keep_gemini_connections_warm(pool, interval_seconds=0.05))
+        await asyncio.sleep(0.01)
+        pool.release(pool.acquire(["busy"]))
+        await asyncio.sleep(0.06)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert pinged == ["idle"]